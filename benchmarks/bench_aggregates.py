@@ -0,0 +1,55 @@
+"""
+Cost of showing the live Tier 1 summary after every turn of a long
+session: full rescan (summarize_sentiment over the history) vs. the
+incremental SentimentAccumulator.
+
+    python benchmarks/bench_aggregates.py [turns]
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot_sentiment import SentimentAccumulator, summarize_sentiment
+
+
+def label_for(score):
+    return "Positive" if score > 0.05 else "Negative" if score < -0.05 else "Neutral"
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(7)
+    scores = [rng.uniform(-1, 1) for _ in range(n)]
+
+    # incremental: add + summary after every turn
+    acc = SentimentAccumulator()
+    t0 = time.perf_counter()
+    for s in scores:
+        acc.add(label_for(s), s)
+        acc.summary()
+    t_inc = time.perf_counter() - t0
+
+    # rescan: one summary over the full history, then extrapolate to a
+    # summary after every turn (sum over i of cost(i) ~ n/2 full scans)
+    history = []
+    for s in scores:
+        history.append({"speaker": "user", "text": "", "sentiment_label": label_for(s), "sentiment_score": s})
+        history.append({"speaker": "bot", "text": ""})
+    t0 = time.perf_counter()
+    full = summarize_sentiment(history)
+    t_scan = time.perf_counter() - t0
+
+    assert full == acc.summary(), "accumulator diverged from full rescan"
+
+    print(f"turns: {n}")
+    print(f"incremental: {t_inc * 1e6 / n:8.2f} us/turn, {t_inc:8.3f} s for the whole session")
+    print(f"rescan:      {t_scan * 1e3:8.2f} ms for one summary at {n} turns, "
+          f"~{t_scan * n / 2:8.1f} s for the whole session (extrapolated)")
+
+
+if __name__ == "__main__":
+    main()
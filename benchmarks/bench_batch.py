@@ -0,0 +1,93 @@
+"""
+Messages/second of HybridSentimentAnalyzer.analyze() vs analyze_batch(),
+like for like: both without a memo, then both with a fresh memo of their
+own, on a repetitive workload (a few chat phrases) and on the mostly
+unique corpus messages. Also checks that the shared memo returns what
+unmemoized analyze() would for lower-, upper- and title-cased variants
+of the same message.
+
+    python benchmarks/bench_batch.py [n_messages]
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import corpus
+from chatbot_sentiment import HybridSentimentAnalyzer, SentimentMemo
+
+SAMPLES = [
+    "hi", "ok", "i'm fine", "bye",
+    "I failed in submission and I feel miserable",
+    "i am confident about the exam tomorrow!!",
+    "jaa yrr, leave me alone",
+    "I'm feeling blue today",
+    "that was soooo good!!!",
+    "Could you please help me with this assignment?",
+    "my job is stressing me out, nothing works",
+    "",
+    "The Shit Without doubt",
+]
+
+
+def case_variants(text):
+    return [text.lower(), text.upper(), text.title(), text.capitalize(), text]
+
+
+def check_memo_case(texts):
+    """analyze() through a memo must match analyze() without one, whatever
+    case variant of a message reached the memo first."""
+    plain = HybridSentimentAnalyzer(memo=None)
+    for order in (1, -1):
+        memoized = HybridSentimentAnalyzer(memo=SentimentMemo())
+        for text in texts:
+            for variant in case_variants(text)[::order]:
+                assert memoized.analyze(variant) == plain.analyze(variant), \
+                    f"memoized analyze() diverged on {variant!r}"
+
+
+def compare(name, texts, memo):
+    """Time analyze() per message and analyze_batch() on the whole list,
+    each on its own analyzer with a fresh memo (or none)."""
+    scalar_analyzer = HybridSentimentAnalyzer(memo=SentimentMemo() if memo else None)
+    batch_analyzer = HybridSentimentAnalyzer(memo=SentimentMemo() if memo else None)
+    scalar_analyzer.analyze("warm up")
+    batch_analyzer.analyze_batch(["warm up"])
+    if memo:
+        scalar_analyzer.memo.clear()
+        batch_analyzer.memo.clear()
+
+    t0 = time.perf_counter()
+    scalar = [scalar_analyzer.analyze(t) for t in texts]
+    t_scalar = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batch = batch_analyzer.analyze_batch(texts)
+    t_batch = time.perf_counter() - t0
+
+    assert scalar == batch, "analyze_batch() diverged from analyze()"
+    n = len(texts)
+    print(f"{name:<28} analyze() {n / t_scalar:>10,.0f} msg/s   "
+          f"analyze_batch() {n / t_batch:>10,.0f} msg/s  ({t_scalar / t_batch:.2f}x)")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rng = random.Random(42)
+    repetitive = [rng.choice(SAMPLES) for _ in range(n)]
+    varied = corpus.messages(n, "mixed", seed=42)
+
+    print(f"messages: {n} per workload ({len(set(varied))} distinct in the corpus one)")
+    for memo in (False, True):
+        label = "memo" if memo else "no memo"
+        compare(f"repetitive, {label}", repetitive, memo)
+        compare(f"corpus, {label}", varied, memo)
+    check_memo_case(SAMPLES)
+
+
+if __name__ == "__main__":
+    main()
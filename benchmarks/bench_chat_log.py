@@ -0,0 +1,87 @@
+"""
+Transcript logging: the legacy append to one chat_log.txt vs ChatLogWriter.
+
+1. Caller-side cost of saving one finished session (the legacy path opens,
+   appends and closes the file on the calling thread; the writer only
+   buffers), and the on-disk size after rotation and compression.
+2. Reading back: a full streaming pass over every segment, and fetching
+   one session via the index vs scanning the legacy file for it.
+
+    python benchmarks/bench_chat_log.py [sessions] [turns]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import corpus
+from chatbot_sentiment import ChatLogWriter, ChatLogReader, _parse_log
+
+
+def legacy_write(path, history):
+    # Chatbot.save_to_log_txt without a ChatLogWriter
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n=== New Chat ===\n")
+        for m in history:
+            f.write(f"{m['speaker'].upper()}: {m['text']}\n")
+
+
+def dir_size(d):
+    return sum(os.path.getsize(os.path.join(d, n)) for n in os.listdir(d))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    sessions = corpus.sessions(n, turns)
+
+    with tempfile.TemporaryDirectory() as d:
+        legacy = os.path.join(d, "chat_log.txt")
+        samples = []
+        for s in sessions:
+            t0 = time.perf_counter()
+            legacy_write(legacy, s["history"])
+            samples.append(time.perf_counter() - t0)
+        print(f"{n} sessions x {turns} turns")
+        print(f"  legacy append     mean {statistics.mean(samples) * 1e6:7.1f} µs/session   "
+              f"file {os.path.getsize(legacy) / 1e6:.1f} MB")
+
+        logs = os.path.join(d, "logs")
+        writer = ChatLogWriter(logs, max_bytes=8 << 20)
+        samples = []
+        t_all = time.perf_counter()
+        for i, s in enumerate(sessions):
+            t0 = time.perf_counter()
+            writer.write_session(f"user{i % 1000}-{i}", s["history"])
+            samples.append(time.perf_counter() - t0)
+        writer.close()
+        t_all = time.perf_counter() - t_all
+        print(f"  ChatLogWriter     mean {statistics.mean(samples) * 1e6:7.1f} µs/session   "
+              f"dir {dir_size(logs) / 1e6:.1f} MB in {writer.segments} segments "
+              f"(incl. compression: {t_all:.1f} s total)")
+
+        reader = ChatLogReader(logs, legacy_path=None)
+        t0 = time.perf_counter()
+        count = sum(1 for _ in reader)
+        print(f"\n  stream all segments: {count} sessions in {time.perf_counter() - t0:.2f} s")
+
+        target = f"user{(n - 10) % 1000}-{n - 10}"
+        t0 = time.perf_counter()
+        found = list(reader.sessions(target))
+        indexed = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        with open(legacy, encoding="utf-8") as f:
+            scanned = [t for i, t in enumerate(_parse_log(f, None)) if i == n - 10]
+        scan = time.perf_counter() - t0
+        print(f"  one session via index: {indexed * 1000:.1f} ms ({len(found)} found, "
+              f"{len(reader.find(target))} segment read)")
+        print(f"  one session by scanning chat_log.txt: {scan * 1000:.1f} ms ({len(scanned)} found)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+CPU latency of the embedding topic/intent classifier.
+
+Per-message encoder + scoring cost at batch sizes 1, 8 and 64 (unique
+texts, so the embedding cache never hits), the prototype matmul alone,
+a cached repeat, and N threads classifying concurrently through the
+micro-batcher.
+
+With sentence-transformers and the model weights this times the real
+model. Without them (or with --stub) it uses StubEncoder, a NumPy
+stand-in shaped like MiniLM's output (hashed bag of words, then two
+dense layers to 384 dims). Its numbers cover the classifier, the cache
+and the micro-batcher around the model, not the model itself.
+
+    python benchmarks/bench_classifier.py [--model all-MiniLM-L6-v2] [--threads 32] [--stub]
+"""
+
+import os
+import sys
+import time
+import zlib
+import argparse
+import statistics
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import corpus
+from chatbot_sentiment import BatchedEmbedder, EmbeddingClassifier
+
+
+class StubEncoder:
+    """
+    Deterministic stand-in for a sentence encoder: hashed word and bigram
+    counts through two dense layers. Cost grows with the batch the way a
+    matmul-bound encoder's does; the similarities mean nothing.
+    """
+
+    def __init__(self, buckets=4096, hidden=1536, dim=384, seed=0):
+        rng = np.random.default_rng(seed)
+        self.buckets = buckets
+        self.w1 = rng.standard_normal((buckets, hidden)).astype(np.float32) / np.sqrt(buckets)
+        self.w2 = rng.standard_normal((hidden, dim)).astype(np.float32) / np.sqrt(hidden)
+
+    def __call__(self, texts):
+        x = np.zeros((len(texts), self.buckets), dtype=np.float32)
+        for i, t in enumerate(texts):
+            words = t.lower().split()
+            for w in words + [a + " " + b for a, b in zip(words, words[1:])]:
+                x[i, zlib.crc32(w.encode()) % self.buckets] += 1.0
+        return np.tanh(x @ self.w1) @ self.w2
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default="all-MiniLM-L6-v2")
+    ap.add_argument("--threads", type=int, default=32)
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--stub", action="store_true", help="use StubEncoder even if the model is available")
+    args = ap.parse_args()
+
+    embedder = None if args.stub else BatchedEmbedder(model_name=args.model, cache_size=1_000_000)
+    if embedder is None or not embedder.available:
+        if not args.stub:
+            print("sentence-transformers (or the model) is not available")
+        print("encoder: StubEncoder (NumPy stand-in, not a real model)")
+        embedder = BatchedEmbedder(embedder=StubEncoder(), cache_size=1_000_000)
+    else:
+        print(f"encoder: {args.model}")
+    clf = EmbeddingClassifier(embedder=embedder)
+    clf.matrix   # embed the prototypes outside the timings
+    print(f"{len(clf.labels)} labels, dim {clf.matrix.shape[1]}")
+
+    # unique messages: a numbered suffix defeats the embedding cache
+    pool = iter(f"{m} #{i}" for i, m in enumerate(corpus.messages(100_000, "plain", seed=9)))
+
+    for batch in (1, 8, 64):
+        per_msg = []
+        for _ in range(args.rounds * max(1, 64 // batch)):
+            texts = [next(pool) for _ in range(batch)]
+            t0 = time.perf_counter()
+            clf.classify_batch(texts)
+            per_msg.append((time.perf_counter() - t0) / batch)
+        print(f"batch {batch:>2}: {statistics.median(per_msg) * 1000:7.2f} ms/message "
+              f"({statistics.median(per_msg) * batch * 1000:7.1f} ms/batch)")
+
+    vecs = embedder.embed([next(pool) for _ in range(64)])
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        vecs @ clf.matrix.T
+    print(f"prototype matmul (64 x {len(clf.labels)}): {(time.perf_counter() - t0) / 1000 * 1e6:.1f} µs")
+
+    text = next(pool)
+    clf.classify(text)
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        clf.classify(text)
+    print(f"cached repeat: {(time.perf_counter() - t0) / 1000 * 1e6:.1f} µs/message")
+
+    # concurrent sessions: every thread submits one message at a time
+    before = embedder.stats()
+    texts = [[next(pool) for _ in range(args.rounds)] for _ in range(args.threads)]
+    latencies = []
+    lock = threading.Lock()
+
+    def session(msgs):
+        for m in msgs:
+            t0 = time.perf_counter()
+            clf.labels_from_vector(embedder.submit(m).result())
+            with lock:
+                latencies.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=session, args=(t,)) for t in texts]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    after = embedder.stats()
+    batches = after["batches"] - before["batches"]
+    n = len(latencies)
+    print(f"{args.threads} concurrent sessions: {n} messages in {batches} encoder calls "
+          f"(avg batch {n / max(1, batches):.1f}), {n / wall:.0f} msg/s, "
+          f"p50 {np.percentile(latencies, 50) * 1000:.1f} ms, p99 {np.percentile(latencies, 99) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
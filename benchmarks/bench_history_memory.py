@@ -0,0 +1,69 @@
+"""
+Bytes per turn of a list-of-dicts history vs. ConversationHistory,
+measured with tracemalloc.
+
+    python benchmarks/bench_history_memory.py [turns]
+"""
+
+import os
+import sys
+import random
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot_sentiment import ConversationHistory
+
+USER = ["I failed my exam", "my job is stressing me out", "hi", "I am confident about tomorrow!!"]
+BOT = ["I'm really sorry to hear that. Could you tell me what bothered you the most?",
+       "That's good to hear! What else is on your mind?"]
+
+
+def turns(n):
+    rng = random.Random(1)
+    for i in range(n):
+        if i % 2 == 0:
+            # fresh strings, as messages arriving over input() would be
+            yield "user", "".join(rng.choice(USER)), "Negative", rng.uniform(-1, 1)
+        else:
+            yield "bot", "".join(rng.choice(BOT)), None, None
+
+
+def measure(build, n):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build(n)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / n, obj
+
+
+def build_dicts(n):
+    history = []
+    for speaker, text, label, score in turns(n):
+        if speaker == "user":
+            history.append({"speaker": speaker, "text": text,
+                            "sentiment_label": label, "sentiment_score": score})
+        else:
+            history.append({"speaker": speaker, "text": text})
+    return history
+
+
+def build_columns(n):
+    history = ConversationHistory()
+    for speaker, text, label, score in turns(n):
+        history.add(speaker, text, label, score)
+    return history
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    dict_bpt, _ = measure(build_dicts, n)
+    col_bpt, _ = measure(build_columns, n)
+    print(f"turns: {n}")
+    print(f"list of dicts:        {dict_bpt:7.1f} bytes/turn")
+    print(f"ConversationHistory:  {col_bpt:7.1f} bytes/turn ({dict_bpt / col_bpt:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Background user-memory persistence.
+
+1. Turn latency of handle() (rule-based replies) with persistence off,
+   with a synchronous atomic write after every turn, and with the
+   debounced MemoryWriter.
+2. Crash recovery: a child process chats with a MemoryWriter and is
+   SIGKILLed at a random moment, repeatedly. After every kill the memory
+   file must parse and hold the counts of a recent turn. Exits 1 if any
+   kill left a torn or missing file.
+
+    python benchmarks/bench_memory_writer.py [turns] [kills]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import signal
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import corpus
+
+CHILD = """
+import os, sys
+sys.path.insert(0, {root!r})
+from chatbot_sentiment import Chatbot, GroqLLMResponder, MemoryWriter
+os.environ["GROQ_API_KEY"] = ""   # after the import, which sets a placeholder key
+writer = MemoryWriter(interval=0.005, fsync={fsync!r})
+bot = Chatbot(llm=GroqLLMResponder(), memory_writer=writer)
+bot.handle("hello, warming up")
+writer.flush()   # the file exists before the first kill can land
+print("ready", flush=True)
+i = 0
+while True:
+    bot.handle("I failed the exam and I feel miserable" if i % 2 else "today was great, I am confident")
+    i += 1
+"""
+
+
+def pct(samples, q):
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+
+def latency(turns):
+    from chatbot_sentiment import Chatbot, GroqLLMResponder, MemoryWriter, USER_MEMORY_FILE, write_json_atomic
+
+    os.environ["GROQ_API_KEY"] = ""
+    msgs = corpus.messages(turns, "mixed", seed=5)
+    llm = GroqLLMResponder()
+
+    def run(bot, after=None):
+        samples = []
+        for m in msgs:
+            t0 = time.perf_counter()
+            bot.handle(m)
+            if after:
+                after(bot)
+            samples.append(time.perf_counter() - t0)
+        return samples
+
+    run(Chatbot(llm=llm))   # warm VADER and the sentiment memo for every mode
+    results = {}
+    results["off"] = run(Chatbot(llm=llm))
+    results["sync write, fsync"] = run(
+        Chatbot(llm=llm),
+        lambda b: write_json_atomic(USER_MEMORY_FILE, b._memory_snapshot(), fsync=True))
+    writer = MemoryWriter(interval=0.05, fsync="always")
+    results["MemoryWriter, fsync"] = run(Chatbot(llm=llm, memory_writer=writer))
+    writer.close()
+
+    print(f"{turns} turns per mode")
+    for name, samples in results.items():
+        print(f"  {name:<22} mean {statistics.mean(samples) * 1e6:8.1f} µs   "
+              f"p99 {pct(samples, 0.99) * 1e6:8.1f} µs")
+    print(f"  MemoryWriter: {writer.stats()}")
+
+
+def crash_recovery(kills):
+    failures = 0
+    for policy in ("never", "always"):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "memory", "user_memory.json")
+            last_total = 0
+            for k in range(kills):
+                child = subprocess.Popen([sys.executable, "-c", CHILD.format(root=ROOT, fsync=policy)],
+                                         cwd=d, stdout=subprocess.PIPE, text=True)
+                child.stdout.readline()   # "ready"
+                time.sleep(random.uniform(0.05, 0.3))
+                child.send_signal(signal.SIGKILL)
+                child.wait()
+                child.stdout.close()
+
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        data = json.load(f)
+                    total = data["pos_count"] + data["neg_count"]
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"  fsync={policy} kill {k}: unreadable memory file ({e})")
+                    failures += 1
+                    continue
+                # each run resumes from the saved counts, so they only grow
+                if total < last_total:
+                    print(f"  fsync={policy} kill {k}: counts went backwards ({last_total} -> {total})")
+                    failures += 1
+                last_total = total
+            leftovers = [n for n in os.listdir(os.path.dirname(path)) if n.endswith(".tmp")]
+            print(f"  fsync={policy}: {kills} kills, {last_total} turns persisted, "
+                  f"{len(leftovers)} stale temp files")
+    return failures
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    kills = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as d:
+        os.chdir(d)
+        try:
+            latency(turns)
+        finally:
+            os.chdir(cwd)
+
+    print("\ncrash recovery (SIGKILL at random points)")
+    failures = crash_recovery(kills)
+    print("  OK" if not failures else f"  {failures} FAILED")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Startup cost of loading past chats: legacy json.load of the whole
+chat_sessions.json vs. opening the SessionStore index and answering
+"last 10 messages" lazily. Each variant runs in a fresh process so peak
+RSS is comparable.
+
+    python benchmarks/bench_past_chats.py [total_turns] [turns_per_session]
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+LEGACY = """
+import json, time, resource
+t0 = time.perf_counter()
+with open({path!r}) as f:
+    past = json.load(f)
+last = past[-1]["history"][-10:]
+dt = time.perf_counter() - t0
+print(json.dumps({{"seconds": dt, "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+STORE = """
+import sys, json, time, resource
+sys.path.insert(0, {root!r})
+from chatbot_sentiment import SessionStore
+rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t0 = time.perf_counter()
+store = SessionStore({log!r}, {idx!r}, legacy_path=None)
+last = store.last_turns(10)
+dt = time.perf_counter() - t0
+print(json.dumps({{"seconds": dt, "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  "import_rss_kb": rss0}}))
+"""
+
+
+def make_session(i, turns):
+    history = []
+    for j in range(turns):
+        if j % 2 == 0:
+            history.append({"speaker": "user", "text": f"message {j} of session {i}, I failed my exam",
+                            "sentiment_label": "Negative", "sentiment_score": -0.61})
+        else:
+            history.append({"speaker": "bot", "text": "I'm really sorry to hear that. Tell me more."})
+    return {"timestamp": f"2026-01-01 00:00:{i:06d}", "history": history}
+
+
+def run(code):
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    per_session = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    n_sessions = total // per_session
+
+    from chatbot_sentiment import SessionStore
+
+    with tempfile.TemporaryDirectory() as d:
+        legacy = os.path.join(d, "chat_sessions.json")
+        log = os.path.join(d, "chat_sessions.jsonl")
+        idx = os.path.join(d, "chat_sessions.idx")
+
+        with open(legacy, "w") as f:
+            json.dump([make_session(i, per_session) for i in range(n_sessions)], f)
+        SessionStore(log, idx, legacy_path=legacy)
+
+        print(f"archive: {n_sessions} sessions x {per_session} turns = {total} turns")
+        print(f"legacy json: {os.path.getsize(legacy) / 1e6:.1f} MB, "
+              f"log: {os.path.getsize(log) / 1e6:.1f} MB, index: {os.path.getsize(idx) / 1e3:.1f} kB")
+
+        before = run(LEGACY.format(path=legacy))
+        after = run(STORE.format(root=ROOT, log=log, idx=idx))
+
+    print(f"json.load (before):    {before['seconds'] * 1000:9.1f} ms   peak RSS {before['max_rss_kb'] / 1024:7.1f} MB")
+    print(f"SessionStore (after):  {after['seconds'] * 1000:9.1f} ms   peak RSS {after['max_rss_kb'] / 1024:7.1f} MB "
+          f"(of which {after['import_rss_kb'] / 1024:.1f} MB is module import)")
+
+
+if __name__ == "__main__":
+    main()
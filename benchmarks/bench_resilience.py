@@ -0,0 +1,94 @@
+"""
+Exercise ResilientTransport against the fault-injecting fake Groq
+endpoint:
+
+  1. transient 429/503 faults: fallbacks with the bare SDK vs. with retries
+  2. a slow tail: p50/p99 latency with and without hedging
+  3. a full outage: the circuit breaker opens and turns go straight to
+     the rule-based reply
+
+    python benchmarks/bench_resilience.py [--requests 200]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.dirname(HERE))
+
+import fake_groq
+
+HISTORY = [{"speaker": "user", "text": "I failed my exam"}]
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def run(responder, n):
+    latencies, failures = [], 0
+    for _ in range(n):
+        t0 = time.perf_counter()
+        try:
+            responder.generate("I failed my exam", "Negative", "neutral", HISTORY)
+        except Exception:
+            failures += 1
+        latencies.append(time.perf_counter() - t0)
+    return latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    server, base_url = fake_groq.start(latency_ms=20, token_ms=0)
+    os.environ["GROQ_BASE_URL"] = base_url
+    os.chdir(tempfile.mkdtemp())
+
+    import chatbot_sentiment as cs
+
+    # 1. transient faults
+    server.error_rate = 0.2
+    no_retry = cs.GroqLLMResponder(transport=cs.ResilientTransport(
+        max_attempts=1, breaker=cs.CircuitBreaker(failure_threshold=10 ** 9)))
+    with_retry = cs.GroqLLMResponder(transport=cs.ResilientTransport(base_delay=0.02))
+    _, f0 = run(no_retry, args.requests)
+    _, f1 = run(with_retry, args.requests)
+    print(f"20% injected 429/503: failures without retry {f0}/{args.requests}, "
+          f"with retry {f1}/{args.requests} ({with_retry.transport.retries} retries)")
+
+    # 2. latency tail
+    server.error_rate = 0.0
+    server.slow_rate, server.slow_extra = 0.05, 0.5
+    plain = cs.GroqLLMResponder(transport=cs.ResilientTransport())
+    hedged = cs.GroqLLMResponder(transport=cs.ResilientTransport(hedge=True))
+    lp, _ = run(plain, args.requests)
+    lh, _ = run(hedged, args.requests)
+    print(f"5% slow (+500 ms): no hedging p50 {pct(lp, 50) * 1000:.0f} ms / p99 {pct(lp, 99) * 1000:.0f} ms; "
+          f"hedged p50 {pct(lh, 50) * 1000:.0f} ms / p99 {pct(lh, 99) * 1000:.0f} ms "
+          f"({hedged.transport.hedges} hedges)")
+
+    # 3. outage
+    server.slow_rate = 0.0
+    server.error_rate = 1.0
+    bot = cs.Chatbot(llm=cs.GroqLLMResponder(transport=cs.ResilientTransport(
+        base_delay=0.01, breaker=cs.CircuitBreaker(failure_threshold=3, reset_timeout=60))))
+    server.requests = 0
+    t0 = time.perf_counter()
+    for _ in range(20):
+        bot.handle("my code keeps crashing")
+    elapsed = time.perf_counter() - t0
+    state = bot.llm.transport.breaker.state
+    print(f"100% errors: breaker {state}, {server.requests} requests reached the endpoint "
+          f"for 20 turns, {elapsed * 1000:.0f} ms total")
+    assert state == "open"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+SentimentRollups: a 12-month trend from the rollups vs from the archive.
+
+Builds a SessionStore of `sessions` x `turns` synthetic turns spread over
+the last year across `users` users, folds it into the rollups (one-time
+back-fill), then times an incremental sync of one new session, the
+queries behind `chatbot_sentiment.py report`, and the same daily trend
+computed by scanning every stored session.
+
+    python benchmarks/bench_rollups.py [sessions] [turns] [users]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import corpus
+from chatbot_sentiment import SentimentRollups, SessionStore
+
+
+def timed(fn, repeat=50):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    users = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    start = datetime(2025, 10, 1)
+    span = timedelta(days=365).total_seconds()
+    with tempfile.TemporaryDirectory() as d:
+        store = SessionStore(os.path.join(d, "s.jsonl"), os.path.join(d, "s.idx"), legacy_path=None)
+        for i, s in enumerate(corpus.sessions(n, turns)):
+            s["timestamp"] = str(start + timedelta(seconds=span * i / n))
+            s["user_id"] = f"user{i % users}"
+            store.append(s)
+        print(f"archive: {len(store)} sessions, {len(store) * turns} turns, {users} users, 12 months")
+
+        rollups = SentimentRollups(os.path.join(d, "rollups.db"))
+        t0 = time.perf_counter()
+        rollups.sync(store)
+        took = time.perf_counter() - t0
+        print(f"back-fill: {took:.1f} s ({len(store) / took:,.0f} sessions/s), "
+              f"db {os.path.getsize(os.path.join(d, 'rollups.db')) / 1e6:.1f} MB")
+
+        samples = []
+        for s in corpus.sessions(20, turns, seed=3):
+            s["timestamp"] = str(datetime(2026, 9, 30, 12))
+            s["user_id"] = "user0"
+            store.append(s)
+            t0 = time.perf_counter()
+            rollups.sync(store)
+            samples.append(time.perf_counter() - t0)
+        print(f"incremental sync of one new session: median {statistics.median(samples) * 1000:.2f} ms")
+
+        print("\nuser0, 12 months (median of 50)")
+        for grain in ("week", "day", "hour"):
+            ms, series = timed(lambda: rollups.series("user0", grain, since="2025-10-01"))
+            print(f"  series by {grain:<5} {ms:8.3f} ms   {len(series)} buckets")
+        ms, _ = timed(lambda: rollups.summary("user0", since="2025-10-01"))
+        print(f"  summary          {ms:8.3f} ms")
+        ms, _ = timed(lambda: SentimentRollups.streaks(rollups.series("user0", "day", since="2025-10-01")))
+        print(f"  negative streaks {ms:8.3f} ms")
+
+        # the same daily series without rollups: read every session
+        t0 = time.perf_counter()
+        days = {}
+        for s in store:
+            if s.get("user_id") != "user0":
+                continue
+            day = s["timestamp"][:10]
+            scores = [m["sentiment_score"] for m in s["history"] if m["speaker"] == "user"]
+            acc = days.setdefault(day, [0, 0.0])
+            acc[0] += len(scores)
+            acc[1] += sum(scores)
+        scan = time.perf_counter() - t0
+        ref = {b["bucket"]: b for b in rollups.series("user0", "day")}
+        agree = all(abs(ref[k]["mean"] - v[1] / v[0]) < 1e-9 for k, v in days.items())
+        print(f"\n  daily series by scanning the archive: {scan * 1000:.0f} ms "
+              f"(matches rollups: {agree})")
+        rollups.close()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
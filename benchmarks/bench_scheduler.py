@@ -0,0 +1,97 @@
+"""
+LLMScheduler against the local fake Groq endpoint, many sessions at once.
+
+1. Coalescing: N sessions send the same prompt at the same moment;
+   provider requests and latency with and without the scheduler.
+2. Rate limit and priority: a burst of unique prompts above the RPM
+   quota, a fifth of them from distressed users (negative streak > 0).
+   Reports the achieved request rate and the queue wait per class;
+   distressed turns should wait far less than casual ones.
+
+    python benchmarks/bench_scheduler.py [--sessions 50] [--burst 100] [--rpm 1200]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.dirname(HERE))
+
+import fake_groq
+
+HISTORY = [{"speaker": "user", "text": "hey"}]
+
+
+async def timed(coro):
+    t0 = time.perf_counter()
+    await coro
+    return time.perf_counter() - t0
+
+
+async def coalescing(cs, server, sessions):
+    print(f"{sessions} sessions, identical prompt, sent together")
+    for name, scheduler in (("no scheduler", None), ("LLMScheduler", cs.LLMScheduler(rpm=None, tpm=None))):
+        llm = cs.AsyncGroqLLMResponder(scheduler=scheduler)
+        await llm.generate("hello there", "Neutral", "neutral", HISTORY)   # open the connection pool
+        before = server.requests
+        lat = await asyncio.gather(*(
+            timed(llm.generate("how do I stop procrastinating", "Neutral", "neutral", HISTORY))
+            for _ in range(sessions)))
+        print(f"  {name:<14} provider requests {server.requests - before:4d}   "
+              f"p50 {statistics.median(lat) * 1000:6.1f} ms   max {max(lat) * 1000:6.1f} ms")
+        if scheduler is not None:
+            print(f"  {'':<14} coalesced {scheduler.coalesced}")
+
+
+async def priority(cs, burst, rpm):
+    metrics = cs.TurnMetrics()
+    scheduler = cs.LLMScheduler(rpm=rpm, tpm=None, metrics=metrics, burst_seconds=1.0)
+    llm = cs.AsyncGroqLLMResponder(scheduler=scheduler)
+    waits = {"distressed": [], "casual": []}
+
+    async def turn(i):
+        distressed = i % 5 == 0
+        t0 = time.perf_counter()
+        await llm.generate(f"message number {i}", "Negative" if distressed else "Neutral",
+                           "neutral", HISTORY, priority=3 if distressed else 0)
+        waits["distressed" if distressed else "casual"].append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(turn(i) for i in range(burst)))
+    wall = time.perf_counter() - t0
+    print(f"\n{burst} unique prompts at once, quota {rpm:g} RPM (burst of {rpm / 60:g})")
+    print(f"  achieved {burst / wall:.1f} req/s (quota {rpm / 60:.1f}/s), wall {wall:.2f} s")
+    for cls, lat in waits.items():
+        print(f"  {cls:<11} n={len(lat):3d}   p50 {statistics.median(lat) * 1000:7.1f} ms   "
+              f"max {max(lat) * 1000:7.1f} ms")
+    q = metrics.stages["llm_queue"].to_dict()
+    print(f"  llm_queue stage: count {q['count']}, p50 {q['p50']}, p99 {q['p99']}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=50)
+    ap.add_argument("--burst", type=int, default=100)
+    ap.add_argument("--rpm", type=float, default=1200)
+    args = ap.parse_args()
+
+    server, base_url = fake_groq.start(latency_ms=50, token_ms=0)
+    os.environ["GROQ_BASE_URL"] = base_url
+    os.chdir(tempfile.mkdtemp())
+
+    import chatbot_sentiment as cs
+    os.environ["GROQ_API_KEY"] = "bench"   # after the import, which sets a placeholder key
+
+    asyncio.run(coalescing(cs, server, args.sessions))
+    asyncio.run(priority(cs, args.burst, args.rpm))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
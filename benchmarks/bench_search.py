@@ -0,0 +1,103 @@
+"""
+ConversationIndex over a large archive.
+
+Builds a SessionStore of `sessions` x `turns` synthetic turns, back-fills
+the index on the catch-up thread, then times an incremental sync of one new session
+and "when did I talk about X" style queries (frequent word, rare word,
+two-word AND, topic, label), against a linear scan of the archive for
+the same answer.
+
+    python benchmarks/bench_search.py [sessions] [turns]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import corpus
+from chatbot_sentiment import ConversationIndex, SessionStore, search_tokens
+
+
+def timed(fn, repeat=50):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    with tempfile.TemporaryDirectory() as d:
+        store = SessionStore(os.path.join(d, "s.jsonl"), os.path.join(d, "s.idx"), legacy_path=None)
+        t0 = time.perf_counter()
+        for s in corpus.sessions(n, turns):
+            store.append(s)
+        store.append({"timestamp": "2026-06-01 12:00:00", "history": [
+            {"speaker": "user", "text": "my hamster escaped again", "sentiment_label": "Negative"}]})
+        print(f"archive: {len(store)} sessions, {len(store) * turns} turns "
+              f"(built in {time.perf_counter() - t0:.1f} s)")
+
+        index = ConversationIndex(os.path.join(d, "search.db"))
+        t0 = time.perf_counter()
+        index.follow(store)   # what saving a session does
+        print(f"follow() with {index.lag(store)} sessions unindexed: returned in "
+              f"{(time.perf_counter() - t0) * 1000:.2f} ms, back-fill runs on a thread")
+        index.catch_up(store).join()
+        took = time.perf_counter() - t0
+        print(f"back-fill: {took:.1f} s ({len(store) * turns / 2 / took:,.0f} user turns/s), "
+              f"db {os.path.getsize(os.path.join(d, 'search.db')) / 1e6:.0f} MB")
+
+        samples = []
+        for s in corpus.sessions(20, turns, seed=7):
+            store.append(s)
+            t0 = time.perf_counter()
+            index.sync(store)
+            samples.append(time.perf_counter() - t0)
+        print(f"incremental sync of one new session: median {statistics.median(samples) * 1000:.1f} ms, "
+              f"max {max(samples) * 1000:.1f} ms")
+
+        queries = [
+            ("frequent word 'exam'", dict(query="exam", limit=3, per_session=True)),
+            ("rare word 'hamster'", dict(query="hamster", limit=3, per_session=True)),
+            ("two words 'job offer'", dict(query="job offer", limit=3, per_session=True)),
+            ("topic 'work'", dict(query="work", limit=3, per_session=True)),
+            ("'exam' + label negative", dict(query="exam", label="Negative", limit=10)),
+            ("absent word 'zebra'", dict(query="zebra", limit=3)),
+        ]
+        print("\nquery latency (median of 50)")
+        for name, kwargs in queries:
+            ms, found = timed(lambda: index.search(**kwargs))
+            print(f"  {name:<28} {ms:8.3f} ms   {len(found)} hits")
+
+        # the same "last time I talked about exam" answer by reading the archive
+        t0 = time.perf_counter()
+        last = None
+        for i in range(len(store) - 1, -1, -1):
+            hist = store[i]["history"]
+            for j in range(len(hist) - 1, -1, -1):
+                if hist[j]["speaker"] == "user" and "exam" in search_tokens(hist[j]["text"]):
+                    last = (i, j)
+                    break
+            if last:
+                break
+        print(f"\n  linear scan, newest first, 'exam': {(time.perf_counter() - t0) * 1000:.3f} ms "
+              "(lucky: a frequent word is in the last session)")
+        t0 = time.perf_counter()
+        hits = sum(1 for s in store for m in s["history"]
+                   if m["speaker"] == "user" and "hamster" in search_tokens(m["text"]))
+        print(f"  linear scan, whole archive, 'hamster': {(time.perf_counter() - t0) * 1000:.0f} ms ({hits} hits)")
+        index.close()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Startup cost: module import time (from -X importtime) and wall-clock from
+interpreter start to the first reply, each measured in a fresh process.
+The first run in an empty directory also writes the VADER lexicon cache,
+so it is reported separately as "cold".
+
+Exits non-zero when the median of either number exceeds its threshold, so
+it can gate a CI job against startup regressions.
+
+    python benchmarks/bench_startup.py [--runs 5] [--max-import-ms 400] [--max-first-reply-ms 1500]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_groq
+
+FIRST_REPLY = """
+import sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {root!r})
+from chatbot_sentiment import Chatbot
+bot = Chatbot()
+bot.handle("I feel a bit down today, work has been rough")
+print(time.perf_counter() - t0)
+"""
+
+
+def import_ms(cwd):
+    """Cumulative import time of chatbot_sentiment as reported by -X importtime."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import chatbot_sentiment"],
+        cwd=cwd, env=dict(os.environ, PYTHONPATH=ROOT),
+        capture_output=True, text=True, check=True,
+    ).stderr
+    for line in out.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == "chatbot_sentiment":
+            return int(parts[1]) / 1000.0
+    raise RuntimeError("chatbot_sentiment missing from -X importtime output")
+
+
+def first_reply_ms(cwd, env):
+    out = subprocess.run(
+        [sys.executable, "-c", FIRST_REPLY.format(root=ROOT)],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return float(out.strip().splitlines()[-1]) * 1000.0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--max-import-ms", type=float, default=400.0)
+    ap.add_argument("--max-first-reply-ms", type=float, default=1500.0)
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    args = ap.parse_args()
+
+    server, base_url = fake_groq.start(latency_ms=args.latency_ms, token_ms=0)
+    env = dict(os.environ, GROQ_BASE_URL=base_url)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cold = first_reply_ms(tmp, env)
+        imports = [import_ms(tmp) for _ in range(args.runs)]
+        replies = [first_reply_ms(tmp, env) for _ in range(args.runs)]
+    server.shutdown()
+
+    imp = statistics.median(imports)
+    rep = statistics.median(replies)
+    print(f"import chatbot_sentiment : {imp:8.1f} ms  (median of {args.runs}, limit {args.max_import_ms:.0f})")
+    print(f"first reply, cold        : {cold:8.1f} ms  (writes the lexicon cache)")
+    print(f"first reply, warm        : {rep:8.1f} ms  (median of {args.runs}, limit {args.max_first_reply_ms:.0f})")
+    print(f"  includes {args.latency_ms:.0f} ms of simulated LLM latency")
+
+    failed = False
+    if imp > args.max_import_ms:
+        print("REGRESSION: import time over threshold")
+        failed = True
+    if rep > args.max_first_reply_ms:
+        print("REGRESSION: time to first reply over threshold")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
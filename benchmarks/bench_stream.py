@@ -0,0 +1,73 @@
+"""
+Time-to-first-token of Chatbot.handle_stream() vs. the blocking
+handle(), against the local fake Groq endpoint. Also checks that a
+stream dropped partway falls back to the rule-based reply and that the
+reply is recorded in history exactly once.
+
+    python benchmarks/bench_stream.py [--turns 20] [--latency-ms 200] [--token-ms 30]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.dirname(HERE))
+
+import fake_groq
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--token-ms", type=float, default=30.0)
+    args = parser.parse_args()
+
+    server, base_url = fake_groq.start(latency_ms=args.latency_ms, token_ms=args.token_ms)
+    os.environ["GROQ_BASE_URL"] = base_url
+    os.chdir(tempfile.mkdtemp())
+
+    from chatbot_sentiment import Chatbot
+
+    bot = Chatbot()
+    msg = "my project deadline is tomorrow and nothing works"
+
+    blocking = []
+    for _ in range(args.turns):
+        t0 = time.perf_counter()
+        bot.handle(msg)
+        blocking.append(time.perf_counter() - t0)
+
+    first, total = [], []
+    for _ in range(args.turns):
+        t0 = time.perf_counter()
+        chunks, _, _ = bot.handle_stream(msg)
+        for i, _chunk in enumerate(chunks):
+            if i == 0:
+                first.append(time.perf_counter() - t0)
+        total.append(time.perf_counter() - t0)
+
+    ms = lambda xs: statistics.median(xs) * 1000
+    print(f"handle():        full reply after {ms(blocking):7.1f} ms (median)")
+    print(f"handle_stream(): first chunk after {ms(first):7.1f} ms, "
+          f"full reply after {ms(total):7.1f} ms (median)")
+    print(f"responder TTFT (last turn): {bot.llm.last_ttft * 1000:.1f} ms")
+
+    # a stream that drops after three chunks must fall back cleanly
+    server.fail_stream_after = 3
+    n_before = len(bot.history)
+    chunks, label, _ = bot.handle_stream(msg)
+    text = "".join(chunks)
+    fallback = bot.generate_rule_based_reply(label, msg)
+    assert text.endswith(fallback), text
+    assert len(bot.history) == n_before + 2 and bot.history[-1]["text"] == fallback
+    print("mid-stream failure: fell back to rule-based reply, history recorded once")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Per-user memory at scale: UserMemoryStore over 100k users.
+
+Reports the bulk load, cold get() (SQLite read), hot get() (LRU hit),
+the per-turn mark_dirty(), an explicit save() of one user, and a churn
+phase where every turn goes to a random user, so dirty users are
+constantly written back on eviction (the background flush is off for
+these). Then a child process chats for several users through Chatbot's
+shared store and is SIGKILLed: each user's saved count must be within
+the flush interval of the turns it had taken.
+
+    python benchmarks/bench_user_store.py [users] [hot_capacity]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import signal
+import sqlite3
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from chatbot_sentiment import UserMemoryStore
+
+CHILD = """
+import os, sys, time
+sys.path.insert(0, {root!r})
+import chatbot_sentiment as cs
+os.environ["GROQ_API_KEY"] = ""   # after the import, which sets a placeholder key
+bots = [cs.Chatbot(user_id=f"user{{i}}") for i in range(5)]
+for turn in range(1, 1_000_000):
+    for bot in bots:
+        bot.handle("I failed the exam")
+    print(turn, time.monotonic(), flush=True)
+"""
+
+
+def fresh():
+    return {
+        "name": None, "tone": "neutral", "topics": set(),
+        "negative_streak": 0, "positive_streak": 0,
+        "neg_count": 0, "pos_count": 0, "last_sentiment": "Neutral",
+    }
+
+
+def timed(fn, items):
+    samples = []
+    for x in items:
+        t0 = time.perf_counter()
+        fn(x)
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return statistics.mean(samples) * 1e6, samples[int(0.99 * (len(samples) - 1))] * 1e6
+
+
+def report(name, result):
+    mean, p99 = result
+    print(f"  {name:<34} mean {mean:8.1f} µs   p99 {p99:8.1f} µs")
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    capacity = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+    rng = random.Random(11)
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "users.db")
+        store = UserMemoryStore(path, capacity=capacity, flush_interval=None)
+
+        t0 = time.perf_counter()
+        for i in range(users):
+            mem = fresh()
+            mem["name"] = f"user{i}"
+            mem["topics"] = {"work", "study"} if i % 3 else {"feelings"}
+            mem["neg_count"] = i % 17
+            store.mark_dirty(f"u{i}", mem)
+        store.flush()
+        print(f"{users} users, hot capacity {capacity}: loaded in {time.perf_counter() - t0:.1f} s, "
+              f"db {os.path.getsize(path) / 1e6:.1f} MB")
+
+        store.close()
+        store = UserMemoryStore(path, capacity=capacity, flush_interval=None)
+        ids = [f"u{rng.randrange(users)}" for _ in range(5000)]
+
+        report("get, cold (SQLite read)", timed(lambda u: store.get(u, fresh()), ids))
+        hot = ids[-capacity // 2:]
+        report("get, hot (LRU hit)", timed(lambda u: store.get(u, fresh()), hot * 4))
+        report("mark_dirty (per turn)", timed(lambda u: store.mark_dirty(u, store.get(u, fresh())), hot * 4))
+        report("save one user (commit)", timed(store.save, [u for u in hot for _ in (0,)][:500]))
+
+        # churn: a turn for a random user each time; misses evict dirty users
+        before = store.writebacks
+
+        def turn(u):
+            mem = store.get(u, fresh())
+            mem["neg_count"] += 1
+            store.mark_dirty(u, mem)
+
+        report("turn, random user (with write-back)", timed(turn, [f"u{rng.randrange(users)}" for _ in range(5000)]))
+        print(f"  write-backs during churn: {store.writebacks - before}")
+
+        t0 = time.perf_counter()
+        n = store.flush()
+        print(f"  flush of {n} dirty users: {(time.perf_counter() - t0) * 1000:.1f} ms")
+        print(f"  {store.stats()}")
+        store.close()
+
+    return crash_check()
+
+
+def crash_check(kills=5):
+    """SIGKILL a chatting process; the store must hold all but the last ~flush interval."""
+    failures = 0
+    for k in range(kills):
+        with tempfile.TemporaryDirectory() as d:
+            child = subprocess.Popen([sys.executable, "-c", CHILD.format(root=ROOT)],
+                                     cwd=d, stdout=subprocess.PIPE, text=True)
+            deadline = time.monotonic() + random.uniform(2.0, 3.0)
+            progress = []   # (turns done, when)
+            for line in child.stdout:
+                turn, when = line.split()
+                progress.append((int(turn), float(when)))
+                if float(when) > deadline:
+                    break
+            child.send_signal(signal.SIGKILL)
+            child.wait()
+            child.stdout.close()
+
+            killed_at = progress[-1][1]
+            # every turn finished more than 1.5 flush intervals before the kill must be on disk
+            expected = max((t for t, when in progress if when < killed_at - 1.5), default=0)
+            db = sqlite3.connect(os.path.join(d, "memory", "users.db"))
+            saved = {uid: json.loads(data)["neg_count"]
+                     for uid, data in db.execute("SELECT user_id, data FROM user_memory")}
+            db.close()
+            lost = [u for u in (f"user{i}" for i in range(5)) if saved.get(u, 0) < expected]
+            print(f"  kill {k}: {progress[-1][0]} turns per user taken, "
+                  f"saved {sorted(saved.values())}, expected at least {expected}"
+                  + (f"  LOST {lost}" if lost else ""))
+            failures += bool(lost)
+    print("  OK" if not failures else f"  {failures} FAILED")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
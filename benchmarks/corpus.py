@@ -0,0 +1,114 @@
+"""
+Synthetic, seeded corpora for the benchmarks: user messages of several
+shapes and whole archived sessions. The same seed always gives the same
+corpus, so runs on different commits see identical input.
+
+    from corpus import messages, sessions
+    msgs = messages(10_000, kind="slang", seed=1)
+"""
+
+import random
+from typing import Dict, List, Any
+
+OPENERS = ["", "honestly ", "ok so ", "idk ", "well, ", "so basically ", "tbh "]
+
+NEUTRAL = [
+    "I went to the store and bought some groceries",
+    "the meeting moved to thursday afternoon",
+    "can you remind me what we talked about",
+    "I have a class at nine tomorrow",
+    "my brother is visiting next week",
+]
+
+POSITIVE = [
+    "I am confident about the exam tomorrow",
+    "today was honestly great, the presentation went well",
+    "I love spending time with my family on weekends",
+    "got the job offer, I'm so happy",
+]
+
+NEGATIVE = [
+    "I failed in submission and I feel miserable",
+    "my job is stressing me out, nothing works",
+    "I'm feeling blue today",
+    "my girlfriend and I had another fight",
+    "I feel so tired and nobody listens to me",
+]
+
+SLANG = [
+    "jaa yrr, leave me alone",
+    "bro this is so mid lol",
+    "ugh my boss is such a loser fr",
+    "dude just go away",
+    "omg shut up, nah im done with this",
+    "wtf is wrong with my exam results",
+]
+
+CRISIS = [
+    "I want to die",
+    "sometimes I feel suicidal",
+    "I don't want to live anymore",
+    "I might hurt myself tonight",
+]
+
+FORMAL = [
+    "Could you please help me plan my studies for next week?",
+    "Kindly explain how I should prepare for the interview.",
+]
+
+GREETINGS = ["hi", "hello", "hey", "hiii", "how are you", "who am I", "tell me a joke", "bye"]
+
+KINDS = ("short", "long", "slang", "crisis", "repeated", "mixed")
+
+
+def _stretch(word: str, rng: random.Random) -> str:
+    # "so" -> "soooo": the repeated-character intensifier
+    i = rng.randrange(len(word))
+    return word[:i + 1] + word[i] * rng.randint(2, 6) + word[i + 1:]
+
+
+def message(kind: str, rng: random.Random) -> str:
+    if kind == "short":
+        return rng.choice(GREETINGS + ["ok", "fine", "sure", "no", "thanks"])
+    if kind == "long":
+        parts = [rng.choice(NEUTRAL + POSITIVE + NEGATIVE) for _ in range(rng.randint(6, 14))]
+        return ". ".join(parts) + "."
+    if kind == "slang":
+        return rng.choice(OPENERS) + rng.choice(SLANG)
+    if kind == "crisis":
+        return rng.choice(OPENERS) + rng.choice(CRISIS)
+    if kind == "repeated":
+        words = rng.choice(POSITIVE + NEGATIVE).split()
+        j = rng.randrange(len(words))
+        words[j] = _stretch(words[j], rng)
+        return " ".join(words) + "!" * rng.randint(1, 4)
+    if kind == "mixed":
+        return message(rng.choices(
+            ["short", "long", "slang", "crisis", "repeated", "plain"],
+            weights=[20, 5, 15, 2, 10, 48])[0], rng)
+    if kind == "plain":
+        return rng.choice(OPENERS) + rng.choice(NEUTRAL + POSITIVE + NEGATIVE + FORMAL)
+    raise ValueError(f"unknown message kind: {kind}")
+
+
+def messages(n: int, kind: str = "mixed", seed: int = 0) -> List[str]:
+    rng = random.Random(f"{kind}:{seed}")
+    return [message(kind, rng) for _ in range(n)]
+
+
+def sessions(n: int, turns: int = 40, seed: int = 0) -> List[Dict[str, Any]]:
+    """Archived sessions in the SessionStore.append() shape."""
+    rng = random.Random(f"sessions:{seed}")
+    out = []
+    for i in range(n):
+        history = []
+        for j in range(turns):
+            if j % 2 == 0:
+                score = round(rng.uniform(-1, 1), 4)
+                label = "Positive" if score > 0.05 else "Negative" if score < -0.05 else "Neutral"
+                history.append({"speaker": "user", "text": message("mixed", rng),
+                                "sentiment_label": label, "sentiment_score": score})
+            else:
+                history.append({"speaker": "bot", "text": "I understand. Tell me more so I can assist you better."})
+        out.append({"timestamp": f"2026-01-01 00:00:{i:06d}", "history": history})
+    return out
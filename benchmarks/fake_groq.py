@@ -0,0 +1,172 @@
+"""
+Local stand-in for the Groq chat-completions endpoint, for benchmarks.
+
+Point the SDK at it with GROQ_BASE_URL=http://127.0.0.1:<port>.
+Requests with "stream": true get server-sent events, one word per
+chunk, `token_ms` apart after the initial latency. Faults can be
+injected: a fraction of requests fail with 429 (with retry-after-ms) or
+503, and a fraction are slowed down to produce a latency tail.
+
+    python benchmarks/fake_groq.py [--port 8766] [--latency-ms 50] [--token-ms 10]
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = "Thanks for sharing that with me. What would help most right now?"
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True   # headers and body go out as separate writes
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, request):
+        srv = self.server
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send(data):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        words = REPLY.split(" ")
+        for i, word in enumerate(words):
+            if srv.fail_stream_after is not None and i >= srv.fail_stream_after:
+                return   # connection drops without the terminating chunk
+            if i:
+                time.sleep(srv.token_delay)
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": word if i == 0 else " " + word},
+                    "finish_reason": None if i < len(words) - 1 else "stop",
+                }],
+            }
+            send(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        send(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        srv = self.server
+        srv.requests += 1
+        roll = random.random()
+        if roll < srv.error_rate:
+            time.sleep(srv.latency / 4)
+            if roll < srv.error_rate / 2:
+                self.send_response(429)
+                self.send_header("retry-after-ms", "50")
+            else:
+                self.send_response(503)
+            body = b'{"error": {"message": "injected fault"}}'
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        delay = srv.latency + random.uniform(-srv.jitter, srv.jitter)
+        if random.random() < srv.slow_rate:
+            delay += srv.slow_extra
+        time.sleep(max(0.0, delay))
+        if request.get("stream"):
+            self._stream(request)
+            return
+        # a blocking completion costs as long as streaming every token
+        time.sleep(srv.token_delay * (len(REPLY.split(" ")) - 1))
+        self._send_json(200, {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": REPLY},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 50, "completion_tokens": 15, "total_tokens": 65},
+        })
+
+
+class FakeGroqServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024   # the default backlog of 5 stalls load tests
+
+    def handle_error(self, request, client_address):
+        # cancelled hedges and dropped streams close sockets mid-reply
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+def start(port=0, latency_ms=50.0, jitter_ms=0.0, token_ms=10.0, fail_stream_after=None,
+          error_rate=0.0, slow_rate=0.0, slow_ms=1000.0):
+    """
+    Start the fake endpoint in a daemon thread; returns (server, base_url).
+    `fail_stream_after` drops streaming connections after that many chunks.
+    The fault settings can also be changed on the returned server later.
+    """
+    server = FakeGroqServer(("127.0.0.1", port), FakeGroqHandler)
+    server.latency = latency_ms / 1000.0
+    server.jitter = jitter_ms / 1000.0
+    server.token_delay = token_ms / 1000.0
+    server.fail_stream_after = fail_stream_after
+    server.error_rate = error_rate
+    server.requests = 0
+    server.slow_rate = slow_rate
+    server.slow_extra = slow_ms / 1000.0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--token-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=1000.0)
+    args = parser.parse_args()
+
+    server, url = start(args.port, args.latency_ms, args.jitter_ms, args.token_ms,
+                        error_rate=args.error_rate, slow_rate=args.slow_rate, slow_ms=args.slow_ms)
+    print(f"fake Groq endpoint at {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Load test for `chatbot_sentiment.py serve` against a local fake Groq
+endpoint. Reports per-turn p50/p99 latency and sessions/second.
+
+The server's LLM rate limiter is off by default (--rpm 0 --tpm 0), so
+this measures the server; pass a quota to measure the limiter under load.
+
+    python benchmarks/loadtest_server.py [--sessions 200] [--turns 5] [--latency-ms 100]
+                                         [--rpm 0] [--tpm 0]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+import fake_groq
+
+MESSAGES = [
+    "I failed my exam today",
+    "my job is stressing me out",
+    "tell me something to cheer me up",
+    "I am confident about tomorrow!!",
+    "what should I study next?",
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_session(port, session_id, turns, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for i in range(turns):
+        line = f"{session_id} {MESSAGES[i % len(MESSAGES)]}\n"
+        t0 = time.perf_counter()
+        writer.write(line.encode("utf-8"))
+        await writer.drain()
+        json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - t0)
+    writer.write(f"{session_id} /end\n".encode("utf-8"))
+    await writer.drain()
+    await reader.readline()
+    writer.close()
+
+
+async def wait_for_port(port, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, w = await asyncio.open_connection("127.0.0.1", port)
+            w.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+async def main_async(args):
+    _, base_url = fake_groq.start(latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 4)
+    port = free_port()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, GROQ_BASE_URL=base_url)
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "chatbot_sentiment.py"), "serve", "--port", str(port),
+             "--rpm", str(args.rpm), "--tpm", str(args.tpm)],
+            cwd=workdir, env=env, stdout=subprocess.DEVNULL,
+        )
+        try:
+            await wait_for_port(port)
+            latencies = []
+            t0 = time.perf_counter()
+            await asyncio.gather(*(run_session(port, f"s{i}", args.turns, latencies)
+                                   for i in range(args.sessions)))
+            elapsed = time.perf_counter() - t0
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    print(f"sessions: {args.sessions} x {args.turns} turns, fake LLM latency {args.latency_ms:.0f} ms, "
+          f"quota rpm={args.rpm:g} tpm={args.tpm:g}")
+    print(f"p50 turn latency: {percentile(latencies, 50) * 1000:.1f} ms")
+    print(f"p99 turn latency: {percentile(latencies, 99) * 1000:.1f} ms")
+    print(f"throughput: {args.sessions / elapsed:.1f} sessions/s, {len(latencies) / elapsed:.1f} turns/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--rpm", type=float, default=0, help="quota passed to serve (0: no limit)")
+    parser.add_argument("--tpm", type=float, default=0, help="quota passed to serve (0: no limit)")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
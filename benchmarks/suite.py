@@ -0,0 +1,293 @@
+"""
+Reproducible benchmark suite: sentiment analysis, every Chatbot helper on
+the turn path, persistence over growing archives and end-to-end handle()
+turns against the local fake LLM. Inputs come from the seeded generators
+in corpus.py.
+
+Results are written as JSON; with --baseline the run is compared against
+a stored result file and the exit status is 1 when any benchmark got
+slower than --tolerance (default 25%; single runs of the µs-scale
+benchmarks vary by 10-20% on a busy machine).
+
+    python benchmarks/suite.py [--quick] [--only analyze] [--out results.json]
+                               [--baseline benchmarks/baseline.json] [--tolerance 0.25]
+
+Refresh the stored baseline after an intended change with
+    python benchmarks/suite.py --out benchmarks/baseline.json
+"""
+
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+import corpus
+import fake_groq
+
+
+def measure(fn, items, repeat=7):
+    """
+    Run fn over every item `repeat` times with the cyclic GC paused.
+    Reports the best and median time per item in microseconds; best is
+    what comparisons use, since it is the least disturbed by other load
+    on the machine.
+    """
+    runs = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for x in items:
+                fn(x)
+            runs.append((time.perf_counter() - t0) / len(items) * 1e6)
+    finally:
+        gc.enable()
+    best = min(runs)
+    return {"us_per_op": best, "median_us": statistics.median(runs),
+            "ops_per_s": 1e6 / best if best else None, "n": len(items)}
+
+
+def latency(samples_s):
+    samples = sorted(s * 1e6 for s in samples_s)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {"us_per_op": statistics.median(samples), "median_us": statistics.median(samples),
+            "p99_us": pick(0.99), "ops_per_s": 1e6 / statistics.median(samples), "n": len(samples)}
+
+
+# ---------- sentiment ----------
+
+def bench_analyze(n):
+    from chatbot_sentiment import HybridSentimentAnalyzer, SentimentMemo
+
+    analyzer = HybridSentimentAnalyzer(memo=None)   # the engine itself, not memo hits
+    analyzer.analyze("warm up")
+    out = {}
+    for kind in corpus.KINDS:
+        msgs = corpus.messages(n if kind != "long" else max(1, n // 10), kind)
+        out[f"analyze/{kind}"] = measure(analyzer.analyze, msgs)
+    out["rule_score/mixed"] = measure(analyzer._rule_score, corpus.messages(n, "mixed"))
+
+    memoized = HybridSentimentAnalyzer(memo=SentimentMemo())
+    out["analyze/mixed_memo"] = measure(memoized.analyze, corpus.messages(n, "mixed"))
+
+    msgs = corpus.messages(n, "mixed")
+    res = measure(lambda batch: analyzer.analyze_batch(batch), [msgs], repeat=3)
+    res["us_per_op"] /= n
+    res["median_us"] /= n
+    res["ops_per_s"] = 1e6 / res["us_per_op"]
+    res["n"] = n
+    out["analyze_batch/mixed"] = res
+    return out
+
+
+# ---------- Chatbot helpers ----------
+
+def bench_helpers(n):
+    from chatbot_sentiment import Chatbot, GroqLLMResponder
+
+    os.environ["GROQ_API_KEY"] = ""   # keep the helpers off the network
+    bot = Chatbot(llm=GroqLLMResponder())
+    msgs = corpus.messages(n, "mixed")
+    scored = [(m, *bot.analyzer.analyze(m)) for m in msgs]
+    hits = [bot._keyword_hits(m) for m in msgs]
+    pairs = list(zip(msgs, hits))
+
+    out = {
+        "helper/_keyword_hits": measure(bot._keyword_hits, msgs),
+        "helper/_extract_name": measure(bot._extract_name, msgs),
+        "helper/update_memory_from_text": measure(lambda p: bot.update_memory_from_text(*p), pairs),
+        "helper/update_sentiment_stats": measure(lambda s: bot.update_sentiment_stats(s[1]), scored),
+        "helper/detect_crisis": measure(lambda p: bot.detect_crisis(*p), pairs),
+        "helper/detect_special_cases": measure(lambda p: bot.detect_special_cases(*p), pairs),
+        "helper/_apply_tone": measure(lambda s: bot._apply_tone(s[0], s[1]), scored),
+        "helper/generate_rule_based_reply": measure(lambda s: bot.generate_rule_based_reply(s[1], s[0]), scored),
+    }
+    # these read the running aggregates, so fill them once first
+    for m, label, score in scored:
+        bot.add_user(m, label, score)
+    out["helper/add_user"] = measure(lambda s: bot.add_user(*s), scored, repeat=1)
+    out["helper/summary_sentiment"] = measure(lambda _: bot.summary_sentiment(), range(n))
+    out["helper/summarize_trend"] = measure(lambda _: bot.summarize_trend(windowed=True), range(n))
+    return out
+
+
+# ---------- persistence ----------
+
+def bench_persistence(sizes, turns=40):
+    from chatbot_sentiment import Chatbot, GroqLLMResponder, SessionStore
+
+    os.environ["GROQ_API_KEY"] = ""
+    out = {}
+    cwd = os.getcwd()
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as d:
+            os.chdir(d)
+            try:
+                store = SessionStore()
+                for s in corpus.sessions(size, turns):
+                    store.append(s)
+
+                llm = GroqLLMResponder()
+                bot = Chatbot(llm=llm, past_chats=store)
+                for m in corpus.sessions(1, turns, seed=1)[0]["history"]:
+                    bot.history.append(m)
+                out[f"persist/save_persistent_memory@{size}"] = measure(
+                    lambda _: bot.save_persistent_memory(), range(20), repeat=5)
+
+                # opening the archive: index read + last 10 turns, as at startup
+                out[f"persist/open_last_turns@{size}"] = measure(
+                    lambda _: SessionStore(legacy_path=None).last_turns(10), range(20), repeat=5)
+
+                store = SessionStore(legacy_path=None)
+                out[f"persist/read_session@{size}"] = measure(
+                    lambda i: store[i], [i * 7919 % len(store) for i in range(50)], repeat=5)
+            finally:
+                os.chdir(cwd)
+    return out
+
+
+# ---------- end to end ----------
+
+def bench_handle(turns, latency_ms):
+    from chatbot_sentiment import Chatbot, GroqLLMResponder, ResponseCache
+
+    out = {}
+    cwd = os.getcwd()
+    msgs = corpus.messages(turns, "mixed", seed=3)
+    with tempfile.TemporaryDirectory() as d:
+        os.chdir(d)
+        try:
+            os.environ["GROQ_API_KEY"] = ""
+            bot = Chatbot(llm=GroqLLMResponder())
+            bot.analyzer.analyze("warm up")
+            out["handle/rule_based"] = measure(bot.handle, msgs, repeat=5)
+
+            server, base_url = fake_groq.start(latency_ms=latency_ms, token_ms=0)
+            os.environ["GROQ_BASE_URL"] = base_url
+            os.environ["GROQ_API_KEY"] = "bench"
+            bot = Chatbot(llm=GroqLLMResponder())
+            bot.handle("hello there, warming up the connection")
+            samples = []
+            for m in msgs[:max(20, turns // 10)]:
+                t0 = time.perf_counter()
+                bot.handle(m)
+                samples.append(time.perf_counter() - t0)
+            out[f"handle/fake_llm_{latency_ms:g}ms"] = latency(samples)
+
+            bot = Chatbot(llm=GroqLLMResponder(), response_cache=ResponseCache())
+            for m in msgs[:20]:   # fill the cache, then time only repeats
+                bot.last_bot_reply = None
+                bot.handle(m)
+            samples = []
+            for m in msgs[:20] * 5:
+                bot.last_bot_reply = None   # same context every time, so repeats hit
+                t0 = time.perf_counter()
+                bot.handle(m)
+                samples.append(time.perf_counter() - t0)
+            out[f"handle/fake_llm_{latency_ms:g}ms_cached"] = latency(samples)
+            server.shutdown()
+        finally:
+            os.chdir(cwd)
+    return out
+
+
+# ---------- results ----------
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Print new vs baseline per benchmark; returns the names that regressed."""
+    regressed = []
+    print(f"\n{'benchmark':<44}{'baseline µs':>14}{'now µs':>12}{'ratio':>8}")
+    for name, res in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<44}{'-':>14}{res['us_per_op']:12.2f}{'new':>8}")
+            continue
+        ratio = res["us_per_op"] / base["us_per_op"] if base["us_per_op"] else float("inf")
+        flag = "  <-- slower" if ratio > 1 + tolerance else ""
+        if flag:
+            regressed.append(name)
+        print(f"{name:<44}{base['us_per_op']:14.2f}{res['us_per_op']:12.2f}{ratio:8.2f}{flag}")
+    return regressed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--quick", action="store_true", help="smaller inputs, for a smoke run")
+    ap.add_argument("--only", default=None, help="run only groups whose name contains this")
+    ap.add_argument("--out", default=None, help="write results JSON here")
+    ap.add_argument("--baseline", default=None, help="compare against this results JSON")
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    ap.add_argument("--latency-ms", type=float, default=20.0, help="fake LLM latency")
+    args = ap.parse_args()
+
+    n = 500 if args.quick else 5000
+    groups = {
+        "analyze": lambda: bench_analyze(n),
+        "helpers": lambda: bench_helpers(n),
+        "persistence": lambda: bench_persistence([100, 1000] if args.quick else [100, 1000, 10000]),
+        "handle": lambda: bench_handle(200 if args.quick else 1000, args.latency_ms),
+    }
+
+    results = {}
+    for name, run in groups.items():
+        if args.only and args.only not in name:
+            continue
+        t0 = time.perf_counter()
+        res = run()
+        results.update(res)
+        print(f"[{name}] {len(res)} benchmarks in {time.perf_counter() - t0:.1f} s")
+        for k, v in res.items():
+            extra = f"  p99 {v['p99_us']:.0f} µs" if "p99_us" in v else ""
+            print(f"  {k:<42}{v['us_per_op']:12.2f} µs/op{extra}")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+            "latency_ms": args.latency_ms,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nresults written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("quick") != args.quick:
+            print("\nnote: baseline and this run used different input sizes (--quick)")
+        regressed = compare(results, baseline["results"], args.tolerance)
+        if regressed:
+            print(f"\n{len(regressed)} benchmark(s) slower than baseline by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,31 +11,493 @@ Chatbot with Hybrid Sentiment + Groq LLaMA-3.1-8B – Tier 1 + Tier 2
 import os
 import re
 import json
-from datetime import datetime
-from typing import List, Tuple, Optional, Dict, Any
-
-from nltk.sentiment import SentimentIntensityAnalyzer
-from groq import Groq
+import mmap
+import heapq
+import time
+import random
+import asyncio
+import threading
+import contextvars
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait as wait_futures
+import struct
+from datetime import datetime, timedelta
+from itertools import count, islice
+from typing import List, Tuple, Optional, Dict, Any, Iterable, Iterator
+
+import numpy as np
+
+# nltk, groq and httpx are imported on first use: together they are most
+# of the cost of importing this module, and a rule-only turn needs none.
 
 # ---------- Persistent storage paths ----------
 
 MEMORY_DIR = "memory"
 USER_MEMORY_FILE = os.path.join(MEMORY_DIR, "user_memory.json")
-CHAT_HISTORY_FILE = os.path.join(MEMORY_DIR, "chat_sessions.json")
-CHAT_LOG_FILE = "chat_log.txt"
+CHAT_HISTORY_FILE = os.path.join(MEMORY_DIR, "chat_sessions.json")   # legacy, migrated once
+SESSION_LOG_FILE = os.path.join(MEMORY_DIR, "chat_sessions.jsonl")
+SESSION_INDEX_FILE = os.path.join(MEMORY_DIR, "chat_sessions.idx")
+CHAT_LOG_FILE = "chat_log.txt"   # legacy single file; new transcripts go to CHAT_LOG_DIR
+CHAT_LOG_DIR = "chat_logs"       # rotating, compressed segments (ChatLogWriter)
+RESPONSE_CACHE_FILE = os.path.join(MEMORY_DIR, "response_cache.json")
+USER_DB_FILE = os.path.join(MEMORY_DIR, "users.db")   # per-user memory (UserMemoryStore)
+SEARCH_DB_FILE = os.path.join(MEMORY_DIR, "search.db")   # inverted index over past turns
+ROLLUP_DB_FILE = os.path.join(MEMORY_DIR, "rollups.db")   # per-user sentiment by hour/day/week
+
+
+# ======================= KEYWORD PHRASE MATCHER =======================
+
+# Chatbot-side keyword lists. The analyzer folds these into its phrase
+# matcher so every rule is found in one pass over the message.
+CRISIS_PHRASES = [
+    "suicidal", "kill myself", "i want to die", "i wanna die",
+    "don't want to live", "life is meaningless",
+    "hurt myself", "self-harm", "cut myself",
+]
+
+CASUAL_MARKERS = {"bro", "dude", "lol", "lmao", "yrr", "u ", "omg", "yaar", "babe"}
+FORMAL_MARKERS = {"please", "kindly", "could you", "would you"}
+
+TOPIC_KEYWORDS = {
+    "study": ["exam", "test", "study", "assignment", "submission"],
+    "work": ["job", "work", "office", "career"],
+    "feelings": [
+        "sad", "upset", "happy", "depressed", "angry", "worried",
+        "confident", "blue", "suicidal"
+    ],
+    "problems": ["issue", "problem", "error", "bug", "failed"],
+}
+
+# prefix for topic categories reported by the matcher ("topic:study", ...)
+TOPIC_PREFIX = "topic:"
+
+
+class PhraseMatcher:
+    """
+    Aho–Corasick automaton over lowercase phrases grouped by category.
+    One scan of the text reports every phrase occurring in it as a
+    substring, so matching cost is O(len(text)) however long the
+    phrase lists grow.
+    """
+
+    def __init__(self, phrases: Dict[str, Iterable[str]]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[Tuple[str, str], ...]] = [()]
+
+        for category, words in phrases.items():
+            for w in words:
+                self._add(w.lower(), category)
+        self._build()
+
+    def _add(self, phrase: str, category: str) -> None:
+        if not phrase:
+            return
+        state = 0
+        for ch in phrase:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        if (phrase, category) not in self._out[state]:
+            self._out[state] += ((phrase, category),)
+
+    def _build(self) -> None:
+        # breadth-first so each failure target is finished before use
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+                queue.append(nxt)
+
+    def scan(self, text: str) -> List[Tuple[int, str, str]]:
+        """Return every (start, phrase, category) hit in lowercase `text`."""
+        goto, fail, out = self._goto, self._fail, self._out
+        hits = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for phrase, category in out[state]:
+                hits.append((i - len(phrase) + 1, phrase, category))
+        return hits
+
+    def categories(self, text: str) -> set:
+        """Return the set of categories with at least one hit in lowercase `text`."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for _, category in out[state]:
+                found.add(category)
+        return found
+
+
+# ======================= INTENT ROUTER =======================
+
+# prefix for intent categories reported by the matcher ("intent:joke", ...)
+INTENT_PREFIX = "intent:"
+
+
+class Intent:
+    """
+    One canned-reply intent.
+
+    It matches when any of `phrases` occurs in the lowercased message,
+    when the whole stripped message is one of `exact`, or when it
+    fullmatches `pattern`. With `word=True` phrase hits must also sit on
+    word boundaries (unless the router runs in substring_compat mode).
+    `handler(bot, text)` returns the reply, or None to let the next
+    matching intent answer; a string names a Chatbot method instead.
+    The highest `priority` wins, then registration order. Mark handlers
+    that read disk or a database `blocking=True`: async callers then run
+    the turn on an executor instead of the event loop.
+    """
+
+    __slots__ = ("name", "phrases", "exact", "pattern", "priority",
+                 "handler", "category", "word", "blocking", "_word_re")
+
+    def __init__(self, name: str, phrases: Iterable[str] = (), *,
+                 exact: Iterable[str] = (), pattern: Optional[str] = None,
+                 priority: int = 0, handler: Any = None,
+                 category: Optional[str] = None, word: bool = False,
+                 blocking: bool = False) -> None:
+        self.name = name
+        self.phrases = [p.lower() for p in phrases]
+        self.exact = [e.lower() for e in exact]
+        self.pattern = pattern
+        self.priority = priority
+        self.handler = handler
+        self.category = category or INTENT_PREFIX + name
+        self.word = word
+        self.blocking = blocking
+        self._word_re = (
+            re.compile(r"\b(?:" + "|".join(map(re.escape, self.phrases)) + r")\b")
+            if word and self.phrases else None
+        )
+
+    def __repr__(self) -> str:
+        return f"Intent({self.name!r}, priority={self.priority})"
+
+
+class IntentRouter:
+    """
+    Registry of intents compiled into one dispatcher: phrase intents share
+    an Aho–Corasick matcher, exact messages are a dict lookup and all
+    patterns are one alternation with a named group per intent. Routing a
+    message is one scan however many intents are registered.
+
+    When the analyzer's phrase matcher was built with this router (the
+    default), the keyword hits a turn already computed are reused and the
+    router does not scan at all.
+
+    `substring_compat=True` keeps the historic plain-substring matching for
+    word intents ("love" in "glove", "bye" in "maybe"); pass False for
+    word-boundary matching.
+    """
+
+    def __init__(self, intents: Iterable[Intent] = (), substring_compat: bool = True) -> None:
+        self.substring_compat = substring_compat
+        self._intents: Dict[str, Intent] = {}
+        self._order: Dict[str, int] = {}
+        self.version = 0
+        self._compiled = False
+        for intent in intents:
+            self.register(intent)
+
+    def register(self, intent: Intent) -> Intent:
+        """Add or replace an intent. Routers attached to an analyzer need
+        analyzer.rebuild_matcher() afterwards to keep the shared scan."""
+        self._order.setdefault(intent.name, len(self._order))
+        self._intents[intent.name] = intent
+        self.version += 1
+        self._compiled = False
+        return intent
+
+    def intent(self, name: str, phrases: Iterable[str] = (), **kwargs):
+        """Decorator form of register(): the function becomes the handler."""
+        def decorate(fn):
+            self.register(Intent(name, phrases, handler=fn, **kwargs))
+            return fn
+        return decorate
+
+    def unregister(self, name: str) -> None:
+        del self._intents[name]
+        del self._order[name]
+        self.version += 1
+        self._compiled = False
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._intents
+
+    def __len__(self) -> int:
+        return len(self._intents)
+
+    def phrases(self) -> Dict[str, List[str]]:
+        """Phrase lists by matcher category, for folding into another matcher."""
+        out: Dict[str, List[str]] = {}
+        for intent in self._intents.values():
+            if intent.phrases:
+                out.setdefault(intent.category, []).extend(intent.phrases)
+        return out
+
+    def _compile(self) -> None:
+        order = self._order
+        ranked = sorted(self._intents.values(), key=lambda i: (-i.priority, order[i.name]))
+        self._rank = {i.name: r for r, i in enumerate(ranked)}
+
+        self._by_category: Dict[str, List[Intent]] = {}
+        self._exact: Dict[str, List[Intent]] = {}
+        groups = []
+        self._by_group: Dict[str, Intent] = {}
+        for intent in ranked:
+            # every intent answers to its category, so hits from elsewhere
+            # (e.g. the embedding classifier) route too
+            self._by_category.setdefault(intent.category, []).append(intent)
+            for e in intent.exact:
+                self._exact.setdefault(e, []).append(intent)
+            if intent.pattern:
+                g = f"i{len(groups)}"
+                groups.append(f"(?P<{g}>{intent.pattern})")
+                self._by_group[g] = intent
+        self._pattern = re.compile("|".join(groups)) if groups else None
+        self._matcher = PhraseMatcher(self.phrases())
+        self._compiled = True
+
+    def candidates(self, text: str, hits: Optional[set] = None) -> List[Intent]:
+        """
+        Intents matching `text`, best first. `hits` are categories from a
+        matcher that includes this router's phrases; without them the
+        router scans the text itself.
+        """
+        if not self._compiled:
+            self._compile()
+        lower = text.lower()
+        t = lower.strip()
+        if hits is None:
+            hits = self._matcher.categories(lower)
+
+        found: Dict[str, Intent] = {}
+        for category in hits:
+            for intent in self._by_category.get(category, ()):
+                if intent._word_re is None or self.substring_compat or self._on_word(intent, lower):
+                    found[intent.name] = intent
+        for intent in self._exact.get(t, ()):
+            found[intent.name] = intent
+        if self._pattern is not None:
+            # alternatives are in rank order, so the reported group is the
+            # best pattern intent
+            m = self._pattern.fullmatch(t)
+            if m:
+                intent = self._by_group[m.lastgroup]
+                found[intent.name] = intent
+
+        rank = self._rank
+        return sorted(found.values(), key=lambda i: rank[i.name])
+
+    @staticmethod
+    def _on_word(intent: Intent, lower: str) -> bool:
+        # a phrase inside another word is rejected; a category hit with no
+        # phrase in the text at all came from elsewhere and stands
+        if intent._word_re.search(lower):
+            return True
+        return not any(p in lower for p in intent.phrases)
+
+    def route(self, bot: Any, text: str, hits: Optional[set] = None) -> Optional[str]:
+        """Reply from the best matching intent whose handler answers."""
+        for intent in self.candidates(text, hits):
+            handler = intent.handler
+            if isinstance(handler, str):
+                reply = getattr(bot, handler)(text)
+            else:
+                reply = handler(bot, text)
+            if reply is not None:
+                return reply
+        return None
+
+
+# "when did I talk about X": X is the rest of the message (empty when the
+# message stops at "about")
+SEARCH_QUERY_RE = re.compile(
+    r"(?:when did (?:i|we)(?: last)?|last time (?:i|we)) "
+    r"(?:talk(?:ed)?|mention(?:ed)?)\b(?:\s+about\b)?(?P<query>.*)"
+)
+
+JOKES = [
+    "Why do programmers hate nature? Too many bugs! 😄",
+    "Why do computers get cold? They forgot to close their Windows! 😂"
+]
+
+# The built-in intents, highest priority first. Crisis shares the analyzer's
+# "crisis" category so safety messaging always wins.
+DEFAULT_INTENTS = [
+    Intent("crisis", CRISIS_PHRASES, category="crisis", priority=100, handler="reply_crisis"),
+    Intent("search_history", ["when did i talk about", "when did we talk about", "when did i mention",
+                              "when did i last talk about", "when did we last talk about",
+                              "last time i talked about", "last time we talked about"],
+           priority=95, handler="reply_search_history", blocking=True),
+    Intent("previous_chat", ["previous chat", "last conversation"], priority=90,
+           handler="reply_previous_chat", blocking=True),
+    Intent("greeting", exact=["hi", "hii", "hello", "hey"], pattern=r"h+i+", priority=80,
+           handler="reply_greeting"),
+    Intent("how_are_you", ["how are you"], priority=70, handler="reply_how_are_you"),
+    Intent("who_am_i", ["who am i"], priority=60, handler="reply_who_am_i"),
+    Intent("love", ["love"], word=True, priority=50, handler="reply_love"),
+    Intent("joke", ["joke"], priority=40, handler="reply_joke"),
+    Intent("bye", ["bye"], word=True, priority=30, handler="reply_bye"),
+]
+
+DEFAULT_INTENT_ROUTER = IntentRouter(DEFAULT_INTENTS)
 
 
 # ======================= HYBRID SENTIMENT ENGINE =======================
 
+# Rule regexes are compiled once at import instead of on every message.
+EMO_FEELING_RE = re.compile(r"\b(i feel|i'm feeling|im feeling)\s+([a-z]+)")
+I_AM_RE = re.compile(r"\bi am\s+([a-z]+)")
+REPEATED_CHAR_RE = re.compile(r"(.)\1\1+")
+
+# VADER's lexicon parsed once and saved as JSON; reloading it skips the
+# nltk data lookup and the text parse on every later start. JSON, not
+# pickle: loading the cache must not be able to run code.
+VADER_LEXICON_CACHE = os.path.join(MEMORY_DIR, "vader_lexicon.json")
+
+_vader_lock = threading.Lock()
+
+
+def load_vader(cache_path: Optional[str] = VADER_LEXICON_CACHE):
+    """
+    Build a VADER analyzer, reusing the cached lexicon when it was written
+    by the same nltk version. Falls back to the stock constructor.
+    """
+    import nltk
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer, VaderConstants
+
+    if cache_path:
+        try:
+            with open(cache_path, encoding="utf-8") as f:
+                data = json.load(f)
+            lexicon = data["lexicon"]
+            if data["nltk"] == nltk.__version__ and all(
+                    isinstance(v, (int, float)) for v in lexicon.values()):
+                vader = SentimentIntensityAnalyzer.__new__(SentimentIntensityAnalyzer)
+                vader.lexicon = lexicon
+                vader.constants = VaderConstants()
+                return vader
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            pass
+
+    vader = SentimentIntensityAnalyzer()
+    if cache_path:
+        try:
+            write_json_atomic(cache_path, {"nltk": nltk.__version__, "lexicon": vader.lexicon}, indent=None)
+        except OSError:
+            pass
+    return vader
+
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_message(text: str) -> str:
+    """Collapse whitespace runs to one space and strip the ends."""
+    return WHITESPACE_RE.sub(" ", text).strip()
+
+
+class SentimentMemo:
+    """
+    Bounded, thread-safe LRU of analyze() results keyed on the exact text
+    plus the analyzer configuration, so a reweighted analyzer never sees
+    stale scores. The text is not normalized: VADER scores "The Shit" and
+    "the shit" differently, and the rules see whitespace (a phrase split
+    by a double space does not match; three spaces count as a repeated
+    character).
+
+    One instance (SHARED_SENTIMENT_MEMO) is used by every analyzer in the
+    process unless another one, or None, is passed in.
+    """
+
+    def __init__(self, capacity: int = 4096) -> None:
+        self.capacity = capacity
+        self._entries: "OrderedDict[Tuple[Any, str], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[Any, str]) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: Tuple[Any, str], result: Tuple[str, float]) -> None:
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+SHARED_SENTIMENT_MEMO = SentimentMemo()
+
+_DEFAULT_MEMO = object()
+
+
 class HybridSentimentAnalyzer:
     """
     Hybrid sentiment analyzer combining:
       - VADER sentiment
       - Custom rule-based emotional cue detection
+
+    Results of analyze() are memoized in `memo` (the process-wide
+    SHARED_SENTIMENT_MEMO by default; pass memo=None to turn it off).
+    After editing any word list or set, call rebuild_matcher(); the blend
+    weights are part of the memo key and can be changed freely.
+
+    The phrases of `intents` are folded into the phrase matcher so a
+    Chatbot using the same router routes from the turn's keyword hits.
     """
 
-    def __init__(self) -> None:
-        self.vader = SentimentIntensityAnalyzer()
+    def __init__(self, memo: Optional[SentimentMemo] = _DEFAULT_MEMO,
+                 intents: Optional[IntentRouter] = DEFAULT_INTENT_ROUTER) -> None:
+        self._vader = None
+        self.memo = SHARED_SENTIMENT_MEMO if memo is _DEFAULT_MEMO else memo
+        self.intents = intents
 
         self.failure_patterns = [
             "got failed", "failed in", "i failed", "did not pass",
@@ -61,14 +523,70 @@ class HybridSentimentAnalyzer:
             "go away", "leave me alone", "shut up"
         ]
 
-    def _rule_score(self, text: str) -> float:
+        self.feeling_blue = ["feeling blue", "feel blue"]
+
+        # blend weights for VADER compound vs. custom rule score
+        self.vader_weight = 0.8
+        self.rule_weight = 0.4
+
+        self.rebuild_matcher()
+
+    def rebuild_matcher(self) -> None:
+        """
+        Compile the shared phrase matcher and refresh the rule fingerprint
+        used in memo keys. Call again after editing any of the word lists
+        or sets above.
+        """
+        self.rules_fingerprint = hash((
+            tuple(self.failure_patterns), tuple(self.slang_negative), tuple(self.feeling_blue),
+            frozenset(self.extra_positive_words), frozenset(self.extra_negative_words),
+        ))
+        phrases = {
+            "failure": self.failure_patterns,
+            "slang_negative": self.slang_negative,
+            "feeling_blue": self.feeling_blue,
+            "crisis": CRISIS_PHRASES,
+            "tone_casual": CASUAL_MARKERS,
+            "tone_formal": FORMAL_MARKERS,
+        }
+        for topic, words in TOPIC_KEYWORDS.items():
+            phrases[TOPIC_PREFIX + topic] = words
+        self.intents_version = None
+        if self.intents is not None:
+            for category, words in self.intents.phrases().items():
+                phrases[category] = list(phrases.get(category, ())) + words
+            self.intents_version = self.intents.version
+        self.matcher = PhraseMatcher(phrases)
+
+    @property
+    def vader(self):
+        # built on first analyze() so constructing the analyzer stays cheap
+        if self._vader is None:
+            with _vader_lock:
+                if self._vader is None:
+                    self._vader = load_vader()
+        return self._vader
+
+    def warm_up(self) -> threading.Thread:
+        """
+        Load VADER on a daemon thread, e.g. while the first prompt is
+        waiting for input. analyze() simply blocks on the lock if it gets
+        there first.
+        """
+        t = threading.Thread(target=lambda: self.vader, daemon=True)
+        t.start()
+        return t
+
+    def _rule_score(self, text: str, hits: Optional[set] = None) -> float:
         t = text.lower()
         score = 0.0
+        if hits is None:
+            hits = self.matcher.categories(t)
 
-        if any(p in t for p in self.failure_patterns):
+        if "failure" in hits:
             score -= 0.6
 
-        emo = re.search(r"\b(i feel|i'm feeling|im feeling)\s+([a-z]+)", t)
+        emo = EMO_FEELING_RE.search(t)
         if emo:
             feeling = emo.group(2)
             if feeling in self.extra_positive_words:
@@ -76,7 +594,7 @@ class HybridSentimentAnalyzer:
             elif feeling in self.extra_negative_words:
                 score -= 0.7
 
-        iam = re.search(r"\bi am\s+([a-z]+)", t)
+        iam = I_AM_RE.search(t)
         if iam:
             feeling = iam.group(1)
             if feeling in self.extra_positive_words:
@@ -84,13 +602,13 @@ class HybridSentimentAnalyzer:
             elif feeling in self.extra_negative_words:
                 score -= 0.6
 
-        if any(p in t for p in self.slang_negative):
+        if "slang_negative" in hits:
             score -= 0.6
 
-        if "feeling blue" in t or "feel blue" in t:
+        if "feeling_blue" in hits:
             score -= 0.6
 
-        if re.search(r"(.)\1\1+", t):
+        if REPEATED_CHAR_RE.search(t):
             score *= 1.2
 
         ex = t.count("!")
@@ -99,13 +617,30 @@ class HybridSentimentAnalyzer:
 
         return max(-1.0, min(1.0, score))
 
-    def analyze(self, text: str) -> Tuple[str, float]:
+    def invalidate_memo(self) -> None:
+        """Drop every memoized result (e.g. after swapping the VADER lexicon)."""
+        if self.memo is not None:
+            self.memo.clear()
+
+    def analyze(self, text: str, hits: Optional[set] = None) -> Tuple[str, float]:
         if not text.strip():
             return "Neutral", 0.0
 
+        memo = self.memo
+        if memo is None:
+            return self._analyze(text, hits)
+
+        key = (self.rules_fingerprint, self.vader_weight, self.rule_weight, text)
+        result = memo.get(key)
+        if result is None:
+            result = self._analyze(text, hits)
+            memo.put(key, result)
+        return result
+
+    def _analyze(self, text: str, hits: Optional[set] = None) -> Tuple[str, float]:
         vs = self.vader.polarity_scores(text)["compound"]
-        rule = self._rule_score(text)
-        score = 0.8 * vs + 0.4 * rule
+        rule = self._rule_score(text, hits)
+        score = self.vader_weight * vs + self.rule_weight * rule
 
         score = max(-1.0, min(1.0, score))
 
@@ -118,22 +653,787 @@ class HybridSentimentAnalyzer:
 
         return label, score
 
+    # ---------- Batch scoring ----------
+    def analyze_batch(self, texts: Iterable[str]) -> List[Tuple[str, float]]:
+        """
+        Score many messages at once. Returns exactly what calling
+        analyze() on each text would, in the same order. Each distinct
+        text is scored once per call, and only if the memo does not
+        already hold it; archives and chat logs repeat short messages
+        ("ok", "thanks", "bye") constantly.
+        """
+        texts = list(texts)
+        slots: Dict[str, int] = {}
+        where = [slots.setdefault(t, len(slots)) for t in texts]
+        unique = list(slots)
+
+        memo = self.memo
+        config = (self.rules_fingerprint, self.vader_weight, self.rule_weight)
+        vs = np.zeros(len(unique), dtype=np.float64)
+        rule = np.zeros(len(unique), dtype=np.float64)
+        known: Dict[int, Tuple[str, float]] = {}
+
+        polarity = self.vader.polarity_scores
+        rule_score = self._rule_score
+        for i, text in enumerate(unique):
+            if not text.strip():
+                continue   # stays at 0.0 → Neutral, as in analyze()
+            cached = memo.get(config + (text,)) if memo is not None else None
+            if cached is not None:
+                known[i] = cached
+            else:
+                vs[i] = polarity(text)["compound"]
+                rule[i] = rule_score(text)
+
+        scores = np.clip(self.vader_weight * vs + self.rule_weight * rule, -1.0, 1.0)
+        labels = np.where(
+            scores > 0.05, "Positive",
+            np.where(scores < -0.05, "Negative", "Neutral")
+        )
+        results = [(str(l), float(sc)) for l, sc in zip(labels, scores)]
+        for i, cached in known.items():
+            results[i] = cached
+        if memo is not None:
+            for i, text in enumerate(unique):
+                if i not in known and text.strip():
+                    memo.put(config + (text,), results[i])
+        return [results[i] for i in where]
+
+    def analyze_iter(self, stream: Iterable[str], chunk_size: int = 4096) -> Iterator[Tuple[str, float]]:
+        """
+        Lazily score an arbitrarily long stream of messages, working
+        through it in chunks of `chunk_size` via analyze_batch().
+        """
+        it = iter(stream)
+        while True:
+            chunk = list(islice(it, chunk_size))
+            if not chunk:
+                return
+            yield from self.analyze_batch(chunk)
+
+
+# ======================= PROMPT CONTEXT BUILDER =======================
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; no tokenizer dependency
+    return max(1, (len(text) + 3) // 4)
+
+
+def _clip_tokens(text: str, max_tokens: int) -> str:
+    limit = max_tokens * 4
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+class ContextBuilder:
+    """
+    Incrementally maintained, token-budgeted conversation context for
+    LLM prompts.
+
+    Recent turns are kept verbatim up to `recent_budget` tokens. Turns
+    that fall out of that window are folded into a rolling summary of
+    short snippets. Every `refresh_every` folded turns the snippets are
+    handed to `summarizer` (if given) on a background thread; the
+    condensed text replaces them once it is back, and snippets folded in
+    the meantime are kept after it. Until then, and whenever the summary
+    exceeds `summary_budget`, the oldest snippets are dropped. Each add()
+    is O(1) amortised and never waits for the summarizer, and render() is
+    bounded by the two budgets, so prompt size stays flat as the
+    conversation grows.
+    """
+
+    _pool: Optional[ThreadPoolExecutor] = None   # shared by every builder
+    _pool_lock = threading.Lock()
+
+    def __init__(self, recent_budget: int = 300, summary_budget: int = 120,
+                 refresh_every: int = 8, snippet_tokens: int = 16,
+                 summarizer=None) -> None:
+        self.recent_budget = recent_budget
+        self.summary_budget = summary_budget
+        self.refresh_every = refresh_every
+        self.snippet_tokens = snippet_tokens
+        self.summarizer = summarizer    # callable: str -> str, e.g. an LLM call; run off the turn path
+
+        self._recent: deque = deque()   # (line, tokens)
+        self._recent_tokens = 0
+        self._condensed: Optional[Tuple[str, int]] = None   # last summarizer output
+        self._summary: deque = deque()  # (snippet, tokens, seq), folded since
+        self._summary_tokens = 0        # condensed text and snippets together
+        self._folded_since_refresh = 0
+        self._seq = 0
+        self._pending: Optional[Future] = None
+        self._pending_upto = 0          # last seq the pending summary covers
+
+    @classmethod
+    def _executor(cls) -> ThreadPoolExecutor:
+        with cls._pool_lock:
+            if cls._pool is None:
+                cls._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="context-summary")
+            return cls._pool
+
+    def add(self, speaker: str, text: str) -> None:
+        self._collect()
+        line = f"{speaker}: {_clip_tokens(text, self.recent_budget // 2)}"
+        tokens = estimate_tokens(line)
+        self._recent.append((line, tokens))
+        self._recent_tokens += tokens
+
+        while self._recent_tokens > self.recent_budget and len(self._recent) > 1:
+            old, old_tokens = self._recent.popleft()
+            self._recent_tokens -= old_tokens
+            self._fold(old)
+
+    def _fold(self, line: str) -> None:
+        snippet = _clip_tokens(line, self.snippet_tokens)
+        tokens = estimate_tokens(snippet)
+        self._seq += 1
+        self._summary.append((snippet, tokens, self._seq))
+        self._summary_tokens += tokens
+        self._folded_since_refresh += 1
+
+        if self._summary_tokens > self.summary_budget or (
+                self.summarizer is not None and self._folded_since_refresh >= self.refresh_every):
+            self._refresh_summary()
+
+    def _refresh_summary(self) -> None:
+        self._folded_since_refresh = 0
+        if self.summarizer is not None and self._pending is None:
+            self._pending_upto = self._seq
+            self._pending = self._executor().submit(self.summarizer, self._summary_text())
+        self._trim()
+
+    def _trim(self) -> None:
+        # the oldest snippets go first; the condensed text stays
+        keep = 0 if self._condensed is not None else 1
+        while self._summary_tokens > self.summary_budget and len(self._summary) > keep:
+            self._summary_tokens -= self._summary.popleft()[1]
+
+    def _collect(self) -> None:
+        # swap in a finished background summary; a failed one leaves the
+        # trimmed snippets in place
+        pending = self._pending
+        if pending is None or not pending.done():
+            return
+        self._pending = None
+        try:
+            text = _clip_tokens(pending.result().strip(), self.summary_budget // 2)
+        except Exception:
+            return
+        if not text:
+            return
+        while self._summary and self._summary[0][2] <= self._pending_upto:
+            self._summary.popleft()
+        self._condensed = (text, estimate_tokens(text))
+        self._summary_tokens = self._condensed[1] + sum(t for _, t, _ in self._summary)
+        self._trim()
+
+    def _summary_text(self) -> str:
+        parts = [s for s, _, _ in self._summary]
+        if self._condensed is not None:
+            parts.insert(0, self._condensed[0])
+        return " | ".join(parts)
+
+    @property
+    def tokens(self) -> int:
+        return self._recent_tokens + self._summary_tokens
+
+    def render(self) -> str:
+        self._collect()
+        recent = " | ".join(line for line, _ in self._recent)
+        if not self._summary and self._condensed is None:
+            return recent
+        return f"Earlier: {self._summary_text()}\nRecent: {recent}"
+
+
+# ======================= RESILIENT LLM TRANSPORT =======================
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the provider while the breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker. After `failure_threshold` failed
+    calls it opens for `reset_timeout` seconds, then lets a single trial
+    call through (half-open); success closes it, failure re-opens it.
+    Every allowed call must end in record_success(), record_failure() or
+    release(); release() hands the trial slot back without a verdict.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected (no trial slot available)."""
+        state = self.state
+        return state == "open" or (state == "half-open" and self._trial_in_flight)
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release(self) -> None:
+        # the call said nothing about the provider (cancelled, or a request
+        # it rejected); the next call may be the trial instead
+        with self._lock:
+            self._trial_in_flight = False
+
+
+def _retry_delay_hint(exc: Exception) -> Optional[float]:
+    """Seconds the provider asked us to wait, from rate-limit headers."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000.0
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+def _is_retryable(exc: Exception) -> bool:
+    import groq
+    import httpx
+
+    if isinstance(exc, (groq.APIConnectionError, groq.RateLimitError, groq.InternalServerError)):
+        return True
+    if isinstance(exc, groq.APIStatusError):
+        return exc.status_code in (408, 409) or exc.status_code >= 500
+    return isinstance(exc, (httpx.TransportError, TimeoutError))
+
+
+def _is_provider_failure(exc: Exception) -> bool:
+    """False for a 4xx the provider answered on purpose (bad request, auth): it is up."""
+    import groq
+
+    if isinstance(exc, groq.APIStatusError) and not _is_retryable(exc):
+        return exc.status_code >= 500
+    return True
+
+
+class ResilientTransport:
+    """
+    Wraps provider calls with:
+      - a per-request deadline covering all attempts
+      - jittered exponential backoff, honouring retry-after headers
+      - optional hedging: a second request fired once the first has run
+        longer than the recent p95 latency; the first result wins
+      - a circuit breaker that rejects calls while the provider is down
+
+    `request(timeout)` performs one attempt with the given timeout.
+    """
+
+    def __init__(self, deadline: float = 20.0, max_attempts: int = 4,
+                 base_delay: float = 0.25, max_delay: float = 8.0,
+                 hedge: bool = False, hedge_min_delay: float = 0.05,
+                 breaker: Optional[CircuitBreaker] = None) -> None:
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = breaker or CircuitBreaker()
+
+        self._latencies: deque = deque(maxlen=200)
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+        self.retries = 0
+        self.hedges = 0
+        self.rejected = 0
+
+    # ---------- policy ----------
+    def _backoff(self, attempt: int, exc: Exception) -> float:
+        hint = _retry_delay_hint(exc)
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = random.uniform(0.0, cap)   # full jitter
+        return max(delay, hint) if hint is not None else delay
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self._latencies) < 20:
+            return None
+        ordered = sorted(self._latencies)
+        return max(self.hedge_min_delay, ordered[int(0.95 * (len(ordered) - 1))])
+
+    def _check_breaker(self) -> None:
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError("LLM provider circuit is open")
+
+    # ---------- sync ----------
+    def _attempt(self, request, timeout):
+        started = time.perf_counter()
+        delay = self.hedge_delay()
+        if delay is None or delay >= timeout:
+            result = request(timeout)
+            self._latencies.append(time.perf_counter() - started)
+            return result
+
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+        futures = [self._pool.submit(request, timeout)]
+        done, _ = wait_futures(futures, timeout=delay)
+        if not done:
+            self.hedges += 1
+            futures.append(self._pool.submit(request, max(0.0, timeout - delay)))
+
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait_futures(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    self._latencies.append(time.perf_counter() - started)
+                    return f.result()
+                error = f.exception()
+        raise error
+
+    def _settle(self, outcome: Optional[bool]) -> None:
+        # None: interrupted or rejected by the provider, so no verdict
+        if outcome is None:
+            self.breaker.release()
+        elif outcome:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def call(self, request):
+        self._check_breaker()
+        outcome = None
+        try:
+            end = time.monotonic() + self.deadline
+            attempt = 0
+            while True:
+                try:
+                    result = self._attempt(request, max(0.01, end - time.monotonic()))
+                except Exception as e:
+                    attempt += 1
+                    delay = self._backoff(attempt, e) if _is_retryable(e) else None
+                    if delay is None or attempt >= self.max_attempts or time.monotonic() + delay >= end:
+                        outcome = False if _is_provider_failure(e) else None
+                        raise
+                    self.retries += 1
+                    time.sleep(delay)
+                    continue
+                outcome = True
+                return result
+        finally:
+            self._settle(outcome)
+
+    # ---------- async ----------
+    async def _attempt_async(self, request, timeout):
+        started = time.perf_counter()
+        delay = self.hedge_delay()
+        if delay is None or delay >= timeout:
+            result = await request(timeout)
+            self._latencies.append(time.perf_counter() - started)
+            return result
+
+        tasks = [asyncio.ensure_future(request(timeout))]
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            self.hedges += 1
+            tasks.append(asyncio.ensure_future(request(max(0.0, timeout - delay))))
+
+        error = None
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        self._latencies.append(time.perf_counter() - started)
+                        return t.result()
+                    error = t.exception()
+            raise error
+        finally:
+            for t in pending:
+                t.cancel()
+
+    async def call_async(self, request):
+        self._check_breaker()
+        outcome = None
+        try:
+            end = time.monotonic() + self.deadline
+            attempt = 0
+            while True:
+                try:
+                    result = await self._attempt_async(request, max(0.01, end - time.monotonic()))
+                except Exception as e:
+                    attempt += 1
+                    delay = self._backoff(attempt, e) if _is_retryable(e) else None
+                    if delay is None or attempt >= self.max_attempts or time.monotonic() + delay >= end:
+                        outcome = False if _is_provider_failure(e) else None
+                        raise
+                    self.retries += 1
+                    await asyncio.sleep(delay)
+                    continue
+                outcome = True
+                return result
+        finally:
+            # also runs on CancelledError, which must not strand the trial slot
+            self._settle(outcome)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "rejected": self.rejected,
+            "breaker": self.breaker.state,
+            "hedge_delay_s": self.hedge_delay(),
+        }
+
+
+# pooled keep-alive connections shared by every request of one client
+def http_limits():
+    import httpx
+    return httpx.Limits(max_connections=200, max_keepalive_connections=50, keepalive_expiry=60.0)
+
+
+# ======================= LLM DISPATCH SCHEDULER =======================
+
+class TokenBucket:
+    """
+    Refills `rate` units per second up to `capacity`. The level may go
+    below zero when a call turned out to cost more than was reserved;
+    the debt is paid back by refill before the next grant.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (0.0 when it can be now)."""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        # a request larger than the whole bucket still goes once it is full
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+
+class QueueTimeoutError(RuntimeError):
+    """Raised when a call waited longer than the scheduler's `max_wait` for its grant."""
+
+
+class LLMScheduler:
+    """
+    Admission control in front of the LLM provider, shared by every
+    responder (and so every session) of a process:
+
+      - single-flight: a request whose key (model, sampling settings and
+        both prompts) is already in flight waits for that call's result
+        instead of issuing its own
+      - token buckets sized to the account's requests- and tokens-per-
+        minute quota, so bursts queue here instead of coming back as 429s
+      - a priority queue: when calls have to wait, higher `priority`
+        (Chatbot uses the user's negative streak) is granted first, FIFO
+        within a level; a waiting duplicate raises the queued call to its
+        own priority
+
+    Grants are handed out by a daemon thread as concurrent Futures, so
+    sync callers block on them and async callers await them without
+    holding the event loop. `burst_seconds` of quota may be spent at once
+    (a full minute by default, as the provider counts per minute). A call
+    still waiting after `max_wait` seconds gives up its place and raises
+    QueueTimeoutError, so the turn falls back to a rule-based reply
+    instead of queueing behind an ever longer backlog. With `metrics`,
+    queue waits are recorded as the "llm_queue" stage, shared results as
+    "llm_coalesced" and given-up calls as "llm_rejected". The caller's own wait is also left
+    in `LLMScheduler.waited`, a context variable (so per thread and per
+    asyncio task), for callers that time the whole request.
+    """
+
+    waited: "contextvars.ContextVar[float]" = contextvars.ContextVar("llm_queue_wait", default=0.0)
+
+    # Groq's free-tier quota for llama-3.1-8b-instant; pass the account's own
+    def __init__(self, rpm: Optional[float] = 30, tpm: Optional[float] = 6000,
+                 metrics: Optional["TurnMetrics"] = None,
+                 burst_seconds: float = 60.0,
+                 max_wait: Optional[float] = 5.0) -> None:
+        self.requests = TokenBucket(rpm / 60.0, rpm / 60.0 * burst_seconds) if rpm else None
+        self.tokens = TokenBucket(tpm / 60.0, tpm / 60.0 * burst_seconds) if tpm else None
+        self.metrics = metrics
+        self.max_wait = max_wait   # None: wait as long as it takes
+
+        # heap entries are [-priority, seq, key, cost, queued_at, grant]
+        self._heap: List[list] = []
+        self._seq = count()
+        self._queued: Dict[Any, list] = {}       # key -> its heap entry, until granted
+        self._inflight: Dict[Any, Future] = {}   # key -> the shared result
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+        self.granted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.queue_wait = LatencyHistogram()
+
+    # ---------- dispatch ----------
+    def _push(self, key: Any, cost: float, priority: int) -> Future:
+        grant = Future()
+        entry = [-priority, next(self._seq), key, cost, time.perf_counter(), grant]
+        heapq.heappush(self._heap, entry)
+        if key is not None:
+            self._queued[key] = entry
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="llm-scheduler", daemon=True)
+            self._thread.start()
+        self._cond.notify()
+        return grant
+
+    def _delay(self, cost: float) -> float:
+        now = time.monotonic()
+        delay = self.requests.wait_time(1, now) if self.requests else 0.0
+        if self.tokens:
+            delay = max(delay, self.tokens.wait_time(cost, now))
+        return delay
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                entry = self._heap[0]
+                _, _, key, cost, queued_at, grant = entry
+                if not grant.cancelled():
+                    delay = self._delay(cost)
+                    if delay > 0:
+                        # a more urgent arrival wakes us and is picked instead
+                        self._cond.wait(delay)
+                        continue
+                heapq.heappop(self._heap)
+                if key is not None and self._queued.get(key) is entry:
+                    del self._queued[key]
+                if not grant.set_running_or_notify_cancel():
+                    continue
+                if self.requests:
+                    self.requests.take(1)
+                if self.tokens:
+                    self.tokens.take(cost)
+                self.granted += 1
+            waited = time.perf_counter() - queued_at
+            self.queue_wait.observe(waited)
+            if self.metrics is not None:
+                self.metrics.observe("llm_queue", waited)
+            grant.set_result(waited)
+
+    def _reject(self, grant: Future) -> bool:
+        # the wait ran out; False when the grant came through meanwhile
+        if not grant.cancel():
+            return False
+        with self._cond:
+            self.rejected += 1
+        if self.metrics is not None:
+            self.metrics.incr("llm_rejected")
+        return True
+
+    def charge(self, tokens: float) -> None:
+        """Correct the token bucket once a call's real usage is known."""
+        if self.tokens and tokens:
+            with self._cond:
+                self.tokens.take(tokens)
+
+    # ---------- single-flight ----------
+    def _join(self, key: Any, cost: float, priority: int) -> Tuple[Optional[Future], Future]:
+        # returns (grant, shared) for the leader, (None, shared) for a duplicate
+        with self._cond:
+            shared = self._inflight.get(key) if key is not None else None
+            if shared is None:
+                shared = Future()
+                if key is not None:
+                    self._inflight[key] = shared
+                return self._push(key, cost, priority), shared
+
+            self.coalesced += 1
+            if self.metrics is not None:
+                self.metrics.incr("llm_coalesced")
+            entry = self._queued.get(key)
+            if entry is not None and -priority < entry[0]:
+                entry[0] = -priority
+                heapq.heapify(self._heap)
+                self._cond.notify()
+            return None, shared
+
+    def _settle(self, key: Any, shared: Future, result: Any = None,
+                error: Optional[BaseException] = None) -> None:
+        with self._cond:
+            if key is not None and self._inflight.get(key) is shared:
+                del self._inflight[key]
+        if error is None:
+            shared.set_result(result)
+        else:
+            if not isinstance(error, Exception):
+                # duplicates should fail like a failed call, not look cancelled
+                error = RuntimeError("shared LLM request was cancelled")
+            shared.set_exception(error)
+
+    def run(self, key: Any, cost: float, priority: int, call):
+        """
+        Run `call()` once granted and return its result. `cost` is the
+        token reservation; a `key` of None opts out of coalescing.
+        """
+        self.waited.set(0.0)
+        grant, shared = self._join(key, cost, priority)
+        if grant is None:
+            return shared.result()
+        try:
+            try:
+                waited = grant.result(timeout=self.max_wait)
+            except TimeoutError:
+                if self._reject(grant):
+                    raise QueueTimeoutError(f"no LLM quota within {self.max_wait:g} s") from None
+                waited = grant.result()
+            self.waited.set(waited)
+            result = call()
+        except BaseException as e:
+            grant.cancel()
+            self._settle(key, shared, error=e)
+            raise
+        self._settle(key, shared, result)
+        return result
+
+    async def run_async(self, key: Any, cost: float, priority: int, call):
+        """Async run(): `call()` returns an awaitable."""
+        self.waited.set(0.0)
+        grant, shared = self._join(key, cost, priority)
+        if grant is None:
+            # shielded: a cancelled duplicate must not cancel the shared call
+            return await asyncio.shield(asyncio.wrap_future(shared))
+        try:
+            granted = asyncio.wrap_future(grant)
+            try:
+                # shielded: on timeout the grant is cancelled here, and only if still queued
+                waited = await asyncio.wait_for(asyncio.shield(granted), self.max_wait)
+            except TimeoutError:
+                if self._reject(grant):
+                    raise QueueTimeoutError(f"no LLM quota within {self.max_wait:g} s") from None
+                waited = await granted
+            self.waited.set(waited)
+            result = await call()
+        except BaseException as e:
+            grant.cancel()   # a cancelled caller must not keep its place in the queue
+            self._settle(key, shared, error=e)
+            raise
+        self._settle(key, shared, result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            queued = len(self._heap)
+            inflight = len(self._inflight)
+        return {
+            "granted": self.granted,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "queued": queued,
+            "in_flight": inflight,
+            "queue_wait": self.queue_wait.to_dict(),
+        }
+
 
 # ======================= GROQ LLaMA-3.1-8B RESPONDER =======================
 
 os.environ["GROQ_API_KEY"] = "your api key"
 
 class GroqLLMResponder:
-    def __init__(self, model: str = "llama-3.1-8b-instant") -> None:
-        api_key = os.getenv("GROQ_API_KEY", "")
-        if api_key:
-            self.client = Groq(api_key=api_key)
-        else:
-            self.client = None
+    def __init__(self, model: str = "llama-3.1-8b-instant",
+                 transport: Optional[ResilientTransport] = None,
+                 scheduler: Optional[LLMScheduler] = None) -> None:
+        self.api_key = os.getenv("GROQ_API_KEY", "")
+        self._client = None
+        self._client_lock = threading.Lock()
         self.model = model
+        self.transport = transport or ResilientTransport()
+        self.scheduler = scheduler   # None: every call goes straight out
+        # seconds from request to first streamed token of the last stream
+        self.last_ttft: Optional[float] = None
+
+    def _make_client(self):
+        from groq import Groq
+        import httpx
+        # retries are handled by the transport, not the SDK
+        return Groq(api_key=self.api_key, max_retries=0,
+                    http_client=httpx.Client(limits=http_limits()))
+
+    @property
+    def client(self):
+        # the SDK and its connection pool are only built for the first request
+        if self._client is None and self.api_key:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._make_client()
+        return self._client
 
     def is_available(self):
-        return self.client is not None
+        # an open breaker routes turns straight to the rule-based reply
+        return bool(self.api_key) and not self.transport.breaker.is_open()
+
+    # ---------- dispatch ----------
+    def _request_key(self, messages, max_tokens):
+        return (self.model, max_tokens, tuple(m["content"] for m in messages))
+
+    @staticmethod
+    def _request_cost(messages, max_tokens):
+        # tokens reserved against the TPM bucket: prompt estimate + reply cap
+        return sum(estimate_tokens(m["content"]) for m in messages) + max_tokens
+
+    def _charged(self, completion, cost):
+        # settle the reservation against the usage the provider reports
+        usage = getattr(completion, "usage", None)
+        total = getattr(usage, "total_tokens", None)
+        if isinstance(total, int):
+            self.scheduler.charge(total - cost)
+        return completion
+
+    def _call(self, request, messages, max_tokens, priority=0, shared=True):
+        if self.scheduler is None:
+            return self.transport.call(request)
+        cost = self._request_cost(messages, max_tokens)
+        key = self._request_key(messages, max_tokens) if shared else None
+        return self.scheduler.run(
+            key, cost, priority, lambda: self._charged(self.transport.call(request), cost)
+        )
 
     def build_system_prompt(self, tone: str, sentiment: str):
         base = (
@@ -160,37 +1460,2583 @@ class GroqLLMResponder:
         txt += "Reply directly. Do not mention sentiment or being an AI.\n"
         return txt
 
-    def generate(self, user_message, sentiment, tone, history):
+    def build_messages(self, user_message, sentiment, tone, history, context=None):
+        if context is not None:
+            ctx = context.render()
+        else:
+            recent = []
+            for m in history[-4:]:
+                recent.append(f"{m['speaker']}: {m['text']}")
+            ctx = " | ".join(recent)
+
+        system = self.build_system_prompt(tone, sentiment)
+        user = self.build_user_prompt(user_message, ctx)
+        return [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user}
+        ]
+
+    def generate(self, user_message, sentiment, tone, history, context=None, priority=0):
         if not self.is_available():
             raise RuntimeError("Groq not available")
 
-        recent = []
-        for m in history[-4:]:
-            recent.append(f"{m['speaker']}: {m['text']}")
-        ctx = " | ".join(recent)
+        messages = self.build_messages(user_message, sentiment, tone, history, context)
+        completion = self._call(
+            lambda timeout: self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=200,
+                timeout=timeout
+            ),
+            messages, 200, priority
+        )
+        return completion.choices[0].message.content.strip()
 
-        system = self.build_system_prompt(tone, sentiment)
-        user = self.build_user_prompt(user_message, ctx)
+    def summarize(self, text: str) -> str:
+        """
+        Condense older conversation turns; Chatbot's ContextBuilder calls
+        this in the background. It queues behind every reply.
+        """
+        if not self.is_available():
+            raise RuntimeError("Groq not available")
+
+        messages = [
+            {"role": "system", "content": "Summarize this conversation excerpt in at most two short sentences."},
+            {"role": "user", "content": text}
+        ]
+        completion = self._call(
+            lambda timeout: self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.2,
+                max_tokens=80,
+                timeout=timeout
+            ),
+            messages, 80, priority=-1
+        )
+        return completion.choices[0].message.content.strip()
+
+    def generate_stream(self, user_message, sentiment, tone, history, context=None,
+                        priority=0) -> Iterator[str]:
+        """Yield reply text chunks as they arrive from the model."""
+        if not self.is_available():
+            raise RuntimeError("Groq not available")
 
-        completion = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user}
-            ],
-            temperature=0.7,
-            max_tokens=200
+        self.last_ttft = None
+        start = time.perf_counter()
+        messages = self.build_messages(user_message, sentiment, tone, history, context)
+        # retries and the breaker cover opening the stream, never a
+        # half-delivered reply; a stream has one consumer, so it is rate
+        # limited but never shared
+        stream = self._call(
+            lambda timeout: self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=200,
+                stream=True,
+                timeout=timeout
+            ),
+            messages, 200, priority, shared=False
+        )
+        finished = False
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            delta = choice.delta.content
+            if delta:
+                if self.last_ttft is None:
+                    self.last_ttft = time.perf_counter() - start
+                yield delta
+            finished = finished or choice.finish_reason is not None
+        if not finished:
+            raise RuntimeError("stream ended before the reply was complete")
+
+
+class AsyncGroqLLMResponder(GroqLLMResponder):
+    """Same prompts as GroqLLMResponder, but awaits the completion."""
+
+    def _make_client(self):
+        from groq import AsyncGroq
+        import httpx
+        return AsyncGroq(api_key=self.api_key, max_retries=0,
+                         http_client=httpx.AsyncClient(limits=http_limits()))
+
+    async def _call_async(self, request, messages, max_tokens, priority=0):
+        if self.scheduler is None:
+            return await self.transport.call_async(request)
+        cost = self._request_cost(messages, max_tokens)
+
+        async def call():
+            return self._charged(await self.transport.call_async(request), cost)
+
+        return await self.scheduler.run_async(
+            self._request_key(messages, max_tokens), cost, priority, call
+        )
+
+    async def generate(self, user_message, sentiment, tone, history, context=None, priority=0):
+        if not self.is_available():
+            raise RuntimeError("Groq not available")
+
+        messages = self.build_messages(user_message, sentiment, tone, history, context)
+        completion = await self._call_async(
+            lambda timeout: self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=200,
+                timeout=timeout
+            ),
+            messages, 200, priority
         )
         return completion.choices[0].message.content.strip()
 
 
+# ======================= LLM RESPONSE CACHE =======================
+
+def _normalize_for_cache(text: str) -> str:
+    t = " ".join(text.lower().split())
+    return t.strip(" .,!?;:")
+
+
+class ResponseCache:
+    """
+    Two-tier cache of LLM replies keyed on (tone, sentiment, message,
+    short context, scope).
+
+      - exact tier: normalized lookup on the full key
+      - semantic tier: cosine similarity of message embeddings against
+        an in-memory NumPy matrix, only among entries with the same tone,
+        sentiment and scope, accepted at or above `similarity_threshold`;
+        the context is left out here so paraphrases can match across turns
+
+    `scope` keeps replies that may quote a conversation private to it:
+    None marks a reply that depended on the message alone (an opening
+    turn) and may be served to anyone, but only for the same message, in
+    the exact tier (a paraphrase of "I'm John and I failed my exam" must
+    not get John's reply). Any other value (e.g. the user id) matches
+    lookups with the same scope, in both tiers.
+
+    Entries are evicted least-recently-used beyond `capacity` and expire
+    after `ttl` seconds. The semantic tier is skipped when
+    sentence-transformers is not installed. get_async() and put_async()
+    load the model and embed on the loop's default executor, never on
+    the event loop itself.
+    """
+
+    def __init__(self, capacity: int = 1024, ttl: float = 6 * 3600.0,
+                 similarity_threshold: float = 0.92,
+                 embedder=None, model_name: str = "all-MiniLM-L6-v2",
+                 persist_path: Optional[str] = None) -> None:
+        self.capacity = capacity
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.persist_path = persist_path
+        self._model_name = model_name
+        self._embedder = embedder        # callable: list[str] -> (n, dim) array
+        self._embedder_failed = False
+        self._embedder_lock = threading.Lock()   # the model loads once, outside _lock
+
+        # key -> [reply, created_at, llm_latency, slot]
+        self._entries: "OrderedDict[Tuple[str, str, str, str, Optional[str]], list]" = OrderedDict()
+        self._vectors: Optional[np.ndarray] = None
+        self._slot_keys: List[Optional[Tuple[str, str, str, str, Optional[str]]]] = [None] * capacity
+        self._free_slots = list(range(capacity - 1, -1, -1))
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+        if persist_path and os.path.exists(persist_path):
+            self.load()
+
+    # ---------- embeddings ----------
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        if self._embedder is None and not self._embedder_failed:
+            with self._embedder_lock:
+                if self._embedder is None and not self._embedder_failed:
+                    try:
+                        from sentence_transformers import SentenceTransformer
+                        model = SentenceTransformer(self._model_name)
+                        self._embedder = lambda texts: model.encode(texts, normalize_embeddings=True)
+                    except Exception:
+                        self._embedder_failed = True
+        if self._embedder is None:
+            return None
+
+        vec = np.asarray(self._embedder([text])[0], dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    async def _embed_async(self, text: str) -> Optional[np.ndarray]:
+        if self._embedder_failed:
+            return None
+        return await asyncio.get_running_loop().run_in_executor(None, self._embed, text)
+
+    # ---------- lookup ----------
+    @staticmethod
+    def _key(tone, sentiment, message, context, scope):
+        return (tone, sentiment, _normalize_for_cache(message), _normalize_for_cache(context), scope)
+
+    def get(self, tone: str, sentiment: str, message: str, context: str = "",
+            scope: Optional[str] = None) -> Optional[str]:
+        key = self._key(tone, sentiment, message, context, scope)
+        now = time.time()
+        reply = self._exact(key, now)
+        if reply is not None:
+            return reply
+        # unscoped entries are exact-only
+        return self._semantic(key, self._embed(key[2]) if scope is not None else None, now)
+
+    async def get_async(self, tone: str, sentiment: str, message: str, context: str = "",
+                        scope: Optional[str] = None) -> Optional[str]:
+        """get(), with the embedding computed off the event loop."""
+        key = self._key(tone, sentiment, message, context, scope)
+        now = time.time()
+        reply = self._exact(key, now)
+        if reply is not None:
+            return reply
+        return self._semantic(key, await self._embed_async(key[2]) if scope is not None else None, now)
+
+    def _exact(self, key, now) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] > self.ttl:
+                self._evict(key)
+                entry = None
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            self.latency_saved += entry[2]
+            return entry[0]
+
+    def _semantic(self, key, vec, now) -> Optional[str]:
+        # vec is None for unscoped lookups and without an embedder: a miss
+        with self._lock:
+            best = self._nearest(vec, key[0], key[1], key[4], now) if vec is not None else None
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            entry = self._entries[best]
+            self.semantic_hits += 1
+            self.latency_saved += entry[2]
+            return entry[0]
+
+    def _nearest(self, vec, tone, sentiment, scope, now):
+        if self._vectors is None or not self._entries:
+            return None
+        sims = self._vectors @ vec
+        for slot in np.argsort(-sims):
+            if sims[slot] < self.similarity_threshold:
+                return None
+            key = self._slot_keys[slot]
+            if key is None or key[0] != tone or key[1] != sentiment or key[4] != scope:
+                continue
+            if now - self._entries[key][1] > self.ttl:
+                continue
+            return key
+        return None
+
+    # ---------- insertion / eviction ----------
+    def put(self, tone: str, sentiment: str, message: str, context: str,
+            reply: str, llm_latency: float = 0.0, created_at: Optional[float] = None,
+            scope: Optional[str] = None) -> None:
+        key = self._key(tone, sentiment, message, context, scope)
+        # unscoped entries are exact-only, so they need no vector
+        vec = self._embed(key[2]) if scope is not None else None
+        self._insert(key, vec, reply, llm_latency, created_at)
+
+    async def put_async(self, tone: str, sentiment: str, message: str, context: str,
+                        reply: str, llm_latency: float = 0.0,
+                        scope: Optional[str] = None) -> None:
+        """put(), with the embedding computed off the event loop."""
+        key = self._key(tone, sentiment, message, context, scope)
+        vec = await self._embed_async(key[2]) if scope is not None else None
+        self._insert(key, vec, reply, llm_latency, None)
+
+    def _insert(self, key, vec, reply, llm_latency, created_at) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+            while len(self._entries) >= self.capacity:
+                self._evict(next(iter(self._entries)))
+
+            slot = self._free_slots.pop()
+            if vec is not None:
+                if self._vectors is None:
+                    self._vectors = np.zeros((self.capacity, vec.shape[0]), dtype=np.float32)
+                self._vectors[slot] = vec
+            self._slot_keys[slot] = key
+            self._entries[key] = [reply, created_at or time.time(), llm_latency, slot]
+
+    def _evict(self, key) -> None:
+        slot = self._entries.pop(key)[3]
+        self._slot_keys[slot] = None
+        if self._vectors is not None:
+            self._vectors[slot] = 0.0
+        self._free_slots.append(slot)
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._evict(key)
+
+    # ---------- stats ----------
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "latency_saved_s": self.latency_saved,
+        }
+
+    # ---------- persistence ----------
+    def save(self) -> None:
+        if not self.persist_path:
+            return
+        with self._lock:
+            rows = [
+                {"tone": k[0], "sentiment": k[1], "message": k[2], "context": k[3], "scope": k[4],
+                 "reply": e[0], "created_at": e[1], "latency": e[2]}
+                for k, e in self._entries.items()
+            ]
+        tmp = self.persist_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(rows, f)
+        os.replace(tmp, self.persist_path)
+
+    def load(self) -> None:
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for r in rows:
+            if "scope" not in r and r["context"]:
+                continue   # saved before scopes: whose conversation it quotes is unknown
+            if now - r["created_at"] <= self.ttl:
+                self.put(r["tone"], r["sentiment"], r["message"], r["context"],
+                         r["reply"], r["latency"], r["created_at"], r.get("scope"))
+
+
+# ======================= EMBEDDING CLASSIFIER =======================
+
+# A few example messages per label; each label's prototype is the mean of
+# their embeddings. Labels use the phrase matcher's category names, so
+# classifier results merge straight into a turn's keyword hits.
+PROTOTYPES = {
+    TOPIC_PREFIX + "study": [
+        "I have an exam coming up", "my grades are bad this semester",
+        "I can't finish my homework", "studying for finals is exhausting",
+    ],
+    TOPIC_PREFIX + "work": [
+        "my manager keeps criticizing me", "I might get laid off",
+        "my coworkers ignore me", "the deadline at my job is impossible",
+    ],
+    TOPIC_PREFIX + "feelings": [
+        "I feel empty inside", "I've been really down lately",
+        "I'm so anxious all the time", "I feel lonely",
+    ],
+    TOPIC_PREFIX + "problems": [
+        "nothing is working out", "something went wrong again",
+        "my laptop keeps crashing", "I can't fix this",
+    ],
+    "crisis": [
+        "I don't see a reason to go on", "everyone would be better off without me",
+        "I want to end it all", "I've been thinking about ending my life",
+    ],
+    INTENT_PREFIX + "how_are_you": ["how's it going with you", "how have you been", "are you doing okay"],
+    INTENT_PREFIX + "who_am_i": ["do you remember my name", "what's my name", "do you know who I am"],
+    INTENT_PREFIX + "joke": ["make me laugh", "say something funny", "cheer me up with something funny"],
+    INTENT_PREFIX + "bye": ["see you later", "I have to go now", "talk to you tomorrow"],
+    INTENT_PREFIX + "previous_chat": ["what did we talk about last time", "show me our old messages"],
+}
+
+_SEMANTIC_PREFIXES = (TOPIC_PREFIX, INTENT_PREFIX, "crisis")
+
+
+class BatchedEmbedder:
+    """
+    Sentence embeddings with an LRU cache and cross-thread micro-batching.
+
+    embed() encodes a list synchronously. submit() queues one text and
+    returns a Future; a worker thread gathers up to `max_batch` queued
+    texts (waiting at most `max_wait` seconds after the first) and encodes
+    them in one model call, so concurrent sessions share a forward pass.
+    Vectors are L2-normalized float32. The model loads on first use;
+    `available` is False when sentence-transformers is missing.
+    """
+
+    def __init__(self, embedder=None, model_name: str = "all-MiniLM-L6-v2",
+                 max_batch: int = 64, max_wait: float = 0.005,
+                 cache_size: int = 8192) -> None:
+        self._embedder = embedder        # callable: list[str] -> (n, dim) array
+        self._embedder_failed = False
+        self._model_name = model_name
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self.cache_hits = 0
+        self.encoded = 0
+        self.batches = 0
+
+    @property
+    def available(self) -> bool:
+        if self._embedder is None and not self._embedder_failed:
+            with self._lock:
+                if self._embedder is None and not self._embedder_failed:
+                    try:
+                        from sentence_transformers import SentenceTransformer
+                        model = SentenceTransformer(self._model_name, device="cpu")
+                        self._embedder = lambda texts: model.encode(
+                            texts, batch_size=self.max_batch, normalize_embeddings=True)
+                    except Exception:
+                        self._embedder_failed = True
+        return self._embedder is not None
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return normalize_message(text).lower()
+
+    def embed(self, texts: List[str]) -> Optional[np.ndarray]:
+        """(len(texts), dim) normalized vectors, or None without a model."""
+        if not self.available:
+            return None
+        keys = [self._key(t) for t in texts]
+        vecs: List[Optional[np.ndarray]] = [None] * len(keys)
+        todo: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, k in enumerate(keys):
+                v = self._cache.get(k)
+                if v is not None:
+                    self._cache.move_to_end(k)
+                    self.cache_hits += 1
+                    vecs[i] = v
+                else:
+                    todo.setdefault(k, []).append(i)
+
+        if todo:
+            fresh = np.asarray(self._embedder(list(todo)), dtype=np.float32)
+            norms = np.linalg.norm(fresh, axis=1, keepdims=True)
+            fresh = fresh / np.where(norms == 0, 1.0, norms)
+            with self._lock:
+                self.encoded += len(todo)
+                self.batches += 1
+                for (k, idxs), v in zip(todo.items(), fresh):
+                    self._cache[k] = v
+                    for i in idxs:
+                        vecs[i] = v
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return np.stack(vecs)
+
+    # ---------- micro-batching ----------
+    def submit(self, text: str) -> Future:
+        """Queue one text; the Future resolves to its vector (or None)."""
+        fut: Future = Future()
+        with self._cond:
+            self._queue.append((text, fut))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                self._worker.start()
+            self._cond.notify()
+        return fut
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.max_wait
+                while len(self._queue) < self.max_batch:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+                batch = [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+            try:
+                vecs = self.embed([t for t, _ in batch])
+                for i, (_, fut) in enumerate(batch):
+                    fut.set_result(None if vecs is None else vecs[i])
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"cached": len(self._cache), "cache_hits": self.cache_hits,
+                    "encoded": self.encoded, "batches": self.batches}
+
+
+class EmbeddingClassifier:
+    """
+    Topic/intent classifier over sentence embeddings: messages are scored
+    against a (labels x dim) prototype matrix with one matmul, and every
+    label at or above `threshold` cosine similarity is reported.
+
+    Meant as the slow path behind the keyword matcher: needed(hits) is
+    False when the keywords already found a topic, intent or crisis
+    phrase, and the message is then never embedded.
+    """
+
+    def __init__(self, prototypes: Optional[Dict[str, List[str]]] = None,
+                 embedder: Optional[BatchedEmbedder] = None,
+                 threshold: float = 0.6) -> None:
+        self.prototypes = prototypes or PROTOTYPES
+        self.embedder = embedder or BatchedEmbedder()
+        self.threshold = threshold
+        self.labels: List[str] = list(self.prototypes)
+        self._matrix: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def needed(hits: set) -> bool:
+        for category in hits:
+            if category.startswith(_SEMANTIC_PREFIXES):
+                return False
+        return True
+
+    @property
+    def matrix(self) -> Optional[np.ndarray]:
+        # prototype vectors are embedded once, on first use
+        if self._matrix is None:
+            with self._lock:
+                if self._matrix is None:
+                    rows = []
+                    for label in self.labels:
+                        vecs = self.embedder.embed(self.prototypes[label])
+                        if vecs is None:
+                            return None
+                        mean = vecs.mean(axis=0)
+                        rows.append(mean / (np.linalg.norm(mean) or 1.0))
+                    self._matrix = np.stack(rows).astype(np.float32)
+        return self._matrix
+
+    def _labels_for(self, sims: np.ndarray) -> set:
+        return {self.labels[j] for j in np.flatnonzero(sims >= self.threshold)}
+
+    def scores(self, vecs: np.ndarray) -> np.ndarray:
+        """(n, labels) cosine similarities for (n, dim) normalized vectors."""
+        return vecs @ self.matrix.T
+
+    def classify_batch(self, texts: List[str]) -> List[set]:
+        matrix = self.matrix
+        vecs = self.embedder.embed(texts) if matrix is not None else None
+        if vecs is None:
+            return [set() for _ in texts]
+        sims = vecs @ matrix.T
+        return [self._labels_for(row) for row in sims]
+
+    def classify(self, text: str) -> set:
+        return self.classify_batch([text])[0]
+
+    def labels_from_vector(self, vec: Optional[np.ndarray]) -> set:
+        """Labels for a vector from embedder.submit()."""
+        matrix = self.matrix
+        if vec is None or matrix is None:
+            return set()
+        return self._labels_for(matrix @ vec)
+
+    def warm_up(self) -> threading.Thread:
+        """
+        Load the model and embed the prototypes on a daemon thread, e.g.
+        at server start, so the first classified message does not pay
+        for it.
+        """
+        t = threading.Thread(target=lambda: self.matrix, name="classifier-warm-up", daemon=True)
+        t.start()
+        return t
+
+    async def classify_async(self, text: str) -> set:
+        """Classify through the shared micro-batcher without blocking the loop."""
+        matrix = self._matrix
+        if matrix is None:
+            # not warmed up yet: load the model off the event loop
+            matrix = await asyncio.get_running_loop().run_in_executor(None, lambda: self.matrix)
+        if matrix is None:
+            return set()
+        vec = await asyncio.wrap_future(self.embedder.submit(text))
+        return self.labels_from_vector(vec)
+
+
+# ======================= TIER 1 SUMMARY =======================
+
+class SentimentAccumulator:
+    """
+    Running Tier 1 aggregates over user turns, updated in O(1) per turn:
+    label counts, the recency-weighted sum Σ(i·s) and its total weight,
+    first/last/min/max scores, a last-`window` trend window and an
+    exponentially decayed average.
+    """
+
+    def __init__(self, window: int = 10, alpha: float = 0.3) -> None:
+        self.alpha = alpha
+        self.count = 0
+        self.pos = 0
+        self.neg = 0
+        self.neu = 0
+        self.wsum = 0.0
+        self.wtotal = 0
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.ema: Optional[float] = None
+        self.window: deque = deque(maxlen=window)
+
+    @classmethod
+    def from_history(cls, history: List[Dict[str, Any]], **kwargs) -> "SentimentAccumulator":
+        acc = cls(**kwargs)
+        for m in history:
+            if m["speaker"] == "user":
+                acc.add(m["sentiment_label"], m["sentiment_score"])
+        return acc
+
+    def add(self, label: str, score: float) -> None:
+        self.count += 1
+        if label == "Positive":
+            self.pos += 1
+        elif label == "Negative":
+            self.neg += 1
+        elif label == "Neutral":
+            self.neu += 1
+
+        self.wsum += self.count * score
+        self.wtotal += self.count
+
+        if self.first is None:
+            self.first = self.min = self.max = self.ema = score
+        else:
+            self.min = min(self.min, score)
+            self.max = max(self.max, score)
+            self.ema = self.alpha * score + (1 - self.alpha) * self.ema
+        self.last = score
+        self.window.append(score)
+
+    @property
+    def weighted_avg(self) -> float:
+        return self.wsum / self.wtotal if self.wtotal else 0.0
+
+    def window_change(self) -> Optional[float]:
+        """Score change across the last-N window (None with < 2 turns)."""
+        if len(self.window) < 2:
+            return None
+        return self.window[-1] - self.window[0]
+
+    def summary(self) -> Tuple[str, float, str]:
+        """Tier 1 summary: (overall_label, weighted_avg, explanation)."""
+        if not self.count:
+            return "Neutral", 0.0, "No user messages found."
+
+        avg = self.weighted_avg
+
+        if avg > 0.05:
+            overall = "Positive"
+        elif avg < -0.05:
+            overall = "Negative"
+        else:
+            overall = "Neutral"
+
+        explanation = (
+            f"You expressed negative feelings {self.neg} time(s).\n"
+            f"You expressed positive feelings {self.pos} time(s).\n"
+            f"You expressed neutral or unclear feelings {self.neu} time(s).\n"
+        )
+
+        if overall == "Negative":
+            explanation += "Recent messages leaned negative."
+        elif overall == "Positive":
+            explanation += "Overall tone leaned positive."
+        else:
+            explanation += "Your emotions were mixed or balanced."
+
+        return overall, avg, explanation
+
+
+def summarize_sentiment(history: List[Dict[str, Any]]) -> Tuple[str, float, str]:
+    """
+    Recency-weighted conversation sentiment over the user turns of a
+    history list. Returns (overall_label, weighted_avg, explanation).
+    """
+    return SentimentAccumulator.from_history(history).summary()
+
+
+# ======================= APPEND-ONLY SESSION STORE =======================
+
+class SessionStore:
+    """
+    Append-only archive of chat sessions.
+
+    The log is JSON Lines: each session is one header line (every session
+    field except "history", plus "turns") followed by one line per turn.
+    A fixed-width index file records (offset, length, turns) for every
+    session, so opening the store reads only the index and saving a
+    session costs O(session size). Reads go through a memory map of the
+    log and decode only the sessions and turns asked for.
+    """
+
+    _REC = struct.Struct("<QQI")
+    _mm = None
+
+    def __init__(self, log_path: str = SESSION_LOG_FILE,
+                 index_path: str = SESSION_INDEX_FILE,
+                 legacy_path: Optional[str] = CHAT_HISTORY_FILE,
+                 readonly: bool = False) -> None:
+        self.log_path = log_path
+        self.index_path = index_path
+        # a read-only opener (report, rescore) never creates, truncates or
+        # migrates anything: bytes past the index may be a record another
+        # process is still appending
+        self.readonly = readonly
+
+        if readonly:
+            self._index = bytearray()
+            if os.path.exists(log_path):
+                self._load_index()
+            return
+
+        os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+        if not os.path.exists(log_path):
+            if os.path.exists(index_path):
+                os.remove(index_path)
+            if legacy_path and os.path.exists(legacy_path):
+                self._migrate_into_place(legacy_path)
+            else:
+                open(log_path, "ab").close()
+
+        self._load_index()
+
+    # ---------- index handling ----------
+    def _load_index(self) -> None:
+        if not os.path.exists(self.index_path):
+            self._rebuild_index()
+            return
+
+        with open(self.index_path, "rb") as f:
+            on_disk = f.read()
+        size = self._REC.size
+        raw = on_disk[:len(on_disk) - len(on_disk) % size]
+        log_size = os.path.getsize(self.log_path)
+
+        # drop index entries for records that never fully reached the log
+        while raw:
+            off, length, _ = self._REC.unpack_from(raw, len(raw) - size)
+            if off + length <= log_size:
+                break
+            raw = raw[:-size]
+        self._index = bytearray(raw)
+        if self.readonly:
+            return
+
+        # drop a partially written trailing record (crash mid-append)
+        end = 0
+        if raw:
+            off, length, _ = self._REC.unpack_from(raw, len(raw) - size)
+            end = off + length
+        if log_size > end:
+            with open(self.log_path, "r+b") as f:
+                f.truncate(end)
+        if len(raw) != len(on_disk):
+            with open(self.index_path, "wb") as f:
+                f.write(self._index)
+
+    def _rebuild_index(self) -> None:
+        self._index = bytearray()
+        end = 0
+        corrupt = False
+        with open(self.log_path, "rb") as f:
+            while True:
+                header = f.readline()
+                if not header.endswith(b"\n"):
+                    break
+                try:
+                    turns = int(json.loads(header).get("turns", 0))
+                except (ValueError, TypeError, AttributeError):
+                    corrupt = True
+                    break
+                if not all(f.readline().endswith(b"\n") for _ in range(turns)):
+                    break
+                self._index += self._REC.pack(end, f.tell() - end, turns)
+                end = f.tell()
+        if self.readonly:
+            return
+        if corrupt:
+            # keep everything from the unreadable header on beside the log
+            # instead of refusing to start, as the old loader did
+            with open(self.log_path, "rb") as f, open(self.log_path + ".corrupt", "ab") as out:
+                f.seek(end)
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    out.write(block)
+        with open(self.log_path, "r+b") as f:
+            f.truncate(end)
+        with open(self.index_path, "wb") as f:
+            f.write(self._index)
+
+    def _entry(self, i: int) -> Tuple[int, int, int]:
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("session index out of range")
+        return self._REC.unpack_from(self._index, i * self._REC.size)
+
+    # ---------- reading ----------
+    def __len__(self) -> int:
+        return len(self._index) // self._REC.size
+
+    def _read_lines(self, i: int) -> List[bytes]:
+        off, length, _ = self._entry(i)
+        return self._map(off + length)[off:off + length].splitlines()
+
+    def _map(self, end: int) -> mmap.mmap:
+        # (re)map lazily; appends only grow the log, so remap when a
+        # record lies past the current mapping. Older maps stay alive for
+        # any views still holding them.
+        if self._mm is None or len(self._mm) < end:
+            with open(self.log_path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mm
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        lines = self._read_lines(i)
+        session = json.loads(lines[0])
+        session.pop("turns", None)
+        session["history"] = [json.loads(line) for line in lines[1:]]
+        return session
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def view(self, i: int) -> "LazySession":
+        """Return session `i` without decoding its turns up front."""
+        off, length, turns = self._entry(i)
+        mm = self._map(off + length)
+        body = mm.find(b"\n", off, off + length) + 1
+        return LazySession(mm, off, body, off + length, turns)
+
+    def last_turns(self, n: int, session: int = -1) -> List[Dict[str, Any]]:
+        """
+        Return the last `n` turns of one session (the latest by default).
+        Cost depends only on `n`, not on archive or session size.
+        """
+        return self.view(session)["history"][-n:] if n > 0 else []
+
+    # ---------- writing ----------
+    def append(self, session: Dict[str, Any]) -> None:
+        if self.readonly:
+            raise ValueError("SessionStore was opened read-only")
+        history = session.get("history", [])
+        header = {k: v for k, v in session.items() if k != "history"}
+        header["turns"] = len(history)
+
+        parts = [json.dumps(header)]
+        if isinstance(history, ConversationHistory):
+            parts.extend(history.json_lines())   # straight from the columns
+        else:
+            parts.extend(json.dumps(m) for m in history)
+        data = ("\n".join(parts) + "\n").encode("utf-8")
+
+        with open(self.log_path, "ab") as f:
+            off = f.seek(0, os.SEEK_END)
+            f.write(data)
+        rec = self._REC.pack(off, len(data), len(history))
+        with open(self.index_path, "ab") as f:
+            f.write(rec)
+        self._index += rec
+
+    def migrate_legacy(self, path: str) -> int:
+        """One-time import of the old single-document chat_sessions.json."""
+        count = 0
+        try:
+            for session in iter_json_array(path):
+                self.append(session)
+                count += 1
+        except ValueError:
+            pass   # unreadable legacy file: start fresh, as the old loader did
+        return count
+
+    def _migrate_into_place(self, legacy_path: str) -> None:
+        # migrate into a temporary log and index, then rename them in; the
+        # log goes last, so a crash at any point leaves no log and the next
+        # start migrates again from the top
+        log_path, index_path = self.log_path, self.index_path
+        self.log_path, self.index_path = log_path + ".tmp", index_path + ".tmp"
+        try:
+            for path in (self.log_path, self.index_path):
+                open(path, "wb").close()
+            self._index = bytearray()
+            self.migrate_legacy(legacy_path)
+            for path in (self.log_path, self.index_path):
+                with open(path, "rb+") as f:
+                    os.fsync(f.fileno())
+            os.replace(self.index_path, index_path)
+            os.replace(self.log_path, log_path)
+        finally:
+            self.log_path, self.index_path = log_path, index_path
+
+
+class LazyTurns:
+    """
+    Read-only sequence over the turn lines of one stored session.
+    Tail slices walk backwards from the end of the record; any other
+    access indexes the record's line starts once.
+    """
+
+    def __init__(self, mm: mmap.mmap, start: int, end: int, n: int) -> None:
+        self._mm = mm
+        self._start = start
+        self._end = end
+        self._n = n
+        self._starts: Optional[List[int]] = None
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _tail(self, k: int) -> List[Dict[str, Any]]:
+        mm, stop = self._mm, self._end - 1   # skip the final newline
+        out = []
+        for _ in range(k):
+            nl = mm.rfind(b"\n", self._start - 1, stop)
+            out.append(json.loads(mm[nl + 1:stop]))
+            stop = nl
+        out.reverse()
+        return out
+
+    def _line_starts(self) -> List[int]:
+        if self._starts is None:
+            starts, pos, mm = [], self._start, self._mm
+            while pos < self._end:
+                starts.append(pos)
+                pos = mm.find(b"\n", pos, self._end) + 1
+            self._starts = starts
+        return self._starts
+
+    def _decode(self, i: int) -> Dict[str, Any]:
+        starts = self._line_starts()
+        end = starts[i + 1] if i + 1 < len(starts) else self._end
+        return json.loads(self._mm[starts[i]:end - 1])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._n)
+            if step == 1 and stop == self._n:
+                return self._tail(max(0, stop - start))
+            return [self._decode(i) for i in range(start, stop, step)]
+        if key < 0:
+            key += self._n
+        if not 0 <= key < self._n:
+            raise IndexError("turn index out of range")
+        return self._decode(key)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._n):
+            yield self._decode(i)
+
+
+class LazySession:
+    """Dict-like stored session whose "history" is a LazyTurns view."""
+
+    def __init__(self, mm: mmap.mmap, header_off: int, body_off: int, end: int, turns: int) -> None:
+        self._header = None
+        self._mm = mm
+        self._header_span = (header_off, body_off - 1)
+        self.history = LazyTurns(mm, body_off, end, turns)
+
+    def _fields(self) -> Dict[str, Any]:
+        if self._header is None:
+            a, b = self._header_span
+            self._header = json.loads(self._mm[a:b])
+            self._header.pop("turns", None)
+        return self._header
+
+    def __getitem__(self, key: str):
+        if key == "history":
+            return self.history
+        return self._fields()[key]
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+# ======================= COMPACT CONVERSATION HISTORY =======================
+
+SPEAKERS = ("user", "bot")
+SENTIMENT_LABELS = ("Neutral", "Positive", "Negative")
+_SPEAKER_CODES = {name: i for i, name in enumerate(SPEAKERS)}
+_LABEL_CODES = {name: i for i, name in enumerate(SENTIMENT_LABELS)}
+_NO_LABEL = -1
+
+
+class ConversationHistory:
+    """
+    Columnar conversation history. Speakers and labels are int8 codes,
+    scores float64 and texts one UTF-8 buffer with an offset column, so
+    a turn costs a few dozen bytes instead of a dict. Indexing, slicing
+    and iteration return the usual per-turn dicts
+    ({"speaker", "text"[, "sentiment_label", "sentiment_score"]}).
+    """
+
+    def __init__(self) -> None:
+        self._speakers = array("b")
+        self._labels = array("b")
+        self._scores = array("d")
+        self._text = bytearray()
+        self._offsets = array("Q", [0])
+
+    @classmethod
+    def from_turns(cls, turns: Iterable[Dict[str, Any]]) -> "ConversationHistory":
+        history = cls()
+        for m in turns:
+            history.append(m)
+        return history
+
+    # ---------- writing ----------
+    def add(self, speaker: str, text: str, label: Optional[str] = None,
+            score: Optional[float] = None) -> None:
+        self._speakers.append(_SPEAKER_CODES[speaker])
+        self._labels.append(_LABEL_CODES[label] if label is not None else _NO_LABEL)
+        self._scores.append(score if score is not None else float("nan"))
+        self._text += text.encode("utf-8")
+        self._offsets.append(len(self._text))
+
+    def append(self, turn: Dict[str, Any]) -> None:
+        self.add(turn["speaker"], turn["text"],
+                 turn.get("sentiment_label"), turn.get("sentiment_score"))
+
+    # ---------- dict view ----------
+    def __len__(self) -> int:
+        return len(self._speakers)
+
+    def text(self, i: int) -> str:
+        return self._text[self._offsets[i]:self._offsets[i + 1]].decode("utf-8")
+
+    def _turn(self, i: int) -> Dict[str, Any]:
+        turn = {"speaker": SPEAKERS[self._speakers[i]], "text": self.text(i)}
+        label = self._labels[i]
+        if label != _NO_LABEL:
+            turn["sentiment_label"] = SENTIMENT_LABELS[label]
+            turn["sentiment_score"] = self._scores[i]
+        return turn
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._turn(i) for i in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("turn index out of range")
+        return self._turn(key)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self._turn(i)
+
+    # ---------- bulk access ----------
+    def scores(self) -> np.ndarray:
+        """Zero-copy float64 view of the score column (NaN for bot turns)."""
+        return np.frombuffer(self._scores, dtype=np.float64)
+
+    def json_lines(self) -> Iterator[str]:
+        """Session-store turn lines, encoded straight from the columns."""
+        for i in range(len(self)):
+            speaker = SPEAKERS[self._speakers[i]]
+            text = json.dumps(self.text(i))
+            label = self._labels[i]
+            if label == _NO_LABEL:
+                yield f'{{"speaker": "{speaker}", "text": {text}}}'
+            else:
+                yield (f'{{"speaker": "{speaker}", "text": {text}, '
+                       f'"sentiment_label": "{SENTIMENT_LABELS[label]}", '
+                       f'"sentiment_score": {json.dumps(self._scores[i])}}}')
+
+    def to_buffers(self) -> Dict[str, memoryview]:
+        """Zero-copy views of the raw columns, e.g. for a binary snapshot."""
+        return {
+            "speakers": memoryview(self._speakers),
+            "labels": memoryview(self._labels),
+            "scores": memoryview(self._scores),
+            "text": memoryview(self._text),
+            "offsets": memoryview(self._offsets),
+        }
+
+    @classmethod
+    def from_buffers(cls, buffers: Dict[str, Any]) -> "ConversationHistory":
+        """Rebuild from to_buffers() output (or bytes of the same layout)."""
+        history = cls()
+        history._speakers.frombytes(buffers["speakers"])
+        history._labels.frombytes(buffers["labels"])
+        history._scores.frombytes(buffers["scores"])
+        history._text += buffers["text"]
+        history._offsets = array("Q")
+        history._offsets.frombytes(buffers["offsets"])
+        return history
+
+    def nbytes(self) -> int:
+        """Bytes held by the column buffers."""
+        return (self._speakers.itemsize * len(self._speakers)
+                + self._labels.itemsize * len(self._labels)
+                + self._scores.itemsize * len(self._scores)
+                + len(self._text)
+                + self._offsets.itemsize * len(self._offsets))
+
+
+# ======================= HOT-PATH METRICS =======================
+
+# Latency buckets are powers of two in microseconds: an observation lands in
+# bucket int(µs).bit_length(), so recording one is a multiply, a bit_length
+# and a list increment. 32 buckets reach ~36 minutes.
+_HIST_BUCKETS = 32
+
+TURN_STAGES = ("sentiment", "rules", "classify", "intents", "llm_queue", "llm", "llm_ttft", "tone")
+TURN_COUNTERS = (
+    "turns", "intent_replies", "fallback_replies",
+    "cache_hits", "cache_misses",
+    "llm_ok", "llm_errors", "llm_unavailable", "llm_coalesced", "llm_rejected",
+)
+
+
+def _no_clock() -> float:
+    # stands in for time.perf_counter when nothing is timed
+    return 0.0
+
+
+class LatencyHistogram:
+    """Log2-bucketed latency histogram with count and sum."""
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self) -> None:
+        self.counts = [0] * _HIST_BUCKETS
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        b = int(seconds * 1e6).bit_length()
+        self.counts[b if b < _HIST_BUCKETS else _HIST_BUCKETS - 1] += 1
+        self.count += 1
+        self.sum += seconds
+
+    @staticmethod
+    def upper_bound(bucket: int) -> float:
+        """Upper edge of a bucket in seconds."""
+        return (1 << bucket) / 1e6
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bucket edge holding the q-quantile (None when empty)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for b, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                return self.upper_bound(b)
+        return self.upper_bound(_HIST_BUCKETS - 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {f"{self.upper_bound(b):g}": c for b, c in enumerate(self.counts) if c},
+        }
+
+
+class TurnMetrics:
+    """
+    Per-stage timers and outcome counters for Chatbot turns.
+
+    Pass one instance to any number of Chatbots (ChatServer shares one).
+    A Chatbot built without metrics skips every timer and counter behind a
+    single `is None` check. Updates are plain attribute arithmetic without
+    a lock: under the GIL a concurrent increment can very rarely be lost,
+    which is acceptable for monitoring.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.time()
+        self.stages: Dict[str, LatencyHistogram] = {s: LatencyHistogram() for s in TURN_STAGES}
+        self.counters: Dict[str, int] = dict.fromkeys(TURN_COUNTERS, 0)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        hist = self.stages.get(stage)
+        if hist is None:
+            hist = self.stages[stage] = LatencyHistogram()
+        hist.observe(seconds)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self) -> None:
+        self.__init__()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Everything recorded so far as a JSON-ready dict."""
+        return {
+            "uptime_s": time.time() - self.started,
+            "counters": dict(self.counters),
+            "stages": {s: h.to_dict() for s, h in self.stages.items()},
+        }
+
+    def to_prometheus(self, prefix: str = "chatbot") -> str:
+        """Prometheus text exposition format (counters and histograms)."""
+        lines = []
+        for name, value in self.counters.items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+
+        metric = f"{prefix}_stage_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        for stage, hist in self.stages.items():
+            cumulative = 0
+            for b, c in enumerate(hist.counts):
+                cumulative += c
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{hist.upper_bound(b):g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {hist.sum!r}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {hist.count}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        """
+        Write a snapshot atomically: Prometheus text when `path` ends in
+        ".prom", JSON otherwise (e.g. for a node-exporter textfile collector).
+        """
+        if path.endswith(".prom"):
+            body = self.to_prometheus()
+        else:
+            body = json.dumps(self.snapshot(), indent=2)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(body)
+        os.replace(tmp, path)
+
+
+# ======================= BACKGROUND MEMORY PERSISTENCE =======================
+
+FSYNC_POLICIES = ("always", "on_close", "never")
+
+
+def write_json_atomic(path: str, data: Any, fsync: bool = False, indent: Optional[int] = 4) -> None:
+    """
+    Write JSON to a temp file next to `path` and rename it into place, so a
+    reader (or the next start after a crash) sees the old file or the new
+    one, never a torn write. With `fsync` the data and the rename are
+    flushed to disk before returning.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+    if fsync and hasattr(os, "O_DIRECTORY"):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _pid_running(pid: int) -> bool:
+    """Whether a process with this pid exists (True when we may not ask)."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class MemoryWriter:
+    """
+    Debounced background writer for the user-memory JSON.
+
+    submit() only swaps the pending snapshot under a lock and returns; a
+    daemon thread waits `interval` seconds after the first unsaved change,
+    then writes the newest snapshot atomically, so a burst of turns costs
+    one write. fsync policy:
+      "always"   - fsync every background write (survives power loss)
+      "on_close" - fsync only in flush()/close()
+      "never"    - rely on the atomic rename alone (survives process crashes)
+    """
+
+    def __init__(self, path: str = USER_MEMORY_FILE, interval: float = 1.0,
+                 fsync: str = "always") -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, not {fsync!r}")
+        self.path = path
+        self.interval = interval
+        self.fsync = fsync
+        self._pending: Optional[Dict[str, Any]] = None
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()   # orders background and flush() writes
+        self._closed = False
+        self.submitted = 0
+        self.writes = 0
+        self.errors = 0
+        self._remove_stale_temp_files()
+        self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+        self._thread.start()
+
+    def _remove_stale_temp_files(self) -> None:
+        # temp files left by a process killed mid-write ("<path>.<pid>.<tid>.tmp")
+        directory = os.path.dirname(self.path) or "."
+        prefix = os.path.basename(self.path) + "."
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return
+        for name in names:
+            if not (name.startswith(prefix) and name.endswith(".tmp")):
+                continue
+            pid = name[len(prefix):].split(".", 1)[0]
+            if not pid.isdigit() or int(pid) == os.getpid() or _pid_running(int(pid)):
+                continue   # ours, or still running and maybe mid-write
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+    def submit(self, data: Dict[str, Any]) -> None:
+        """Queue a snapshot; replaces any snapshot not yet written."""
+        with self._cond:
+            first = self._pending is None
+            self._pending = data
+            self.submitted += 1
+            if first:
+                self._cond.notify()
+
+    def _take(self) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            data, self._pending = self._pending, None
+            return data
+
+    def _write_pending(self, fsync: bool) -> None:
+        # taking the snapshot under the I/O lock keeps writes in submit
+        # order when flush() races the background thread
+        with self._io_lock:
+            data = self._take()
+            if data is None:
+                return
+            try:
+                write_json_atomic(self.path, data, fsync=fsync)
+                self.writes += 1
+            except OSError as e:
+                self.errors += 1
+                print("⚠️ MEMORY SAVE ERROR:", e)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            # debounce: let the rest of the burst land in _pending
+            time.sleep(self.interval)
+            self._write_pending(self.fsync == "always")
+
+    def flush(self) -> None:
+        """Write any pending snapshot now, on the calling thread."""
+        self._write_pending(self.fsync != "never")
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.flush()
+
+    @property
+    def coalesced(self) -> int:
+        """Snapshots that were replaced before being written."""
+        with self._cond:
+            pending = self._pending is not None
+        return self.submitted - self.writes - self.errors - pending
+
+    def stats(self) -> Dict[str, Any]:
+        return {"submitted": self.submitted, "writes": self.writes,
+                "coalesced": self.coalesced, "errors": self.errors}
+
+
+# ======================= PER-USER MEMORY STORE =======================
+
+def _open_sqlite(path: str, synchronous: str = "NORMAL"):
+    """
+    Connection for a store shared between threads: WAL mode, autocommit
+    (stores issue their own BEGIN/COMMIT) and the given synchronous level.
+    NORMAL can lose the last commits on power failure, never corrupt.
+    """
+    import sqlite3
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute(f"PRAGMA synchronous={synchronous}")
+    return db
+
+
+class UserMemoryStore:
+    """
+    Per-user memory records in SQLite (WAL mode), fronted by an LRU of hot
+    users' live memory dicts.
+
+    get() hands out the same dict to every Chatbot of a user, so changes
+    are visible immediately; mark_dirty() records that it changed, so a
+    turn for a hot user never touches the database. As with MemoryWriter,
+    a daemon thread waits `flush_interval` seconds after the first unsaved
+    change and then writes every dirty user in one transaction, so a crash
+    loses at most that interval. Dirty users are also written when they
+    fall out of the LRU, on save() and on flush(); flush_interval=None
+    leaves it to those. Safe to share between threads.
+    """
+
+    def __init__(self, path: str = USER_DB_FILE, capacity: int = 1024,
+                 synchronous: str = "NORMAL", flush_interval: Optional[float] = 1.0) -> None:
+        self.path = path
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self._db = _open_sqlite(path, synchronous)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS user_memory ("
+            " user_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._hot: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._dirty: set = set()
+        self._lock = threading.RLock()
+        self._cond = threading.Condition()   # wakes the flusher
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+        self.writebacks = 0
+        self.errors = 0
+        self._flusher = None
+        if flush_interval is not None:
+            self._flusher = threading.Thread(target=self._run, name="user-memory-flush", daemon=True)
+            self._flusher.start()
+
+    # ---------- encoding ----------
+    @staticmethod
+    def _encode(memory: Dict[str, Any]) -> str:
+        data = dict(memory)
+        if isinstance(data.get("topics"), set):
+            data["topics"] = sorted(data["topics"])
+        return json.dumps(data, separators=(",", ":"))
+
+    @staticmethod
+    def _decode_into(raw: str, memory: Dict[str, Any]) -> None:
+        data = json.loads(raw)
+        for key in memory:
+            if key in data:
+                memory[key] = set(data[key]) if key == "topics" else data[key]
+
+    # ---------- access ----------
+    def get(self, user_id: str, memory: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        The live memory dict for `user_id`. `memory` is a fresh default
+        record; it is filled from the database and becomes the live dict
+        unless the user is already hot.
+        """
+        with self._lock:
+            hot = self._hot.get(user_id)
+            if hot is not None:
+                self._hot.move_to_end(user_id)
+                self.hits += 1
+                return hot
+            self.misses += 1
+            row = self._db.execute(
+                "SELECT data FROM user_memory WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if row is not None:
+                self._decode_into(row[0], memory)
+            self._admit(user_id, memory)
+            return memory
+
+    def mark_dirty(self, user_id: str, memory: Dict[str, Any]) -> None:
+        """Note that `memory` changed; re-admits it if it was evicted."""
+        with self._lock:
+            if user_id in self._hot:
+                self._hot.move_to_end(user_id)
+            else:
+                self._admit(user_id, memory)
+            first = not self._dirty
+            self._dirty.add(user_id)
+        if first and self._flusher is not None:
+            with self._cond:
+                self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._dirty and not self._closed:
+                    self._cond.wait()
+                # debounce: let the rest of the burst land; close() cuts it short
+                self._cond.wait_for(lambda: self._closed, timeout=self.flush_interval)
+                if self._closed:
+                    return   # close() flushes
+            try:
+                self.flush()
+            except Exception as e:
+                self.errors += 1
+                print("⚠️ USER MEMORY SAVE ERROR:", e)
+
+    def _admit(self, user_id: str, memory: Dict[str, Any]) -> None:
+        self._hot[user_id] = memory
+        if len(self._hot) > self.capacity:
+            # evict a batch of the coldest users so their write-backs share
+            # one transaction instead of committing once per new user
+            target = self.capacity - self.capacity // 16
+            evicted = []
+            while len(self._hot) > target:
+                uid, mem = self._hot.popitem(last=False)
+                if uid in self._dirty:
+                    self._dirty.discard(uid)
+                    evicted.append((uid, mem))
+            if evicted:
+                self._write(evicted)
+
+    def _write(self, records: List[Tuple[str, Dict[str, Any]]]) -> None:
+        now = time.time()
+        rows = [(uid, self._encode(mem), now) for uid, mem in records]
+        self._db.execute("BEGIN")
+        try:
+            self._db.executemany(
+                "INSERT INTO user_memory (user_id, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                rows,
+            )
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+        self.writebacks += len(rows)
+
+    def save(self, user_id: str) -> None:
+        """Write one user's memory now if it has unsaved changes."""
+        with self._lock:
+            if user_id in self._dirty and user_id in self._hot:
+                self._dirty.discard(user_id)
+                self._write([(user_id, self._hot[user_id])])
+
+    def flush(self) -> int:
+        """Write every dirty hot user in one transaction; returns the count."""
+        with self._lock:
+            records = [(uid, self._hot[uid]) for uid in self._dirty if uid in self._hot]
+            self._dirty.clear()
+            if records:
+                self._write(records)
+            return len(records)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            self.flush()
+            self._db.close()
+
+    def __len__(self) -> int:
+        """Users stored on disk (hot users not yet written are not counted)."""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM user_memory").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"hot": len(self._hot), "dirty": len(self._dirty), "capacity": self.capacity,
+                    "hits": self.hits, "misses": self.misses, "writebacks": self.writebacks,
+                    "errors": self.errors}
+
+
+_shared_user_store: Optional[UserMemoryStore] = None
+_shared_user_store_lock = threading.Lock()
+
+
+def shared_user_store() -> UserMemoryStore:
+    """
+    The process-wide UserMemoryStore on USER_DB_FILE, opened on first
+    use. Chatbots given a user_id but no store use it, so two bots of one
+    user share one live memory dict instead of overwriting each other.
+    """
+    global _shared_user_store
+    with _shared_user_store_lock:
+        if _shared_user_store is None:
+            import atexit
+
+            _shared_user_store = UserMemoryStore()
+            atexit.register(_shared_user_store.close)
+        return _shared_user_store
+
+
+# ======================= CONVERSATION SEARCH INDEX =======================
+
+SEARCH_TOKEN_RE = re.compile(r"[a-z0-9]+")
+SEARCH_STOPWORDS = frozenset(
+    "a an and are as at be been but by can do for from had has have he her his how i if im in is it "
+    "its just me my no not of on or our she so that the their them then there they this to too up "
+    "us was we were what when which who will with would you your".split()
+)
+
+
+def _search_token(word: str) -> str:
+    # fold plain plurals so "exams" finds "exam" ("stress" stays)
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def search_tokens(text: str) -> List[str]:
+    """Searchable word tokens of a message, in order (stopwords dropped)."""
+    return [_search_token(w) for w in SEARCH_TOKEN_RE.findall(text.lower())
+            if len(w) > 1 and w not in SEARCH_STOPWORDS]
+
+
+class _ArchiveFollower:
+    """
+    Keeps a store derived from the SessionStore up to date without making
+    a turn wait for a back-fill. Subclasses provide `_lock`, synced() (the
+    sessions covered so far) and sync(store), which commits in batches and
+    stops once `_closed` is set.
+    """
+
+    _closed = False
+    _catch_up_thread: Optional[threading.Thread] = None
+
+    def lag(self, store: "SessionStore") -> int:
+        """Sessions of `store` not covered yet."""
+        return max(0, len(store) - self.synced())
+
+    def follow(self, store: "SessionStore") -> None:
+        """
+        Call after appending to `store`. The new session is folded in
+        inline when it is all that is missing (milliseconds); a longer
+        back-log, such as an archive that predates this store, is left to
+        a catch_up() thread.
+        """
+        if self.lag(store) <= 1:
+            self.sync(store)
+        else:
+            self.catch_up(store)
+
+    def catch_up(self, store: "SessionStore") -> threading.Thread:
+        """Run sync(store) on a daemon thread unless one is already running."""
+        with self._lock:
+            t = self._catch_up_thread
+            if t is None or not t.is_alive():
+                t = self._catch_up_thread = threading.Thread(
+                    target=self._catch_up, args=(store,), daemon=True,
+                    name=f"{type(self).__name__}-catch-up")
+                t.start()
+            return t
+
+    def _catch_up(self, store: "SessionStore") -> None:
+        try:
+            self.sync(store)
+        except Exception as e:
+            if not self._closed:
+                print(f"⚠️ {type(self).__name__} CATCH-UP ERROR:", e)
+
+
+class ConversationIndex(_ArchiveFollower):
+    """
+    Inverted index over the user turns of a SessionStore, kept in SQLite.
+
+    Every turn is posted under its word tokens ("w:exam"), its topics
+    ("topic:study", from the keyword lists Chatbot._update_topics uses)
+    and its sentiment label ("label:negative"). Postings are keyed
+    (term, user, session, turn) in a WITHOUT ROWID table, so the newest
+    mentions of a term for one user are a backwards range read of that
+    key, however large the archive is. sync() indexes the sessions
+    appended to the store since the last call; follow() does that after
+    each save and leaves the first back-fill of an existing archive to a
+    background catch_up(), so no turn waits for it. Searches meanwhile
+    see the sessions indexed so far. Safe to share between threads.
+    """
+
+    def __init__(self, path: str = SEARCH_DB_FILE, synchronous: str = "NORMAL") -> None:
+        self.path = path
+        self._db = _open_sqlite(path, synchronous)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS terms ("
+            " id INTEGER PRIMARY KEY, term TEXT UNIQUE NOT NULL, df INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, user_id TEXT UNIQUE NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session INTEGER PRIMARY KEY, uid INTEGER NOT NULL, timestamp TEXT);"
+            "CREATE TABLE IF NOT EXISTS postings ("
+            " term INTEGER NOT NULL, uid INTEGER NOT NULL, session INTEGER NOT NULL, turn INTEGER NOT NULL,"
+            " PRIMARY KEY (term, uid, session, turn)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS sessions_by_user ON sessions (uid, session);"
+        )
+        # substring tests, as the phrase matcher does; for a handful of
+        # short keywords C-level `in` beats walking the automaton in Python
+        self._topics = [(TOPIC_PREFIX + t, kws) for t, kws in TOPIC_KEYWORDS.items()]
+        self._term_ids: Optional[Dict[str, int]] = None
+        self._user_ids: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    # ---------- terms ----------
+    def turn_terms(self, turn: Dict[str, Any]) -> set:
+        """Index terms of one user turn."""
+        text = turn.get("text", "")
+        terms = {"w:" + t for t in search_tokens(text)}
+        lower = text.lower()
+        terms.update(topic for topic, kws in self._topics if any(k in lower for k in kws))
+        label = turn.get("sentiment_label")
+        if label:
+            terms.add("label:" + label.lower())
+        return terms
+
+    def query_terms(self, query: str) -> List[str]:
+        """Terms a free-text query must all match; topic names search the topic."""
+        out = []
+        for t in search_tokens(query):
+            term = TOPIC_PREFIX + t if t in TOPIC_KEYWORDS else "w:" + t
+            if term not in out:
+                out.append(term)
+        return out
+
+    def _ids_for(self, terms: Iterable[str]) -> Dict[str, int]:
+        # the vocabulary is small next to the postings, so it lives in memory
+        if self._term_ids is None:
+            self._term_ids = dict(self._db.execute("SELECT term, id FROM terms"))
+        ids = self._term_ids
+        new = [t for t in terms if t not in ids]
+        if new:
+            self._db.executemany("INSERT OR IGNORE INTO terms (term, df) VALUES (?, 0)", [(t,) for t in new])
+            for t in new:
+                ids[t] = self._db.execute("SELECT id FROM terms WHERE term = ?", (t,)).fetchone()[0]
+        return ids
+
+    def _uid(self, user_id: Optional[str], create: bool) -> Optional[int]:
+        key = "" if user_id is None else str(user_id)
+        uid = self._user_ids.get(key)
+        if uid is None:
+            row = self._db.execute("SELECT id FROM users WHERE user_id = ?", (key,)).fetchone()
+            if row is None:
+                if not create:
+                    return None
+                row = (self._db.execute("INSERT INTO users (user_id) VALUES (?)", (key,)).lastrowid,)
+            uid = self._user_ids[key] = row[0]
+        return uid
+
+    # ---------- indexing ----------
+    def _postings(self, i: int, session: Dict[str, Any]) -> List[Tuple[str, int]]:
+        uid = self._uid(session.get("user_id"), create=True)
+        self._db.execute("INSERT OR REPLACE INTO sessions (session, uid, timestamp) VALUES (?, ?, ?)",
+                         (i, uid, session.get("timestamp")))
+        out = []
+        for j, turn in enumerate(session["history"]):
+            # history searches themselves would only find each other
+            if turn.get("speaker") == "user" and not SEARCH_QUERY_RE.search(turn.get("text", "").lower()):
+                out.extend((term, uid, i, j) for term in self.turn_terms(turn))
+        return out
+
+    def _write_postings(self, postings: List[Tuple[str, int, int, int]]) -> None:
+        ids = self._ids_for({p[0] for p in postings})
+        rows = sorted((ids[term], uid, i, j) for term, uid, i, j in postings)   # b-tree order
+        self._db.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?, ?, ?)", rows)
+        df: Dict[int, int] = {}
+        for row in rows:
+            df[row[0]] = df.get(row[0], 0) + 1
+        self._db.executemany("UPDATE terms SET df = df + ? WHERE id = ?", [(n, t) for t, n in df.items()])
+
+    def sync(self, store: "SessionStore", batch: int = 500) -> int:
+        """Index the store's sessions not indexed yet; returns how many."""
+        added = 0
+        while True:
+            # the lock is taken per batch so searches and follow() from
+            # other threads interleave with a long back-fill
+            with self._lock:
+                if self._closed:
+                    return added
+                start = len(self)
+                if start > len(store):
+                    self.reset()   # a different or truncated archive
+                    start = 0
+                stop = min(start + batch, len(store))
+                if start >= stop:
+                    return added
+                self._db.execute("BEGIN")
+                try:
+                    postings = []
+                    for i in range(start, stop):
+                        postings.extend(self._postings(i, store[i]))
+                    self._write_postings(postings)
+                    self._db.execute("COMMIT")
+                except Exception:
+                    self._db.execute("ROLLBACK")
+                    self._term_ids = None   # may hold ids of rolled-back terms
+                    self._user_ids.clear()
+                    raise
+                added += stop - start
+
+    def reset(self) -> None:
+        """Forget everything, e.g. after the archive was re-scored; sync() rebuilds."""
+        with self._lock:
+            self._db.executescript(
+                "DELETE FROM postings; DELETE FROM sessions; DELETE FROM terms; DELETE FROM users;")
+            self._term_ids = None
+            self._user_ids.clear()
+
+    # ---------- queries ----------
+    def search(self, query: str = "", user_id: Optional[str] = None, topic: Optional[str] = None,
+               label: Optional[str] = None, limit: int = 10,
+               per_session: bool = False) -> List[Dict[str, Any]]:
+        """
+        Newest user turns of `user_id` matching every term of `query`,
+        plus the optional topic and sentiment label, as
+        {"session", "turn", "timestamp"} (session and turn are positions
+        in the SessionStore). With `per_session` only the newest matching
+        turn of each session is returned.
+        """
+        terms = self.query_terms(query)
+        if topic:
+            terms.append(TOPIC_PREFIX + topic.lower())
+        if label:
+            terms.append("label:" + label.lower())
+        if not terms:
+            return []
+
+        with self._lock:
+            uid = self._uid(user_id, create=False)
+            if uid is None:
+                return []
+            marks = ",".join("?" * len(terms))
+            rows = self._db.execute(f"SELECT id, df FROM terms WHERE term IN ({marks})", terms).fetchall()
+            if len(rows) < len(terms):
+                return []   # some term never occurs
+            # drive the scan from the rarest term, probe the others by key
+            rows.sort(key=lambda r: r[1])
+            sql = "SELECT p.session, p.turn FROM postings p WHERE p.term = ? AND p.uid = ?"
+            for _ in rows[1:]:
+                sql += (" AND EXISTS (SELECT 1 FROM postings q WHERE q.term = ? AND q.uid = p.uid"
+                        " AND q.session = p.session AND q.turn = p.turn)")
+            sql += " ORDER BY p.session DESC, p.turn DESC"
+            args = [rows[0][0], uid] + [r[0] for r in rows[1:]]
+            if not per_session:
+                sql += " LIMIT ?"
+                args.append(limit)
+
+            found: List[Tuple[int, int]] = []
+            seen = set()
+            for session, turn in self._db.execute(sql, args):
+                if per_session:
+                    if session in seen:
+                        continue
+                    seen.add(session)
+                found.append((session, turn))
+                if len(found) >= limit:
+                    break
+
+            stamps = dict(self._db.execute(
+                f"SELECT session, timestamp FROM sessions WHERE session IN ({','.join('?' * len(found))})",
+                [s for s, _ in found])) if found else {}
+        return [{"session": s, "turn": t, "timestamp": stamps.get(s)} for s, t in found]
+
+    def latest_session(self, user_id: Optional[str]) -> Optional[int]:
+        """Position of the newest indexed session of `user_id`, or None."""
+        with self._lock:
+            uid = self._uid(user_id, create=False)
+            if uid is None:
+                return None
+            return self._db.execute("SELECT MAX(session) FROM sessions WHERE uid = ?", (uid,)).fetchone()[0]
+
+    def __len__(self) -> int:
+        """Sessions indexed."""
+        with self._lock:
+            row = self._db.execute("SELECT MAX(session) FROM sessions").fetchone()
+            return 0 if row[0] is None else row[0] + 1
+
+    def synced(self) -> int:
+        return len(self)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._db.close()
+
+
+# ======================= SENTIMENT ROLLUPS =======================
+
+ROLLUP_GRAINS = ("hour", "day", "week")
+
+
+def _rollup_buckets(when: datetime) -> Dict[str, str]:
+    # bucket keys sort chronologically as strings; weeks start on Monday
+    monday = when.date().toordinal() - when.weekday()
+    return {
+        "hour": when.strftime("%Y-%m-%dT%H"),
+        "day": when.date().isoformat(),
+        "week": datetime.fromordinal(monday).date().isoformat(),
+    }
+
+
+class SentimentRollups(_ArchiveFollower):
+    """
+    Per-user sentiment aggregates over hourly, daily and weekly buckets,
+    materialized in SQLite so long-term views never touch the session
+    archive.
+
+    Each bucket holds the user-turn count, label counts, sum, min and max
+    of the scores, and the recency-weighted sum and weight that Tier 1
+    uses within a session (turn i of a session weighs i), so bucket means
+    combine exactly across sessions. A session's turns fall in the bucket
+    of its save time. sync() folds in the sessions the store gained since
+    the last call, in the same transaction that advances its watermark,
+    so no session is counted twice; follow() does that after each save
+    and leaves a back-log to a background catch_up(). The watermark is a
+    session count, so re-scoring the archive needs reset(). Safe to share
+    between threads.
+    """
+
+    def __init__(self, path: str = ROLLUP_DB_FILE, synchronous: str = "NORMAL") -> None:
+        self.path = path
+        self._db = _open_sqlite(path, synchronous)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS rollups ("
+            " user_id TEXT NOT NULL, grain TEXT NOT NULL, bucket TEXT NOT NULL,"
+            " count INTEGER NOT NULL, pos INTEGER NOT NULL, neg INTEGER NOT NULL,"
+            " sum REAL NOT NULL, wsum REAL NOT NULL, wtotal REAL NOT NULL,"
+            " min REAL NOT NULL, max REAL NOT NULL,"
+            " PRIMARY KEY (user_id, grain, bucket)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);"
+        )
+        self._lock = threading.RLock()
+        self.skipped = 0
+
+    # ---------- updating ----------
+    @staticmethod
+    def _aggregate(session: Dict[str, Any]) -> Optional[list]:
+        count = pos = neg = 0
+        total = wsum = wtotal = 0.0
+        lo, hi = float("inf"), float("-inf")
+        for m in session["history"]:
+            if m.get("speaker") != "user" or m.get("sentiment_score") is None:
+                continue
+            s = m["sentiment_score"]
+            count += 1
+            label = m.get("sentiment_label")
+            pos += label == "Positive"
+            neg += label == "Negative"
+            total += s
+            wsum += count * s
+            wtotal += count
+            lo = min(lo, s)
+            hi = max(hi, s)
+        return [count, pos, neg, total, wsum, wtotal, lo, hi] if count else None
+
+    def _add(self, session: Dict[str, Any]) -> int:
+        agg = self._aggregate(session)
+        if agg is None:
+            return 0
+        try:
+            when = datetime.fromisoformat(str(session.get("timestamp")))
+        except ValueError:
+            self.skipped += 1
+            return 0
+        user = "" if session.get("user_id") is None else str(session["user_id"])
+        self._db.executemany(
+            "INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(user_id, grain, bucket) DO UPDATE SET"
+            " count = count + excluded.count, pos = pos + excluded.pos, neg = neg + excluded.neg,"
+            " sum = sum + excluded.sum, wsum = wsum + excluded.wsum, wtotal = wtotal + excluded.wtotal,"
+            " min = MIN(min, excluded.min), max = MAX(max, excluded.max)",
+            [(user, grain, bucket, *agg) for grain, bucket in _rollup_buckets(when).items()],
+        )
+        return agg[0]
+
+    def synced(self) -> int:
+        """Sessions of the store folded in so far."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'synced'").fetchone()
+            return row[0] if row else 0
+
+    def reset(self) -> None:
+        """Drop every bucket and the watermark; sync() rebuilds from the archive."""
+        with self._lock:
+            self._db.executescript("DELETE FROM rollups; DELETE FROM meta;")
+
+    def sync(self, store: "SessionStore", batch: int = 1000) -> int:
+        """Fold in the store's sessions not counted yet; returns how many."""
+        added = 0
+        while True:
+            # locked per batch, so queries interleave with a long back-fill
+            with self._lock:
+                if self._closed:
+                    return added
+                start = self.synced()
+                if start > len(store):
+                    self.reset()   # a different or truncated archive: start over
+                    start = 0
+                stop = min(start + batch, len(store))
+                if start >= stop:
+                    return added
+                self._db.execute("BEGIN")
+                try:
+                    for i in range(start, stop):
+                        self._add(store[i])
+                    self._db.execute(
+                        "INSERT INTO meta VALUES ('synced', ?) "
+                        "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (stop,))
+                    self._db.execute("COMMIT")
+                except Exception:
+                    self._db.execute("ROLLBACK")
+                    raise
+                added += stop - start
+
+    # ---------- queries ----------
+    @staticmethod
+    def _row(bucket: Optional[str], count, pos, neg, total, wsum, wtotal, lo, hi) -> Dict[str, Any]:
+        return {
+            "bucket": bucket, "count": count, "pos": pos, "neg": neg,
+            "mean": total / count if count else None,
+            "weighted_mean": wsum / wtotal if wtotal else None,
+            "min": lo, "max": hi,
+        }
+
+    @staticmethod
+    def _range(user_id: Optional[str], grain: str, since: Optional[str],
+               until: Optional[str]) -> Tuple[str, List[Any]]:
+        if grain not in ROLLUP_GRAINS:
+            raise ValueError(f"grain must be one of {ROLLUP_GRAINS}, not {grain!r}")
+        where = " WHERE user_id = ? AND grain = ?"
+        args: List[Any] = ["" if user_id is None else str(user_id), grain]
+        if since:
+            where += " AND bucket >= ?"
+            args.append(since)
+        if until:
+            where += " AND bucket <= ?"
+            args.append(until + "\uffff")   # a prefix like "2026-03" includes all of March
+        return where, args
+
+    def series(self, user_id: Optional[str] = None, grain: str = "day",
+               since: Optional[str] = None, until: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        One user's buckets in time order. `since`/`until` are compared
+        with the bucket keys ("2026-03-01T09", "2026-03-01", week of
+        Monday "2026-02-23"); a shorter prefix such as "2026-03" works.
+        """
+        where, args = self._range(user_id, grain, since, until)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT bucket, count, pos, neg, sum, wsum, wtotal, min, max FROM rollups"
+                + where + " ORDER BY bucket", args).fetchall()
+        return [self._row(*r) for r in rows]
+
+    def summary(self, user_id: Optional[str] = None, since: Optional[str] = None,
+                until: Optional[str] = None) -> Dict[str, Any]:
+        """The user's daily buckets in the range combined into one."""
+        where, args = self._range(user_id, "day", since, until)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MIN(bucket) || '..' || MAX(bucket), COALESCE(SUM(count), 0),"
+                " COALESCE(SUM(pos), 0), COALESCE(SUM(neg), 0), SUM(sum), SUM(wsum), SUM(wtotal),"
+                " MIN(min), MAX(max) FROM rollups" + where, args).fetchone()
+        return self._row(*row)
+
+    @staticmethod
+    def streaks(days: List[Dict[str, Any]], threshold: float = -0.05) -> Dict[str, Any]:
+        """Longest and current runs of consecutive negative days (mean below `threshold`)."""
+        longest = current = 0
+        longest_end = None
+        prev = None
+        for d in days:
+            ordinal = datetime.fromisoformat(d["bucket"]).toordinal()
+            if d["mean"] is not None and d["mean"] < threshold:
+                current = current + 1 if prev is not None and ordinal == prev + 1 and current else 1
+                if current > longest:
+                    longest, longest_end = current, d["bucket"]
+            else:
+                current = 0
+            prev = ordinal
+        return {"longest": longest, "longest_end": longest_end, "current": current}
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._db.close()
+
+
+def report_main(argv: List[str]) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="chatbot_sentiment.py report",
+        description="Long-term mood report, read from the sentiment rollups only."
+    )
+    parser.add_argument("--user", default=None, help="user id (default: the local CLI user)")
+    parser.add_argument("--grain", choices=ROLLUP_GRAINS, default="week")
+    parser.add_argument("--months", type=int, default=12, help="how far back (ignored with --since)")
+    parser.add_argument("--since", default=None, help="first bucket, e.g. 2026-01-01")
+    parser.add_argument("--until", default=None, help="last bucket")
+    parser.add_argument("--db", default=ROLLUP_DB_FILE)
+    parser.add_argument("--sync", action="store_true",
+                        help="first fold in archived sessions not counted yet")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="first recount every archived session (e.g. after rescore)")
+    args = parser.parse_args(argv)
+
+    rollups = SentimentRollups(args.db)
+    if args.rebuild:
+        rollups.reset()
+    if args.sync or args.rebuild:
+        added = rollups.sync(SessionStore(readonly=True))
+        print(f"Folded in {added} session(s).")
+    since = args.since or (datetime.now() - timedelta(days=30 * args.months)).date().isoformat()
+
+    series = rollups.series(args.user, args.grain, since, args.until)
+    print(f"=== Sentiment by {args.grain} since {since} ===")
+    if not series:
+        print("No data. (Sessions are counted when saved; use --sync for older ones.)")
+        return
+    for b in series:
+        avg = b["weighted_mean"]
+        bar = ("█" if avg >= 0 else "▒") * int(abs(avg) * 10)
+        print(f"{b['bucket']:<13} {avg:+.3f}  n={b['count']:<5} "
+              f"min {b['min']:+.2f} max {b['max']:+.2f}  {bar}")
+
+    total = rollups.summary(args.user, since, args.until)
+    streak = SentimentRollups.streaks(rollups.series(args.user, "day", since, args.until))
+    print(f"\nOverall: {total['weighted_mean']:+.3f} over {total['count']} messages "
+          f"({total['pos']} positive, {total['neg']} negative)")
+    print(f"Longest run of negative days: {streak['longest']}"
+          + (f" (ending {streak['longest_end']})" if streak["longest"] else "")
+          + f"; current run: {streak['current']}")
+    rollups.close()
+
+
+# ======================= ROTATING CHAT LOG =======================
+
+LOG_HEADER = "=== New Chat ==="
+LOG_CODECS = {"gzip": ".gz", "zstd": ".zst"}
+LOG_INDEX_NAME = "index.jsonl"
+
+
+def _open_segment(path: str, mode: str, suffix: Optional[str] = None):
+    """Binary stream over a segment: plain, gzip or zstd by `suffix` (default: the extension)."""
+    suffix = os.path.splitext(path)[1] if suffix is None else suffix
+    if suffix == ".zst":
+        import zstandard
+        raw = open(path, mode)
+        if "r" in mode:
+            return zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=True)
+    if suffix == ".gz":
+        import gzip
+        return gzip.open(path, mode, compresslevel=6) if "w" in mode else gzip.open(path, mode)
+    return open(path, mode)
+
+
+def _log_session_id(session_id: Any) -> str:
+    # header fields are space separated
+    return "_".join(str(session_id).split()) or "-"
+
+
+def _parse_log(lines: Iterable[str], segment: Optional[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Transcripts from log lines. Lines that are not "USER: "/"BOT: " turns
+    continue the previous turn (multi-line replies). Legacy headers carry
+    no timestamp or session id; those fields are None.
+    """
+    current = None
+    for line in lines:
+        line = line.rstrip("\n")
+        if line.startswith(LOG_HEADER):
+            if current is not None:
+                yield current
+            fields = line[len(LOG_HEADER):].split()
+            current = {
+                "session": next((f[8:] for f in fields if f.startswith("session=")), None),
+                "timestamp": fields[0] if fields and not fields[0].startswith("session=") else None,
+                "segment": segment,
+                "turns": [],
+            }
+        elif current is not None:
+            speaker, sep, text = line.partition(": ")
+            if sep and speaker in ("USER", "BOT"):
+                current["turns"].append({"speaker": speaker.lower(), "text": text})
+            elif current["turns"]:
+                current["turns"][-1]["text"] += "\n" + line
+    if current is not None:
+        yield current
+
+
+class ChatLogWriter:
+    """
+    Buffered, rotating transcript log replacing the single ever-growing
+    chat_log.txt.
+
+    write_session() formats a transcript into an in-memory buffer and
+    returns; a daemon thread appends the buffer to the active segment every
+    `interval` seconds, or as soon as it holds `buffer_bytes`. A writer that
+    finds twice that much still unwritten waits, so memory stays bounded
+    when the disk falls behind. A segment is closed once it reaches
+    `max_bytes` or is `max_age` seconds old, compressed ("gzip", or "zstd"
+    with the zstandard package) and described by one line of index.jsonl:
+    time range, session ids, record count and sizes.
+
+    Segment names carry the writer's pid, so several processes can share
+    a directory; segments of a process that died are finished on the next
+    start.
+    """
+
+    def __init__(self, directory: str = CHAT_LOG_DIR, max_bytes: int = 64 << 20,
+                 max_age: float = 24 * 3600.0, buffer_bytes: int = 256 << 10,
+                 interval: float = 1.0, compression: str = "gzip") -> None:
+        if compression not in LOG_CODECS:
+            raise ValueError(f"compression must be one of {tuple(LOG_CODECS)}, not {compression!r}")
+        if compression == "zstd":
+            import zstandard   # fail here rather than in the writer thread
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.buffer_bytes = buffer_bytes
+        self.interval = interval
+        self.suffix = LOG_CODECS[compression]
+        os.makedirs(directory, exist_ok=True)
+
+        self._buffer: List[Tuple[datetime, str, bytes]] = []
+        self._buffered = 0
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()   # orders background and flush() writes
+        self._closed = False
+        self._file = None
+        self._segment: Optional[Dict[str, Any]] = None
+        self._opened_at = 0.0
+        self._seq = count()
+
+        self.records = 0
+        self.segments = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name="chat-log-writer", daemon=True)
+        self._thread.start()
+
+    # ---------- writing ----------
+    def write_session(self, session_id: str, turns: Iterable[Dict[str, Any]],
+                      timestamp: Optional[datetime] = None) -> None:
+        """Queue one transcript; returns once it is in the buffer."""
+        when = timestamp or datetime.now()
+        session_id = _log_session_id(session_id)
+        lines = [f"{LOG_HEADER} {when.isoformat(timespec='seconds')} session={session_id}\n"]
+        for m in turns:
+            lines.append(f"{m['speaker'].upper()}: {m['text']}\n")
+        block = "".join(lines).encode("utf-8")
+
+        with self._cond:
+            while self._buffered >= 2 * self.buffer_bytes and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                raise ValueError("ChatLogWriter is closed")
+            self._buffer.append((when, session_id, block))
+            self._buffered += len(block)
+            self.records += 1
+            if self._buffered >= self.buffer_bytes:
+                self._cond.notify_all()
+
+    def _open(self, when: datetime) -> None:
+        name = f"chat-{when:%Y%m%dT%H%M%S}-{os.getpid()}-{next(self._seq):04d}.log"
+        self._file = open(os.path.join(self.directory, name), "ab")
+        self._opened_at = time.monotonic()
+        self._segment = {"segment": name, "start": None, "end": None,
+                         "sessions": {}, "records": 0, "bytes": 0}
+
+    def _write_buffer(self) -> None:
+        with self._cond:
+            entries, self._buffer = self._buffer, []
+            self._buffered = 0
+            self._cond.notify_all()
+        if not entries:
+            return
+        for when, session_id, block in entries:
+            if self._segment is not None and self._segment["bytes"] >= self.max_bytes:
+                self._rotate()
+            if self._segment is None:
+                self._open(when)
+            self._file.write(block)
+            seg = self._segment
+            stamp = when.isoformat(timespec="seconds")
+            seg["start"] = seg["start"] or stamp
+            seg["end"] = stamp
+            seg["sessions"][session_id] = None
+            seg["records"] += 1
+            seg["bytes"] += len(block)
+        self._file.flush()
+
+    def _rotate(self) -> None:
+        # close, compress and index the active segment
+        if self._segment is None:
+            return
+        self._file.close()
+        seg, self._segment, self._file = self._segment, None, None
+        seg["sessions"] = list(seg["sessions"])
+        self._finish(seg)
+
+    def _finish(self, seg: Dict[str, Any]) -> None:
+        # write the compressed copy under a temp name, make it durable, then
+        # index it; only then drop the plain segment, so a crash at any point
+        # leaves either the .log (finished again on the next start) or both
+        src = os.path.join(self.directory, seg["segment"])
+        name = seg["segment"] + self.suffix
+        dst = os.path.join(self.directory, name)
+        with open(src, "rb") as fin, _open_segment(dst + ".tmp", "wb", self.suffix) as fout:
+            while True:
+                chunk = fin.read(1 << 20)
+                if not chunk:
+                    break
+                fout.write(chunk)
+        with open(dst + ".tmp", "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(dst + ".tmp", dst)
+
+        entry = dict(seg, segment=name, compressed=os.path.getsize(dst))
+        with open(os.path.join(self.directory, LOG_INDEX_NAME), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        os.remove(src)
+        self.segments += 1
+
+    def _recover(self) -> None:
+        # plain segments of writers that are gone: rebuild their metadata
+        # from the headers and finish them (this process's own are left to
+        # the writer that owns them)
+        for name in sorted(os.listdir(self.directory)):
+            if not (name.startswith("chat-") and name.endswith(".log")):
+                continue
+            pid = name.split("-")[2]
+            if not pid.isdigit() or _pid_running(int(pid)):
+                continue
+            seg = {"segment": name, "start": None, "end": None, "sessions": {}, "records": 0,
+                   "bytes": os.path.getsize(os.path.join(self.directory, name))}
+            with open(os.path.join(self.directory, name), encoding="utf-8", errors="replace") as f:
+                for t in _parse_log(f, name):
+                    seg["start"] = seg["start"] or t["timestamp"]
+                    seg["end"] = t["timestamp"]
+                    seg["sessions"][t["session"]] = None
+                    seg["records"] += 1
+            seg["sessions"] = list(seg["sessions"])
+            self._finish(seg)
+
+    def _step(self, rotate: bool = False) -> None:
+        with self._io_lock:
+            try:
+                self._write_buffer()
+                if self._segment is not None and (
+                        rotate or time.monotonic() - self._opened_at >= self.max_age):
+                    self._rotate()
+            except OSError as e:
+                self.errors += 1
+                print("⚠️ CHAT LOG ERROR:", e)
+
+    def _run(self) -> None:
+        with self._io_lock:
+            try:
+                self._recover()
+            except OSError as e:
+                self.errors += 1
+                print("⚠️ CHAT LOG ERROR:", e)
+        while True:
+            with self._cond:
+                if not self._closed and self._buffered < self.buffer_bytes:
+                    self._cond.wait(self.interval)
+                if self._closed:
+                    return
+            self._step()
+
+    def flush(self) -> None:
+        """Write everything buffered to the active segment now."""
+        self._step()
+
+    def rotate(self) -> None:
+        """Write the buffer, then close and compress the active segment."""
+        self._step(rotate=True)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._step(rotate=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            buffered = self._buffered
+        return {"records": self.records, "segments": self.segments,
+                "buffered_bytes": buffered, "errors": self.errors}
+
+
+class ChatLogReader:
+    """
+    Streams transcripts out of a ChatLogWriter directory, one segment at a
+    time and decompressing as it reads. The index lets sessions() skip every
+    segment outside the requested time range or without the requested
+    session id; segments not indexed yet (active ones) are always scanned.
+    `legacy_path` adds the old single chat_log.txt in front.
+    """
+
+    def __init__(self, directory: str = CHAT_LOG_DIR,
+                 legacy_path: Optional[str] = CHAT_LOG_FILE) -> None:
+        self.directory = directory
+        self.legacy_path = legacy_path
+
+    def index(self) -> List[Dict[str, Any]]:
+        """Closed segments in write order (a re-finished segment appears once)."""
+        entries: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(os.path.join(self.directory, LOG_INDEX_NAME), encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue   # a torn last line
+                    entries[entry["segment"]] = entry
+        except FileNotFoundError:
+            pass
+        return sorted(entries.values(), key=lambda e: (e["start"] or "", e["segment"]))
+
+    def segments(self) -> List[Dict[str, Any]]:
+        """Indexed segments, then the plain ones still being written."""
+        indexed = self.index()
+        names = {e["segment"] for e in indexed}
+        try:
+            active = sorted(n for n in os.listdir(self.directory)
+                            if n.startswith("chat-") and n.endswith(".log")
+                            and not any(n + s in names for s in LOG_CODECS.values()))
+        except FileNotFoundError:
+            active = []
+        return indexed + [{"segment": n, "start": None, "end": None, "sessions": None} for n in active]
+
+    def find(self, session_id: str) -> List[str]:
+        """Segments that may hold transcripts of this session."""
+        return [e["segment"] for e in self.segments()
+                if e["sessions"] is None or session_id in e["sessions"]]
+
+    def _read(self, name: str) -> Iterator[Dict[str, Any]]:
+        import io
+        try:
+            stream = _open_segment(os.path.join(self.directory, name), "rb")
+        except FileNotFoundError:
+            return   # compressed and removed since the listing
+        with io.TextIOWrapper(stream, encoding="utf-8", errors="replace") as f:
+            yield from _parse_log(f, name)
+
+    def sessions(self, session_id: Optional[str] = None, since=None, until=None) -> Iterator[Dict[str, Any]]:
+        """
+        Transcripts ({"session", "timestamp", "segment", "turns"}) in
+        write order, optionally for one session and/or within [since,
+        until] (datetimes or ISO strings).
+        """
+        if isinstance(since, datetime):
+            since = since.isoformat(timespec="seconds")
+        if isinstance(until, datetime):
+            until = until.isoformat(timespec="seconds")
+
+        if self.legacy_path and session_id is None and since is None and until is None \
+                and os.path.exists(self.legacy_path):
+            with open(self.legacy_path, encoding="utf-8", errors="replace") as f:
+                yield from _parse_log(f, None)
+
+        for seg in self.segments():
+            if seg["start"] is not None:
+                if session_id is not None and session_id not in seg["sessions"]:
+                    continue
+                if (since and seg["end"] < since) or (until and seg["start"] > until):
+                    continue
+            for t in self._read(seg["segment"]):
+                if session_id is not None and t["session"] != session_id:
+                    continue
+                if (since and (t["timestamp"] or "") < since) or (until and (t["timestamp"] or "") > until):
+                    continue
+                yield t
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.sessions()
+
+
+def log_main(argv: List[str]) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="chatbot_sentiment.py log",
+        description="Print archived transcripts from the rotating chat log."
+    )
+    parser.add_argument("--dir", default=CHAT_LOG_DIR)
+    parser.add_argument("--session", default=None, help="only this session id")
+    parser.add_argument("--since", default=None, help="ISO time, e.g. 2026-01-31T09:00")
+    parser.add_argument("--until", default=None, help="ISO time")
+    parser.add_argument("--segments", action="store_true", help="list segments instead")
+    args = parser.parse_args(argv)
+
+    reader = ChatLogReader(args.dir)
+    if args.segments:
+        for seg in reader.segments():
+            sessions = "active" if seg["sessions"] is None else f"{len(seg['sessions'])} sessions"
+            print(f"{seg['segment']}  {seg['start'] or '-'} .. {seg['end'] or '-'}  {sessions}")
+        return
+    for t in reader.sessions(args.session, args.since, args.until):
+        print(LOG_HEADER + (f" {t['timestamp']} session={t['session']}" if t["timestamp"] else ""))
+        for m in t["turns"]:
+            print(f"{m['speaker'].upper()}: {m['text']}")
+
+
 # ======================= CHATBOT CLASS (PART 1) =======================
 
 class Chatbot:
 
-    def __init__(self) -> None:
-        self.analyzer = HybridSentimentAnalyzer()
-        self.history = []
+    def __init__(self, analyzer: Optional[HybridSentimentAnalyzer] = None,
+                 llm: Optional[GroqLLMResponder] = None,
+                 async_llm: Optional[AsyncGroqLLMResponder] = None,
+                 past_chats: Optional["SessionStore"] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 metrics: Optional[TurnMetrics] = None,
+                 intents: Optional[IntentRouter] = None,
+                 memory_writer: Optional[MemoryWriter] = None,
+                 user_id: Optional[str] = None,
+                 user_store: Optional[UserMemoryStore] = None,
+                 classifier: Optional[EmbeddingClassifier] = None,
+                 chat_log: Optional[ChatLogWriter] = None,
+                 search_index: Optional[ConversationIndex] = None,
+                 rollups: Optional[SentimentRollups] = None) -> None:
+        # analyzer, responders, session store, user store and metrics can be
+        # shared between Chatbot instances (e.g. one per session in ChatServer)
+        self.analyzer = analyzer or HybridSentimentAnalyzer()
+        if intents is None:
+            intents = self.analyzer.intents if self.analyzer.intents is not None else DEFAULT_INTENT_ROUTER
+        self.intents = intents
+        self.history = ConversationHistory()
+        self.stats = SentimentAccumulator()
 
         # FIXED: topics MUST be a set permanently
         self.memory = {
@@ -205,18 +4051,54 @@ class Chatbot:
         }
 
         self.last_bot_reply = None
-        self.past_chats = []
-
-        self.llm = GroqLLMResponder()
+        self.past_chats = past_chats
+
+        self.llm = llm or GroqLLMResponder()
+        self._async_llm = async_llm
+        self.context = ContextBuilder(summarizer=self.llm.summarize)
+        self.response_cache = response_cache
+        self.metrics = metrics   # None: no timing at all
+        self.classifier = classifier   # None: keyword topics and intents only
+        self.memory_writer = memory_writer   # None: memory saved only by save_persistent_memory()
+        self.chat_log = chat_log   # None: transcripts appended to the legacy CHAT_LOG_FILE
+        self._search_index = search_index
+        self.rollups = rollups   # None: no long-term per-user aggregates
+
+        # with a user id, memory lives in the per-user store instead of
+        # the single USER_MEMORY_FILE
+        self.user_id = user_id
+        if user_id is not None and user_store is None:
+            user_store = shared_user_store()
+        self.user_store = user_store if user_id is not None else None
+        # names this conversation in the chat log index
+        self.session_id = user_id if user_id is not None else datetime.now().strftime("%Y%m%dT%H%M%S")
 
         self._load_persistent_memory()
+        self._saved_memory = self._memory_snapshot()
+
+    @property
+    def async_llm(self) -> AsyncGroqLLMResponder:
+        # only built when the async path is actually used
+        if self._async_llm is None:
+            self._async_llm = AsyncGroqLLMResponder()
+        return self._async_llm
+
+    @property
+    def search_index(self) -> ConversationIndex:
+        # opened on the first search, which starts its back-fill
+        if self._search_index is None:
+            self._search_index = ConversationIndex()
+        return self._search_index
 
     # ---------- FIXED: Persistent Memory Loader ----------
     def _load_persistent_memory(self):
         if not os.path.exists(MEMORY_DIR):
             os.makedirs(MEMORY_DIR)
 
-        if os.path.exists(USER_MEMORY_FILE):
+        if self.user_store is not None:
+            # only this user's record is read
+            self.memory = self.user_store.get(self.user_id, self.memory)
+        elif os.path.exists(USER_MEMORY_FILE):
             try:
                 with open(USER_MEMORY_FILE, "r") as f:
                     data = json.load(f)
@@ -232,44 +4114,68 @@ class Chatbot:
             except Exception:
                 pass
 
-        if os.path.exists(CHAT_HISTORY_FILE):
-            try:
-                with open(CHAT_HISTORY_FILE, "r") as f:
-                    self.past_chats = json.load(f)
-            except:
-                self.past_chats = []
-        else:
-            self.past_chats = []
+        # only the offset index is read here; sessions load on demand
+        if self.past_chats is None:
+            self.past_chats = SessionStore()
     # ---------- Save persistent memory ----------
-    def save_persistent_memory(self):
+    def _memory_snapshot(self):
         data = self.memory.copy()
         # convert set → list for JSON
         if isinstance(data.get("topics"), set):
-            data["topics"] = list(data["topics"])
+            data["topics"] = sorted(data["topics"])
+        return data
+
+    def _memory_changed(self):
+        # end of a turn: never touches the disk
+        if self.user_store is not None:
+            self.user_store.mark_dirty(self.user_id, self.memory)
+        elif self.memory_writer is not None:
+            # dirty check by value: only changed memory reaches the writer
+            snapshot = self._memory_snapshot()
+            if snapshot != self._saved_memory:
+                self._saved_memory = snapshot
+                self.memory_writer.submit(snapshot)
 
-        with open(USER_MEMORY_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
+    def save_persistent_memory(self):
+        if self.user_id is not None:
+            # where this user's newest session lands in the shared archive
+            self.memory["last_session"] = len(self.past_chats)
+        data = self._memory_snapshot()
+        self._saved_memory = data
+        if self.user_store is not None:
+            self.user_store.mark_dirty(self.user_id, self.memory)
+            self.user_store.save(self.user_id)
+        elif self.memory_writer is not None:
+            self.memory_writer.submit(data)
+            self.memory_writer.flush()
+        else:
+            write_json_atomic(USER_MEMORY_FILE, data)
+
+        if self.response_cache is not None:
+            self.response_cache.save()
 
         session = {
             "timestamp": str(datetime.now()),
             "history": self.history
         }
+        if self.user_id is not None:
+            session["user_id"] = self.user_id
         self.past_chats.append(session)
-
-        with open(CHAT_HISTORY_FILE, "w", encoding="utf-8") as f:
-            json.dump(self.past_chats, f, indent=4)
+        if self._search_index is not None:
+            self._search_index.follow(self.past_chats)
+        if self.rollups is not None:
+            self.rollups.follow(self.past_chats)
 
     # ---------- History helpers ----------
     def add_user(self, text, label, score):
-        self.history.append({
-            "speaker": "user",
-            "text": text,
-            "sentiment_label": label,
-            "sentiment_score": score,
-        })
+        self.history.add("user", text, label, score)
+        self.context.add("user", text)
+        self.stats.add(label, score)
 
     def add_bot(self, text):
-        self.history.append({"speaker": "bot", "text": text})
+        self.history.add("bot", text)
+        self.context.add("bot", text)
+        self.last_bot_reply = text
 
     # ---------- Name Extraction ----------
     def _extract_name(self, text):
@@ -310,44 +4216,38 @@ class Chatbot:
         return None
 
     # ---------- Tone Detection ----------
-    def _update_tone_from_text(self, text):
-        t = text.lower()
-        casual = {"bro", "dude", "lol", "lmao", "yrr", "u ", "omg", "yaar", "babe"}
-        formal = {"please", "kindly", "could you", "would you"}
+    def _keyword_hits(self, text):
+        return self.analyzer.matcher.categories(text.lower())
+
+    def _update_tone_from_text(self, text, hits=None):
+        if hits is None:
+            hits = self._keyword_hits(text)
 
-        if any(c in t for c in casual):
+        if "tone_casual" in hits:
             self.memory["tone"] = "casual"
-        elif any(f in t for f in formal):
+        elif "tone_formal" in hits:
             self.memory["tone"] = "formal"
 
     # ---------- Topic Extraction (fixed set usage) ----------
-    def _update_topics(self, text):
-        t = text.lower()
+    def _update_topics(self, text, hits=None):
+        if hits is None:
+            hits = self._keyword_hits(text)
         topics = self.memory["topics"]   # ALWAYS a set
 
-        if any(w in t for w in ["exam", "test", "study", "assignment", "submission"]):
-            topics.add("study")
-
-        if any(w in t for w in ["job", "work", "office", "career"]):
-            topics.add("work")
-
-        if any(w in t for w in [
-            "sad", "upset", "happy", "depressed", "angry", "worried",
-            "confident", "blue", "suicidal"
-        ]):
-            topics.add("feelings")
-
-        if any(w in t for w in ["issue", "problem", "error", "bug", "failed"]):
-            topics.add("problems")
+        for category in hits:
+            if category.startswith(TOPIC_PREFIX):
+                topics.add(category[len(TOPIC_PREFIX):])
 
     # ---------- Memory Update ----------
-    def update_memory_from_text(self, text):
+    def update_memory_from_text(self, text, hits=None):
         name = self._extract_name(text)
         if name:
             self.memory["name"] = name
 
-        self._update_tone_from_text(text)
-        self._update_topics(text)
+        if hits is None:
+            hits = self._keyword_hits(text)
+        self._update_tone_from_text(text, hits)
+        self._update_topics(text, hits)
 
     # ---------- Sentiment Stats ----------
     def update_sentiment_stats(self, label):
@@ -366,74 +4266,112 @@ class Chatbot:
             self.memory["positive_streak"] = max(0, self.memory["positive_streak"] - 1)
 
     # ---------- Crisis Detection ----------
-    def detect_crisis(self, text):
-        t = text.lower()
-        crisis = [
-            "suicidal", "kill myself", "i want to die", "i wanna die",
-            "don't want to live", "life is meaningless",
-            "hurt myself", "self-harm", "cut myself",
-        ]
-        if any(p in t for p in crisis):
-            return (
-                "I'm really sorry you're feeling this way. "
-                "I might not be able to provide the help you need right now. "
-                "Please reach out to someone you trust or a mental health professional. "
-                "You matter, and you're not alone."
-            )
+    def detect_crisis(self, text, hits=None):
+        if hits is None:
+            hits = self._keyword_hits(text)
+        if "crisis" in hits:
+            return self.reply_crisis(text)
         return None
 
-    # ---------- Intent Handler (same but cleaned & stable) ----------
-    def detect_special_cases(self, text):
-        t = text.lower().strip()
-
-        # crisis first
-        crisis = self.detect_crisis(text)
-        if crisis:
-            return crisis
-
-        # show last chat
-        if "previous chat" in t or "last conversation" in t:
-            if not self.past_chats:
-                return "You don't have any stored conversations yet."
-
-            last = self.past_chats[-1]["history"][-10:]
-            lines = [f"{m['speaker']}: {m['text']}" for m in last]
-            return "Here are the last messages from your previous chat:\n" + "\n".join(lines)
-
-        # greetings
-        if t in {"hi", "hii", "hello", "hey"} or re.fullmatch(r"h+i+", t):
-            name = f" {self.memory['name']}" if self.memory['name'] else ""
-            return f"Hello{name}! It’s great connecting with you. How may I assist you today?"
-
-        # how are you
-        if "how are you" in t:
-            return "I'm functioning well, thank you for asking. How are you doing today?"
-
-        # who am I
-        if "who am i" in t:
-            if self.memory["name"]:
-                return f"You told me earlier your name is {self.memory['name']}."
-            return "You haven’t told me your name yet."
-
-        # romantic
-        if "love" in t:
-            self.memory["tone"] = "casual"
-            return "That's sweet of you. I'm always here for a good conversation. 💙"
-
-        # jokes
-        if "joke" in t:
-            import random
-            jokes = [
-                "Why do programmers hate nature? Too many bugs! 😄",
-                "Why do computers get cold? They forgot to close their Windows! 😂"
-            ]
-            return random.choice(jokes)
+    # ---------- Intent Handler ----------
+    def _router_hits(self, hits):
+        # the turn's keyword hits already carry the intent categories when
+        # the analyzer's matcher was compiled from this router
+        analyzer = self.analyzer
+        if hits is not None and not (analyzer.intents is self.intents
+                                     and analyzer.intents_version == self.intents.version):
+            return None
+        return hits
+
+    def detect_special_cases(self, text, hits=None):
+        return self.intents.route(self, text, self._router_hits(hits))
+
+    def _blocking_intent(self, text, hits):
+        return any(i.blocking for i in self.intents.candidates(text, self._router_hits(hits)))
+
+    # ---------- Intent Replies ----------
+    def reply_crisis(self, text):
+        return (
+            "I'm really sorry you're feeling this way. "
+            "I might not be able to provide the help you need right now. "
+            "Please reach out to someone you trust or a mental health professional. "
+            "You matter, and you're not alone."
+        )
+
+    def _own_last_session(self) -> Optional[int]:
+        # without a user id the archive holds one person's chats; with one
+        # it is shared, so only a session saved under this id will do
+        store = self.past_chats
+        if not store:
+            return None
+        if self.user_id is None:
+            return len(store) - 1
+        def own(i):
+            return isinstance(i, int) and 0 <= i < len(store) and store.view(i).get("user_id") == self.user_id
+
+        i = self.memory.get("last_session")
+        if not own(i):
+            # saved before the pointer existed: ask the search index
+            i = self.search_index.latest_session(self.user_id)
+        return i if own(i) else None
+
+    def reply_previous_chat(self, text):
+        session = self._own_last_session()
+        if session is None:
+            return "You don't have any stored conversations yet."
+
+        last = self.past_chats.last_turns(10, session)
+        lines = [f"{m['speaker']}: {m['text']}" for m in last]
+        return "Here are the last messages from your previous chat:\n" + "\n".join(lines)
+
+    def reply_search_history(self, text):
+        m = SEARCH_QUERY_RE.search(text.lower())
+        if m is None:
+            return None
+        topic = m.group("query").strip(" ?.!")
+        index = self.search_index
+        if not index.query_terms(topic):
+            return "What should I look for? Try something like: when did I talk about exams?"
+
+        # never back-fill inline: older sessions are indexed in the background
+        pending = index.lag(self.past_chats)
+        if pending:
+            index.catch_up(self.past_chats)
+        found = index.search(topic, user_id=self.user_id, limit=3, per_session=True)
+        if not found:
+            if pending:
+                return (f"I couldn't find {topic!r} yet; I'm still indexing {pending} older "
+                        "conversation(s), so try again in a little while.")
+            return f"I couldn't find {topic!r} in our past conversations."
+
+        first = found[0]
+        said = self.past_chats.view(first["session"])["history"][first["turn"]]["text"]
+        reply = f"You last talked about {topic} on {(first['timestamp'] or '?')[:16]}, when you said: \"{said}\""
+        if len(found) > 1:
+            reply += " Before that: " + ", ".join((f["timestamp"] or "?")[:16] for f in found[1:]) + "."
+        return reply
 
-        # bye
-        if "bye" in t:
-            return "Goodbye! It was a pleasure talking with you."
+    def reply_greeting(self, text):
+        name = f" {self.memory['name']}" if self.memory['name'] else ""
+        return f"Hello{name}! It’s great connecting with you. How may I assist you today?"
 
-        return None
+    def reply_how_are_you(self, text):
+        return "I'm functioning well, thank you for asking. How are you doing today?"
+
+    def reply_who_am_i(self, text):
+        if self.memory["name"]:
+            return f"You told me earlier your name is {self.memory['name']}."
+        return "You haven’t told me your name yet."
+
+    def reply_love(self, text):
+        self.memory["tone"] = "casual"
+        return "That's sweet of you. I'm always here for a good conversation. 💙"
+
+    def reply_joke(self, text):
+        return random.choice(JOKES)
+
+    def reply_bye(self, text):
+        return "Goodbye! It was a pleasure talking with you."
 
     # ---------- Tone Adaptation ----------
     def _apply_tone(self, reply, sentiment):
@@ -445,6 +4383,8 @@ class Chatbot:
 
     # ---------- Rule-Based Fallback ----------
     def generate_rule_based_reply(self, sentiment, user_text):
+        if self.metrics is not None:
+            self.metrics.incr("fallback_replies")
         lower = user_text.lower()
 
         if sentiment == "Negative":
@@ -457,32 +4397,224 @@ class Chatbot:
         return "I understand. Tell me more so I can assist you better."
 
     # ---------- LLM Reply Generator ----------
+    # ---------- Response Cache ----------
+    def _cache_scope(self):
+        # a reply written with earlier turns in the prompt may quote them,
+        # so only this user gets it back; an opening message's reply
+        # depends on the message alone and is shared with every user
+        if len(self.history) <= 1:
+            return None
+        return "local" if self.user_id is None else f"user:{self.user_id}"
+
+    def _cache_lookup(self, sentiment, user_text):
+        if self.response_cache is None:
+            return None
+        cached = self.response_cache.get(
+            self.memory["tone"], sentiment, user_text, self.last_bot_reply or "",
+            self._cache_scope()
+        )
+        if self.metrics is not None:
+            self.metrics.incr("cache_misses" if cached is None else "cache_hits")
+        return cached
+
+    def _cache_store(self, sentiment, user_text, reply, started):
+        if self.response_cache is not None:
+            self.response_cache.put(
+                self.memory["tone"], sentiment, user_text, self.last_bot_reply or "",
+                reply, time.perf_counter() - started, scope=self._cache_scope()
+            )
+
+    async def _cache_lookup_async(self, sentiment, user_text):
+        if self.response_cache is None:
+            return None
+        cached = await self.response_cache.get_async(
+            self.memory["tone"], sentiment, user_text, self.last_bot_reply or "",
+            self._cache_scope()
+        )
+        if self.metrics is not None:
+            self.metrics.incr("cache_misses" if cached is None else "cache_hits")
+        return cached
+
+    async def _cache_store_async(self, sentiment, user_text, reply, started):
+        if self.response_cache is not None:
+            await self.response_cache.put_async(
+                self.memory["tone"], sentiment, user_text, self.last_bot_reply or "",
+                reply, time.perf_counter() - started, scope=self._cache_scope()
+            )
+
+    # ---------- Metrics ----------
+    def _llm_unavailable(self):
+        if self.metrics is not None:
+            self.metrics.incr("llm_unavailable")
+
+    def _finish_llm_reply(self, reply, sentiment, started):
+        # records the network time, then applies (and times) the tone suffix;
+        # the scheduler's queue wait is already its own "llm_queue" stage
+        m = self.metrics
+        if m is None:
+            return self._apply_tone(reply, sentiment)
+        done = time.perf_counter()
+        m.observe("llm", done - started - LLMScheduler.waited.get())
+        LLMScheduler.waited.set(0.0)
+        m.incr("llm_ok")
+        reply = self._apply_tone(reply, sentiment)
+        m.observe("tone", time.perf_counter() - done)
+        return reply
+
+    def _llm_failed(self):
+        if self.metrics is not None:
+            self.metrics.incr("llm_errors")
+
+    def _llm_priority(self):
+        # with a shared LLMScheduler, users on a run of negative turns are
+        # served before casual chit-chat when calls have to queue
+        return self.memory["negative_streak"]
+
     def generate_reply(self, sentiment, user_text):
         tone = self.memory["tone"]
         if not self.llm.is_available():
+            self._llm_unavailable()
             return self.generate_rule_based_reply(sentiment, user_text)
 
+        cached = self._cache_lookup(sentiment, user_text)
+        if cached is not None:
+            return cached
+
         try:
+            started = time.perf_counter()
             reply = self.llm.generate(
                 user_message=user_text,
                 sentiment=sentiment,
                 tone=tone,
-                history=self.history
+                history=self.history,
+                context=self.context,
+                priority=self._llm_priority()
             )
-            return self._apply_tone(reply, sentiment)
+            reply = self._finish_llm_reply(reply, sentiment, started)
+            self._cache_store(sentiment, user_text, reply, started)
+            return reply
         except Exception as e:
             print("⚠️ LLM ERROR:", e)
+            self._llm_failed()
+            return self.generate_rule_based_reply(sentiment, user_text)
+
+    def generate_reply_stream(self, sentiment, user_text):
+        """
+        Yield the reply in chunks as the LLM streams it. The tone suffix
+        comes last; if the stream fails partway the rule-based reply is
+        yielded instead. The final reply is added to history once, when
+        the generator is exhausted.
+        """
+        reply = None
+        available = self.llm.is_available()
+        cached = self._cache_lookup(sentiment, user_text) if available else None
+        if not available:
+            self._llm_unavailable()
+        elif cached is not None:
+            reply = cached
+            yield cached
+        else:
+            parts = []
+            try:
+                started = time.perf_counter()
+                for chunk in self.llm.generate_stream(
+                    user_message=user_text,
+                    sentiment=sentiment,
+                    tone=self.memory["tone"],
+                    history=self.history,
+                    context=self.context,
+                    priority=self._llm_priority()
+                ):
+                    parts.append(chunk)
+                    yield chunk
+                reply = "".join(parts).strip()
+                if self.metrics is not None and self.llm.last_ttft is not None:
+                    self.metrics.observe("llm_ttft", self.llm.last_ttft)
+                toned = self._finish_llm_reply(reply, sentiment, started)
+                if toned != reply:
+                    yield toned[len(reply):]
+                reply = toned
+                self._cache_store(sentiment, user_text, reply, started)
+            except Exception as e:
+                print(("\n" if parts else "") + "⚠️ LLM ERROR:", e)
+                self._llm_failed()
+                reply = None
+
+        if reply is None:
+            reply = self.generate_rule_based_reply(sentiment, user_text)
+            yield reply
+
+        self.add_bot(reply)
+
+    async def generate_reply_async(self, sentiment, user_text):
+        tone = self.memory["tone"]
+        if not self.async_llm.is_available():
+            self._llm_unavailable()
+            return self.generate_rule_based_reply(sentiment, user_text)
+
+        cached = await self._cache_lookup_async(sentiment, user_text)
+        if cached is not None:
+            return cached
+
+        try:
+            started = time.perf_counter()
+            reply = await self.async_llm.generate(
+                user_message=user_text,
+                sentiment=sentiment,
+                tone=tone,
+                history=self.history,
+                context=self.context,
+                priority=self._llm_priority()
+            )
+            reply = self._finish_llm_reply(reply, sentiment, started)
+            await self._cache_store_async(sentiment, user_text, reply, started)
+            return reply
+        except Exception as e:
+            print("⚠️ LLM ERROR:", e)
+            self._llm_failed()
             return self.generate_rule_based_reply(sentiment, user_text)
 
     # ---------- Main Handler ----------
-    def handle(self, msg):
-        label, score = self.analyzer.analyze(msg)
+    def _prepare_turn(self, msg, hits=None):
+        # everything before the LLM call; one keyword scan is shared by
+        # sentiment rules, memory and intents. With metrics each step is
+        # bracketed by clock reads.
+        m = self.metrics
+        clock = time.perf_counter if m is not None else _no_clock
+        t0 = clock()
+        if hits is None:
+            # keyword hits win; the embedding classifier only sees messages
+            # where they found no topic, intent or crisis phrase
+            hits = self._keyword_hits(msg)
+            if self.classifier is not None and self.classifier.needed(hits):
+                tc = clock()
+                hits = hits | self.classifier.classify(msg)
+                tc = clock() - tc
+                t0 += tc   # keep the classifier out of "rules"
+                if m is not None:
+                    m.observe("classify", tc)
+        t1 = clock()
+        label, score = self.analyzer.analyze(msg, hits)
+        t2 = clock()
         self.add_user(msg, label, score)
-
-        self.update_memory_from_text(msg)
+        self.update_memory_from_text(msg, hits)
         self.update_sentiment_stats(label)
+        t3 = clock()
+        intent = self.detect_special_cases(msg, hits)
+        t4 = clock()
+
+        if m is not None:
+            m.observe("sentiment", t2 - t1)
+            m.observe("rules", (t1 - t0) + (t3 - t2))
+            m.observe("intents", t4 - t3)
+            m.incr("turns")
+            if intent:
+                m.incr("intent_replies")
+        self._memory_changed()
+        return label, score, intent
 
-        intent = self.detect_special_cases(msg)
+    def handle(self, msg):
+        label, score, intent = self._prepare_turn(msg)
         if intent:
             self.add_bot(intent)
             return intent, label, score
@@ -491,66 +4623,74 @@ class Chatbot:
         self.add_bot(reply)
         return reply, label, score
 
-    # ---------- Tier 1 Summary ----------
-    def summary_sentiment(self):
-        user_msgs = [m for m in self.history if m["speaker"] == "user"]
-        if not user_msgs:
-            return "Neutral", 0.0, "No user messages found."
-
-        pos = sum(1 for m in user_msgs if m["sentiment_label"] == "Positive")
-        neg = sum(1 for m in user_msgs if m["sentiment_label"] == "Negative")
-        neu = sum(1 for m in user_msgs if m["sentiment_label"] == "Neutral")
-
-        # weighted average
-        wsum = sum((i+1)*m["sentiment_score"] for i, m in enumerate(user_msgs))
-        wtotal = sum(i+1 for i in range(len(user_msgs)))
-        avg = wsum / wtotal
-
-        if avg > 0.05:
-            overall = "Positive"
-        elif avg < -0.05:
-            overall = "Negative"
+    def handle_stream(self, msg):
+        """
+        Streaming variant of handle(). Returns (chunks, label, score);
+        iterate `chunks` to receive the reply as it is generated.
+        """
+        label, score, intent = self._prepare_turn(msg)
+        if intent:
+            def intent_reply():
+                yield intent
+                self.add_bot(intent)
+            return intent_reply(), label, score
+
+        return self.generate_reply_stream(label, msg), label, score
+
+    async def handle_async(self, msg, executor=None):
+        """
+        Same as handle(), but the LLM request is awaited so other
+        sessions keep running while it is in flight. Messages that need
+        the embedding classifier go through its micro-batcher, so
+        concurrent sessions share one encoder call. A turn answered by a
+        blocking intent (history search) runs on `executor`, the loop's
+        default one when None.
+        """
+        hits = self._keyword_hits(msg)
+        if self.classifier is not None and self.classifier.needed(hits):
+            hits = hits | await self.classifier.classify_async(msg)
+        if self._blocking_intent(msg, hits):
+            label, score, intent = await asyncio.get_running_loop().run_in_executor(
+                executor, self._prepare_turn, msg, hits)
         else:
-            overall = "Neutral"
-
-        explanation = (
-            f"You expressed negative feelings {neg} time(s).\n"
-            f"You expressed positive feelings {pos} time(s).\n"
-            f"You expressed neutral or unclear feelings {neu} time(s).\n"
-        )
+            label, score, intent = self._prepare_turn(msg, hits)
+        if intent:
+            self.add_bot(intent)
+            return intent, label, score
 
-        if overall == "Negative":
-            explanation += "Recent messages leaned negative."
-        elif overall == "Positive":
-            explanation += "Overall tone leaned positive."
-        else:
-            explanation += "Your emotions were mixed or balanced."
+        reply = await self.generate_reply_async(label, msg)
+        self.add_bot(reply)
+        return reply, label, score
 
-        return overall, avg, explanation
+    # ---------- Tier 1 Summary ----------
+    def summary_sentiment(self):
+        return self.stats.summary()
 
     # ---------- Tier 2 Report ----------
     def print_tier2_report(self):
         print("=== 📌 Statement-Level Sentiment (Tier 2) ===")
-        user_msgs = [m for m in self.history if m["speaker"] == "user"]
-
-        if not user_msgs:
+        if not self.stats.count:
             print("No messages.")
             return
 
+        user_msgs = (m for m in self.history if m["speaker"] == "user")
         for i, m in enumerate(user_msgs, start=1):
             print(f"{i}. \"{m['text']}\" → {m['sentiment_label']} ({m['sentiment_score']:+.3f})")
 
     # ---------- Trend Analysis ----------
-    def summarize_trend(self):
-        scores = [m["sentiment_score"] for m in self.history if m["speaker"] == "user"]
+    def summarize_trend(self, windowed=False):
+        """
+        Compare the first and last user scores, or with `windowed=True`
+        the oldest and newest scores of the last-N window.
+        """
+        if windowed:
+            change = self.stats.window_change()
+        else:
+            change = self.stats.last - self.stats.first if self.stats.count >= 2 else None
 
-        if len(scores) < 2:
+        if change is None:
             return "Not enough data for a trend."
 
-        start = scores[0]
-        end = scores[-1]
-        change = end - start
-
         if change > 0.25:
             return "Your emotional tone improved over the conversation."
         elif change < -0.25:
@@ -560,28 +4700,437 @@ class Chatbot:
     # ---------- ASCII Graph ----------
     def print_ascii_trend(self):
         print("=== 📈 ASCII Sentiment Trend ===")
-        scores = [m["sentiment_score"] for m in self.history if m["speaker"] == "user"]
-
-        if not scores:
+        if not self.stats.count:
             print("No data.")
             return
 
+        scores = (m["sentiment_score"] for m in self.history if m["speaker"] == "user")
         for i, s in enumerate(scores, start=1):
             bar = "█" * int(abs(s)*10)
             print(f"{i}: {s:+.3f} {bar}")
 
     # ---------- Save to Text Log ----------
     def save_to_log_txt(self):
+        if self.chat_log is not None:
+            self.chat_log.write_session(self.session_id, self.history)
+            return
         with open(CHAT_LOG_FILE, "a", encoding="utf-8") as f:
             f.write("\n=== New Chat ===\n")
             for m in self.history:
                 f.write(f"{m['speaker'].upper()}: {m['text']}\n")
 
 
+# ======================= OFFLINE RE-SCORING =======================
+
+_worker_analyzer = None
+
+
+def _init_rescore_worker():
+    # each worker process builds its own VADER analyzer exactly once
+    global _worker_analyzer
+    _worker_analyzer = HybridSentimentAnalyzer()
+
+
+def _rescore_sessions(sessions):
+    user_turns = [m for s in sessions for m in s.get("history", []) if m.get("speaker") == "user"]
+    results = _worker_analyzer.analyze_batch(m.get("text", "") for m in user_turns)
+    for m, (label, score) in zip(user_turns, results):
+        m["sentiment_label"] = label
+        m["sentiment_score"] = score
+
+    for s in sessions:
+        overall, avg, _ = summarize_sentiment(s.get("history", []))
+        s["summary_sentiment"] = {"label": overall, "score": avg}
+    return sessions
+
+
+def iter_json_array(path: str, read_size: int = 1 << 20) -> Iterator[Any]:
+    """
+    Stream the elements of a top-level JSON array from `path` without
+    loading the whole document.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(read_size).lstrip()
+        if not buf.startswith("["):
+            raise ValueError(f"{path} is not a JSON array")
+        buf = buf[1:]
+        eof = False
+        while True:
+            buf = buf.lstrip().lstrip(",").lstrip()
+            if buf.startswith("]"):
+                return
+            try:
+                item, end = decoder.raw_decode(buf)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                more = f.read(read_size)
+                eof = not more
+                buf += more
+                continue
+            yield item
+            buf = buf[end:]
+            if len(buf) < read_size and not eof:
+                more = f.read(read_size)
+                eof = not more
+                buf += more
+
+
+def _chunked(it, size):
+    it = iter(it)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _index_path_for(log_path: str) -> str:
+    return os.path.splitext(log_path)[0] + ".idx"
+
+
+def rescore_archive(src: str, dst: str, workers: Optional[int] = None,
+                    sessions_per_task: int = 64, derived: Iterable[Any] = ()) -> int:
+    """
+    Re-run sentiment over every user turn of an archive using a process
+    pool. `src` is either a session store log (.jsonl) or a legacy
+    chat_sessions.json array; `dst` is written in the same format, in
+    input order. `derived` are stores built from `dst` (ConversationIndex,
+    SentimentRollups): they hold the old labels and scores, so they are
+    reset once `dst` is replaced and rebuild on their next sync().
+    Returns the number of sessions processed.
+    """
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    legacy = src.endswith(".json")
+    workers = workers or os.cpu_count() or 1
+    max_inflight = workers * 4   # bounds memory on very large archives
+    tmp = dst + ".tmp"
+    count = 0
+
+    if legacy:
+        sessions = iter_json_array(src)
+        out = open(tmp, "w", encoding="utf-8")
+        out.write("[")
+    else:
+        source = SessionStore(src, _index_path_for(src), legacy_path=None, readonly=True)
+        sessions = iter(source)
+        for path in (tmp, _index_path_for(tmp)):
+            if os.path.exists(path):
+                os.remove(path)
+        store = SessionStore(tmp, _index_path_for(tmp), legacy_path=None)
+
+    def emit(session):
+        nonlocal count
+        if legacy:
+            out.write(",\n" if count else "\n")
+            out.write(json.dumps(session, indent=4))
+        else:
+            store.append(session)
+        count += 1
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_rescore_worker) as pool:
+        pending = deque()
+        for chunk in _chunked(sessions, sessions_per_task):
+            pending.append(pool.submit(_rescore_sessions, chunk))
+            if len(pending) >= max_inflight:
+                for session in pending.popleft().result():
+                    emit(session)
+        while pending:
+            for session in pending.popleft().result():
+                emit(session)
+
+    if legacy:
+        out.write("\n]\n")
+        out.close()
+        os.replace(tmp, dst)
+    else:
+        source.close()   # a mapped file cannot be replaced on Windows
+        # without an index the store rebuilds it from the log, so a crash
+        # between the two renames is recoverable
+        if os.path.exists(_index_path_for(dst)):
+            os.remove(_index_path_for(dst))
+        os.replace(tmp, dst)
+        os.replace(_index_path_for(tmp), _index_path_for(dst))
+    for store in derived:
+        store.reset()
+    return count
+
+
+def rescore_main(argv: List[str]) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="chatbot_sentiment.py rescore",
+        description="Re-score stored chat sessions with the current sentiment engine."
+    )
+    parser.add_argument("--input", default=SESSION_LOG_FILE,
+                        help="session store log (.jsonl) or legacy chat_sessions.json")
+    parser.add_argument("--output", default=None, help="defaults to overwriting --input")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--sessions-per-task", type=int, default=64)
+    args = parser.parse_args(argv)
+
+    dst = args.output or args.input
+    derived = []
+    if os.path.abspath(dst) == os.path.abspath(SESSION_LOG_FILE):
+        # the live archive: its rollups and search index hold the old scores
+        derived = [SentimentRollups(), ConversationIndex()]
+    n = rescore_archive(args.input, dst, workers=args.workers,
+                        sessions_per_task=args.sessions_per_task, derived=derived)
+    print(f"Re-scored {n} session(s).")
+    if derived:
+        for store in derived:
+            store.close()
+        print("Sentiment rollups and the search index were reset; they rebuild in the "
+              "background on the next start (or run 'report --sync' now).")
+
+
+# ======================= MULTI-SESSION SERVER =======================
+
+class ChatServer:
+    """
+    Line-based TCP front end serving many conversations from one process.
+
+    Each request line is "<session_id> <message>"; the reply is one JSON
+    line {"session", "reply", "label", "score"}. Sending "<session_id> /end"
+    saves that session's memory and transcript and forgets it. One Chatbot is kept per session id;
+    the analyzer, responders, response cache and session store are shared
+    (building a Groq client per session costs tens of milliseconds).
+    Sessions idle for `idle_timeout` seconds are saved and forgotten the
+    same way; a later line of theirs starts a fresh Chatbot, which loads
+    the user's memory back from the store. Sessions still open when the
+    server stops are saved too.
+    The session id doubles as the user id for the shared UserMemoryStore,
+    so each user keeps their own name, tone and topics.
+
+    With `metrics` set, every session records into that one TurnMetrics,
+    and `metrics_path` gets a fresh dump every `metrics_interval` seconds.
+    All LLM calls go through one LLMScheduler (by default sized to the
+    free-tier quota), which shares identical in-flight requests and
+    serves distressed users first once the quota makes calls queue.
+
+    Saving a session and history searches touch SQLite, the archive and
+    the chat log, so they run on one I/O thread instead of the event
+    loop; one thread also keeps those shared stores single-writer.
+    """
+
+    def __init__(self, metrics: Optional[TurnMetrics] = None,
+                 metrics_path: Optional[str] = None,
+                 metrics_interval: float = 15.0,
+                 classifier: Optional[EmbeddingClassifier] = None,
+                 scheduler: Optional[LLMScheduler] = None,
+                 idle_timeout: Optional[float] = 1800.0) -> None:
+        self.analyzer = HybridSentimentAnalyzer()
+        self.analyzer.warm_up()
+        transport = ResilientTransport()   # one breaker for both paths
+        self.scheduler = scheduler or LLMScheduler(metrics=metrics)
+        self.llm = GroqLLMResponder(transport=transport, scheduler=self.scheduler)
+        self.async_llm = AsyncGroqLLMResponder(transport=transport, scheduler=self.scheduler)
+        self.past_chats = SessionStore()
+        self.response_cache = ResponseCache(persist_path=RESPONSE_CACHE_FILE)
+        self.user_store = shared_user_store()
+        self.chat_log = ChatLogWriter()
+        self.search_index = ConversationIndex()
+        self.rollups = SentimentRollups()
+        self.classifier = classifier
+        if classifier is not None:
+            classifier.warm_up()   # load the model before the first session needs it
+        self.metrics = metrics
+        self.metrics_path = metrics_path
+        self.metrics_interval = metrics_interval
+        self.idle_timeout = idle_timeout   # None: sessions live until /end
+        self.sessions: Dict[str, Chatbot] = {}
+        self._last_seen: Dict[str, float] = {}   # session id -> monotonic time of its last line
+        # session id -> [lock, lines holding or waiting for it]; dropped at zero,
+        # so a queued line never ends up on a different lock than the one ahead of it
+        self._locks: Dict[str, list] = {}
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-io")
+        # an archive older than the search index or rollups is back-filled meanwhile
+        self.search_index.catch_up(self.past_chats)
+        self.rollups.catch_up(self.past_chats)
+
+    def _bot(self, session_id: str) -> Chatbot:
+        bot = self.sessions.get(session_id)
+        if bot is None:
+            bot = Chatbot(analyzer=self.analyzer, llm=self.llm,
+                          async_llm=self.async_llm, past_chats=self.past_chats,
+                          response_cache=self.response_cache,
+                          metrics=self.metrics,
+                          user_id=session_id, user_store=self.user_store,
+                          classifier=self.classifier, chat_log=self.chat_log,
+                          search_index=self.search_index, rollups=self.rollups)
+            self.sessions[session_id] = bot
+        return bot
+
+    def _hold(self, session_id: str) -> asyncio.Lock:
+        entry = self._locks.get(session_id)
+        if entry is None:
+            entry = self._locks[session_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def _release(self, session_id: str) -> None:
+        entry = self._locks[session_id]
+        entry[1] -= 1
+        if not entry[1]:
+            del self._locks[session_id]
+
+    async def handle_line(self, line: str) -> Dict[str, Any]:
+        session_id, _, msg = line.strip().partition(" ")
+        if msg.strip().lower() == "/end":
+            saved = await self.end_session(session_id)
+            reply = "Session saved." if saved else "No open session to save."
+            return {"session": session_id, "reply": reply, "label": None, "score": None}
+
+        # turns of one session stay ordered; other sessions run freely
+        lock = self._hold(session_id)
+        try:
+            async with lock:
+                # looked up under the lock: an /end or eviction ahead of
+                # this line may have just dropped the session's bot
+                bot = self._bot(session_id)
+                self._last_seen[session_id] = time.monotonic()
+                reply, label, score = await bot.handle_async(msg, self._io)
+        finally:
+            self._release(session_id)
+        return {"session": session_id, "reply": reply, "label": label, "score": score}
+
+    async def end_session(self, session_id: str, idle_since: Optional[float] = None) -> bool:
+        """
+        Save a session's memory and transcript and forget it, after any of
+        its lines already queued. With `idle_since` (a time.monotonic()
+        value) only if it has had no line since. Returns whether a
+        session was ended.
+        """
+        lock = self._hold(session_id)
+        try:
+            async with lock:
+                bot = self.sessions.get(session_id)
+                if bot is None:
+                    return False
+                if idle_since is not None and self._last_seen.get(session_id, 0.0) > idle_since:
+                    return False
+                await asyncio.get_running_loop().run_in_executor(self._io, self._save_session, bot)
+                del self.sessions[session_id]
+                self._last_seen.pop(session_id, None)
+                return True
+        finally:
+            self._release(session_id)
+
+    async def evict_idle(self) -> int:
+        """End every session idle for longer than `idle_timeout`; returns how many."""
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = [sid for sid, seen in self._last_seen.items() if seen <= cutoff]
+        ended = 0
+        for session_id in idle:
+            ended += await self.end_session(session_id, idle_since=cutoff)
+        return ended
+
+    async def _evict_idle_sessions(self) -> None:
+        while True:
+            await asyncio.sleep(min(60.0, self.idle_timeout / 2))
+            await self.evict_idle()
+
+    @staticmethod
+    def _save_session(bot: Chatbot) -> None:
+        bot.save_persistent_memory()
+        bot.save_to_log_txt()
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                line = raw.decode("utf-8", "replace")
+                if not line.strip():
+                    continue
+                result = await self.handle_line(line)
+                writer.write((json.dumps(result) + "\n").encode("utf-8"))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _dump_metrics(self) -> None:
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            self.metrics.dump(self.metrics_path)
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765) -> None:
+        server = await asyncio.start_server(self._client, host, port)
+        dumper = evictor = None
+        if self.metrics is not None and self.metrics_path:
+            dumper = asyncio.create_task(self._dump_metrics())
+        if self.idle_timeout:
+            evictor = asyncio.create_task(self._evict_idle_sessions())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if evictor is not None:
+                evictor.cancel()
+            # sessions still open keep their archive record and transcript
+            for session_id in list(self.sessions):
+                await self.end_session(session_id)
+            self._io.shutdown(wait=True)
+            self.user_store.flush()
+            self.chat_log.close()
+            self.search_index.close()   # an unfinished back-fill resumes next start
+            self.rollups.close()
+            if dumper is not None:
+                dumper.cancel()
+                self.metrics.dump(self.metrics_path)
+
+
+def serve_main(argv: List[str]) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="chatbot_sentiment.py serve",
+        description="Serve many chat sessions over a line-based TCP protocol."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--metrics-file", default=None,
+                        help="enable turn metrics and dump them here (.prom for Prometheus text, else JSON)")
+    parser.add_argument("--metrics-interval", type=float, default=15.0)
+    parser.add_argument("--classifier", action="store_true",
+                        help="also match topics and intents by sentence embeddings (needs sentence-transformers)")
+    parser.add_argument("--rpm", type=float, default=30,
+                        help="LLM requests per minute allowed by the account (0: no limit)")
+    parser.add_argument("--tpm", type=float, default=6000,
+                        help="LLM tokens per minute allowed by the account (0: no limit)")
+    parser.add_argument("--max-queue-wait", type=float, default=5.0,
+                        help="seconds an LLM call may wait for quota before the turn falls back to rules (0: no limit)")
+    parser.add_argument("--idle-timeout", type=float, default=1800.0,
+                        help="save and forget sessions idle this many seconds (0: keep until /end)")
+    args = parser.parse_args(argv)
+
+    metrics = TurnMetrics() if args.metrics_file else None
+    classifier = EmbeddingClassifier() if args.classifier else None
+    scheduler = LLMScheduler(rpm=args.rpm, tpm=args.tpm, metrics=metrics,
+                             max_wait=args.max_queue_wait or None)
+    server = ChatServer(metrics=metrics, metrics_path=args.metrics_file,
+                        metrics_interval=args.metrics_interval, classifier=classifier,
+                        scheduler=scheduler, idle_timeout=args.idle_timeout or None)
+    print(f"Serving chat sessions on {args.host}:{args.port}")
+    asyncio.run(server.serve(args.host, args.port))
+
+
 # ======================= MAIN =======================
 
 def main():
-    bot = Chatbot()
+    # memory is saved in the background after each turn, so a crash loses
+    # at most the last debounce interval
+    bot = Chatbot(response_cache=ResponseCache(persist_path=RESPONSE_CACHE_FILE),
+                  memory_writer=MemoryWriter(), chat_log=ChatLogWriter(),
+                  search_index=ConversationIndex(), rollups=SentimentRollups())
+    bot.analyzer.warm_up()   # load VADER while the first prompt waits
+    bot.search_index.catch_up(bot.past_chats)   # index older chats meanwhile
+    bot.rollups.catch_up(bot.past_chats)
 
     print("=== Chatbot with Hybrid Sentiment + Groq LLaMA-3.1-8B ===")
     print("Type 'exit' or 'quit' to finish.\n")
@@ -591,11 +5140,14 @@ def main():
         if msg.lower() in {"exit", "quit"}:
             break
 
-        reply, label, score = bot.handle(msg)
+        chunks, label, score = bot.handle_stream(msg)
 
         # clean Tier 2 output (no duplicate lines)
         print(f"→ Sentiment: {label} ({score:+.3f})")
-        print("Bot:", reply)
+        print("Bot: ", end="", flush=True)
+        for chunk in chunks:
+            print(chunk, end="", flush=True)
+        print()
 
     print("\n=========== SENTIMENT SUMMARY ===========")
 
@@ -614,9 +5166,24 @@ def main():
     # Save logs
     bot.save_to_log_txt()
     bot.save_persistent_memory()
+    bot.memory_writer.close()
+    bot.chat_log.close()
+    bot.search_index.close()   # an unfinished back-fill resumes next start
+    bot.rollups.close()
     print("\n💾 Chat saved.")
 
 
 if __name__ == "__main__":
-    main()
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "rescore":
+        rescore_main(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == "log":
+        log_main(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == "report":
+        report_main(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve_main(sys.argv[2:])
+    else:
+        main()
 